@@ -26,7 +26,51 @@
 #    it is on fast disks for accurate timings. Note the project UID ("PXXXX")
 # 5) Download the benchmark_data.tar.gz and unpack it somewhere. Make sure
 #    it is on a fast SSD to get accurate timings.
-# 6) Place this script anywhere you like.
+# 6) Place this script anywhere you like, together with benchmark_suite.json, which
+#    lists the jobs run for each mode and dataset (or pass another file with --suite).
+#
+# To see the jobs that would run and how long they are expected to take, based on
+# the timings of earlier runs, add --plan [--history <dirs>] to the command below.
+# --simulate replays them instead for several scheduling policies (--policies) and GPU
+# counts (--simulate_gpus 1,2,4,8), modelling GPU slots and SSD cache contention: the jobs go
+# through the same scheduler as a real run, on a simulated clock. A real run starts ready jobs
+# in suite order, or in the order of --policy longest|critical_path.
+# To measure how a single job's runtime scales with its parameters, use --job with
+# one or more --sweep options, e.g. --sweep class2D_K=25..400 --sweep compute_use_ssd=False,True
+# For a quick smoke test, --fraction, --max_particles and --max_movies run the suite on an evenly
+# spread subset of the input data, linked into --subset_dir without copying it.
+#
+# Every run is added to a SQLite result store (--results_db, by default in --out), keyed by
+# cryoSPARC version, dataset, instance type, GPU model, cache state and --parallel, and each job is
+# compared against the same job in the most recent earlier runs on the same setup.
+# --ingest adds existing timings files to the store, and --compare [timings.json] checks
+# a run for significant slowdowns, exiting with status 1 if any job regressed.
+#
+# Progress is journaled next to the timings after every job. If the script or the node dies,
+# run the same command again with --resume to continue in the same workspace: completed jobs
+# are skipped and jobs that are still queued or running are followed instead of relaunched.
+#
+# With --adaptive_timeouts, each job times out after --timeout_factor times the 99th percentile
+# of its runtimes in earlier runs (--history, by default --out) on the same instance type, dataset,
+# data fraction, --parallel and --cache_state (as for --plan), and is killed early if its
+# iterations are --straggler_factor times slower than before.
+# Such jobs are recorded as performance failures; the jobs that need their outputs are skipped
+# and the rest of the benchmark carries on.
+#
+# With --ssd_cache, every job that can use the SSD particle cache (compute_use_ssd) runs without
+# it, then with the cache cold and then warm. The bytes copied to the cache and the time taken to
+# fill it are worked out from the file sizes and mtimes under CRYOSPARC_SSD_PATH (or SSDPATH).
+#
+# The extensive_workflow mode runs cryoSPARC's extensive workflow (T20S, EMPIAR 10025) as a
+# single job, then times every job the workflow created, recording them as <key>_<job type>.
+# Run it in a project used only by the benchmark.
+#
+# In the container, entry.sh times each startup step, and the time from the container starting
+# to the first benchmark job being queued is recorded and compared between runs like a job.
+# Only the first benchmark after the container started records it.
+#
+# Every command_core call and database query is timed, and their latency histograms are saved
+# with the timings ('rpc_latency') to tell the harness overhead apart from the job runtimes.
 #
 # Now, in a shell:
 #
@@ -41,586 +85,2528 @@
 #                                  --mode <"preprocess", "reconstruct">
 #                                  --dataset <10028, 10025>
 #                                  --out "./path/to/output_dir"
+#                                  [--parallel N]
 #
 # The script will sequentially create and run all the jobs in the benchmark.
+# With --parallel N, jobs are scheduled from the dependency graph described by
+# their setup_requires and input_group_connects, and up to N jobs whose inputs
+# are ready run at the same time.
+# Each job is given only as many GPUs from --gpus as its job type can use (see
+# JOB_TYPE_GPU_DEMAND), and jobs running at the same time never share a GPU.
+# With --cache_state cold|warm, the input data is evicted from or read into the
+# page cache before the first job, so import and motion timings are comparable.
 # Timings will be displayed and also dumped into the specified output.json file.
 # At any point, you can kill this script with ctrl+C and the running job will 
 # also be killed. All jobs will be created within the project that you 
 # specified, in a new workspace stamped with the worker_hostname and current 
 # datetime.
 
-import os, sys
+import os, sys
+
+if 'CRYOSPARC_ROOT_DIR' in os.environ:
+    sys.path.append(os.environ['CRYOSPARC_ROOT_DIR'])
+try:
+    import cryosparc_compute.jobs.runcommon as rc
+except ImportError:
+    # the helpers that don't talk to cryoSPARC can still be imported and tested without it
+    rc = None
+
+from collections import OrderedDict, defaultdict
+import argparse
+import time
+import datetime
+import json
+import errno
+import threading
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import re
+import gzip
+import glob
+import random
+import math
+import copy
+import hashlib
+import sqlite3
+import selectors
+
+cli = None
+db = None
+
+# Job parameter that sets how many GPUs a multi-GPU job uses
+MULTI_GPU_PARAM = 'compute_num_gpus'
+
+# Number of GPUs each job type makes use of. 0 means the job runs on the CPU only,
+# None means the job spreads its work over all of the GPUs it is given.
+# Job types not listed here get a single GPU.
+JOB_TYPE_GPU_DEMAND = {
+    'import_movies' : 0,
+    'import_particles' : 0,
+    'import_volumes' : 0,
+    'patch_motion_correction_multi' : None,
+    'patch_ctf_estimation_multi' : None,
+    'class_2D' : 1,
+    'homo_abinit' : 1,
+    'hetero_refine' : 1,
+    'homo_refine' : 1,
+    'homo_refine_new' : 1,
+    'nonuniform_refine' : 1,
+    'var_3D' : 1,
+    # the workflow runs on the master, the jobs it queues get the GPUs
+    'extensive_workflow_bench' : 0,
+}
+
+# Job types that create and queue jobs of their own while they run. Their children are
+# followed until they finish and timed as <key>_<job type>.
+WORKFLOW_JOB_TYPES = ['extensive_workflow_bench']
+
+# Declarative list of the benchmark jobs for each mode and dataset
+BENCHMARK_SUITE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_suite.json')
+BENCHMARK_SUITE_VERSION = 1
+# Parameter values starting with this are paths relative to --input_data_dir
+INPUT_DATA_DIR_PLACEHOLDER = '{input_data_dir}'
+REQUIRED_JOB_FIELDS = ['key', 'job_type', 'job_title', 'setup_requires', 'advanced']
+
+_benchmark_suites = {}
+
+
+class BenchmarkSuite(object):
+    '''
+    The benchmark jobs from a suite file, indexed by mode and dataset and by (dataset, key).
+
+    :param suite_doc: the parsed suite file
+    :type suite_doc: dict
+    :param input_data_dir: the directory user specified where the benchmark data is located
+    :type input_data_dir: str
+    '''
+
+    def __init__(self, suite_doc, input_data_dir = "/"):
+        self.version = suite_doc.get('suite_version')
+        self.modes = OrderedDict()
+        self.jobs = OrderedDict()
+        self.job_modes = {}
+        self.errors = []
+        for mode, datasets in iter(suite_doc.get('modes', {}).items()):
+            self.modes[mode] = OrderedDict()
+            for dataset, jobs in iter(datasets.items()):
+                dataset = int(dataset)
+                self.modes[mode][dataset] = []
+                for index, job_info in enumerate(jobs):
+                    if not job_info:
+                        self.errors.append("{} {}: entry {} is empty".format(mode, dataset, index))
+                        continue
+                    job_info = self.resolve_input_paths(job_info, input_data_dir)
+                    job_key = (dataset, job_info.get('key'))
+                    if job_key in self.jobs:
+                        self.errors.append("{} {}: job key {} is defined more than once".format(mode, dataset, job_info.get('key')))
+                        continue
+                    self.jobs[job_key] = job_info
+                    self.job_modes[job_key] = mode
+                    self.modes[mode][dataset].append(job_info)
+
+    @staticmethod
+    def resolve_input_paths(job_info, input_data_dir):
+        job_info = dict(job_info)
+        params = OrderedDict()
+        for name, value in iter(job_info.get('params', {}).items()):
+            if isinstance(value, str) and value.startswith(INPUT_DATA_DIR_PLACEHOLDER):
+                value = os.path.join(input_data_dir, value[len(INPUT_DATA_DIR_PLACEHOLDER):].lstrip('/'))
+            params[name] = value
+        job_info['params'] = params
+        return job_info
+
+    def datasets(self):
+        return sorted(set(dataset for dataset, _ in self.jobs))
+
+    def modes_for(self, dataset):
+        return [mode for mode, datasets in iter(self.modes.items()) if datasets.get(dataset)]
+
+    def job_keys(self, dataset):
+        return [key for job_dataset, key in self.jobs if job_dataset == dataset]
+
+    def get_job(self, dataset, key):
+        return self.jobs.get((dataset, key))
+
+    def get_jobs(self, mode, dataset, advanced_mode):
+        return [job_info for job_info in self.modes.get(mode, {}).get(dataset, []) if advanced_mode or not job_info['advanced']]
+
+    def validate(self):
+        '''
+        Returns a list of problems with the suite that would make a benchmark run fail part way:
+        empty or duplicate entries, missing fields, dependencies on jobs of another mode or dataset,
+        dependency cycles, inputs read from jobs that aren't required first, and regular jobs that
+        require jobs only run in advanced mode.
+        '''
+        errors = list(self.errors)
+        if self.version != BENCHMARK_SUITE_VERSION:
+            errors.append("suite version {} is not supported, expected {}".format(self.version, BENCHMARK_SUITE_VERSION))
+
+        for (dataset, key), job_info in iter(self.jobs.items()):
+            missing = [field for field in REQUIRED_JOB_FIELDS if field not in job_info]
+            if missing:
+                errors.append("{} {}: missing {}".format(dataset, key, ', '.join(missing)))
+                continue
+            mode = self.job_modes[(dataset, key)]
+            for dependency in job_info['setup_requires']:
+                if (dataset, dependency) not in self.jobs or self.job_modes[(dataset, dependency)] != mode:
+                    errors.append("{} {}: requires {}, which is not a {} job for this dataset".format(dataset, key, dependency, mode))
+                elif self.jobs[(dataset, dependency)].get('advanced') and not job_info['advanced']:
+                    errors.append("{} {}: requires advanced job {} but isn't advanced itself".format(dataset, key, dependency))
+
+            # everything reachable through setup_requires, stopping at unknown jobs and cycles
+            required = set()
+            stack = list(job_info['setup_requires'])
+            while stack:
+                dependency = stack.pop()
+                if dependency == key:
+                    errors.append("{} {}: is part of a setup_requires cycle".format(dataset, key))
+                    break
+                if dependency in required or (dataset, dependency) not in self.jobs:
+                    continue
+                required.add(dependency)
+                stack.extend(self.jobs[(dataset, dependency)].get('setup_requires', []))
+            for connects in job_info.get('input_group_connects', {}).values():
+                for connect in connects:
+                    if connect['input_job_name'] not in required:
+                        errors.append("{} {}: reads {}.{} without requiring {}".format(
+                            dataset, key, connect['input_job_name'], connect['group_name'], connect['input_job_name']))
+        return errors
+
+    def as_dict(self):
+        return OrderedDict((mode, OrderedDict((dataset, list(jobs)) for dataset, jobs in iter(datasets.items()))) for mode, datasets in iter(self.modes.items()))
+
+
+def get_benchmark_suite(input_data_dir = "/", path=None):
+    '''
+    Returns the BenchmarkSuite for the suite file (by default benchmark_suite.json next to this script),
+    parsing the file only once per input directory.
+    '''
+    path = path or BENCHMARK_SUITE_PATH
+    if (path, input_data_dir) not in _benchmark_suites:
+        with open(path) as f:
+            suite_doc = json.load(f, object_pairs_hook=OrderedDict)
+        _benchmark_suites[(path, input_data_dir)] = BenchmarkSuite(suite_doc, input_data_dir)
+    return _benchmark_suites[(path, input_data_dir)]
+
+
+def get_benchmark_jobs_dict(input_data_dir = "/", job_types_only=False, dataset_selected=None, datasets_only=False, modes_only=False):
+    '''
+    This dictionary holds all the jobs and their parameters required to run for the actual benchmark,
+    by mode and dataset, as defined in the benchmark suite file.
+
+    :param input_data_dir: the directory user specified where the benchmark data is located
+    :type input_data_dir: str
+    '''
+    suite = get_benchmark_suite(input_data_dir)
+    if job_types_only:
+        return suite.job_keys(dataset_selected)
+    if datasets_only:
+        return suite.datasets()
+    if modes_only:
+        return suite.modes_for(dataset_selected)
+    return suite.as_dict()
+
+
+def get_job_dependencies(job_info):
+    '''
+    Returns the keys of all jobs that must complete before this job can be queued,
+    combining its setup_requires with every job its input_group_connects read from.
+
+    :param job_info: a job entry from get_benchmark_jobs_dict
+    :type job_info: dict
+    '''
+    dependencies = list(job_info.get('setup_requires', []))
+    for connects in job_info.get('input_group_connects', {}).values():
+        for connect in connects:
+            if connect['input_job_name'] not in dependencies:
+                dependencies.append(connect['input_job_name'])
+    return dependencies
+
+
+def get_jobs_with_requirements(suite, dataset_selected, job_key):
+    '''
+    Returns the job entry for job_key preceded by every job it transitively depends on,
+    in an order where each job comes after its dependencies.
+    '''
+    ordered_jobs = OrderedDict()
+
+    def visit(key):
+        if key in ordered_jobs:
+            return
+        job_info = suite.get_job(dataset_selected, key)
+        assert job_info is not None, "job {} is not defined for dataset {}".format(key, dataset_selected)
+        for dependency in get_job_dependencies(job_info):
+            visit(dependency)
+        ordered_jobs[key] = job_info
+
+    visit(job_key)
+    return list(ordered_jobs.values())
+
+
+def select_benchmark_jobs(suite, dataset, mode, advanced_mode, job):
+    '''
+    Returns the jobs to run: the selected job and everything it requires in job only mode,
+    otherwise the jobs of the mode (skipping advanced jobs unless advanced_mode is set).
+    '''
+    if job:
+        return get_jobs_with_requirements(suite, dataset, job)
+    return suite.get_jobs(mode, dataset, advanced_mode)
+
+
+def get_repeat_key(key, run):
+    '''
+    Returns the key used for the given run of a repeated job. Run 0 keeps the original key,
+    so that dependent jobs and the upstream imports are shared by all runs.
+    '''
+    return key if run == 0 else '{}_run{}'.format(key, run)
+
+
+def split_repeat_key(key):
+    '''
+    Inverse of get_repeat_key: returns (original key, run).
+    '''
+    match = re.match(r'^(.*)_run(\d+)$', key)
+    if match:
+        return match.group(1), int(match.group(2))
+    return key, 0
+
+
+def expand_repeats(jobs, num_runs, repeat_keys=None):
+    '''
+    Returns the job list with every job in repeat_keys (by default, every job that isn't an import)
+    followed by num_runs - 1 copies of itself. The copies have the same inputs as the original,
+    so imports are created once and reused by every run.
+    '''
+    expanded = []
+    for job_info in jobs:
+        expanded.append(job_info)
+        repeated = job_info['key'] in repeat_keys if repeat_keys is not None else 'import' not in job_info['job_type']
+        if not repeated:
+            continue
+        for run in range(1, num_runs):
+            repeat_info = copy.deepcopy(job_info)
+            repeat_info['key'] = get_repeat_key(job_info['key'], run)
+            repeat_info['job_title'] = '{} (run {})'.format(job_info['job_title'], run + 1)
+            expanded.append(repeat_info)
+    return expanded
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if not values:
+        return None
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+# two-sided 95% quantiles of Student's t distribution by degrees of freedom
+T_95 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+        2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+        2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+
+
+def summarize_samples(samples):
+    '''
+    Returns count, mean, median, sample standard deviation, min, max, coefficient of variation
+    and the 95% confidence interval of the mean for a list of measurements.
+    '''
+    n = len(samples)
+    if n == 0:
+        return OrderedDict([('n', 0)])
+    mean = sum(samples) / float(n)
+    stdev = math.sqrt(sum((x - mean) ** 2 for x in samples) / (n - 1)) if n > 1 else 0.0
+    if n > 1:
+        half_width = (T_95[n - 2] if n - 2 < len(T_95) else 1.96) * stdev / math.sqrt(n)
+        ci95 = [mean - half_width, mean + half_width]
+    else:
+        ci95 = None
+    return OrderedDict([
+        ('n', n),
+        ('mean', mean),
+        ('median', median(samples)),
+        ('stdev', stdev),
+        ('min', min(samples)),
+        ('max', max(samples)),
+        ('cv', stdev / mean if mean else None),
+        ('ci95', ci95),
+    ])
+
+
+def build_job_dag(jobs):
+    '''
+    Builds the dependency graph for a list of job entries.
+    Returns an OrderedDict mapping each job key to the list of job keys it depends on,
+    keeping the order of the input list.
+    '''
+    dag = OrderedDict((job['key'], get_job_dependencies(job)) for job in jobs)
+    for key, dependencies in iter(dag.items()):
+        for dependency in dependencies:
+            assert dependency in dag, "job {} depends on {}, which is not part of this benchmark".format(key, dependency)
+    return dag
+
+
+async def run_job_dag(jobs, run_job, parallel=1, priority=None):
+    '''
+    Runs every job in the list, starting a job as soon as all of its dependencies have completed.
+    At most `parallel` jobs run at once; when several jobs are ready, the one listed first goes first
+    (or the one with the lowest priority value, if given), so parallel=1 reproduces sequential
+    execution in list order.
+    If a job fails, no new jobs are started and the error is raised once the running jobs return.
+    If run_job returns False instead, the job failed without stopping the benchmark: the jobs that
+    depend on it are skipped and the rest keep running. Returns the keys of the skipped jobs.
+
+    :param jobs: job entries from get_benchmark_jobs_dict
+    :type jobs: list
+    :param run_job: coroutine function called with a job entry, returns when that job is done
+    :type run_job: function
+    :param parallel: maximum number of jobs running at the same time
+    :type parallel: int
+    :param priority: job key -> sort key, see get_job_priorities
+    :type priority: dict
+    '''
+    jobs_by_key = OrderedDict((job['key'], job) for job in jobs)
+    pending = build_job_dag(jobs)
+    done = set()
+    unrunnable = set()
+    skipped = []
+    running = {}
+    failure = None
+
+    while running or (pending and failure is None):
+        if failure is None:
+            ready = [key for key, dependencies in iter(pending.items()) if all(dependency in done for dependency in dependencies)]
+            if priority is not None:
+                ready.sort(key=priority.get)
+            for key in ready:
+                if len(running) >= parallel:
+                    break
+                running[asyncio.ensure_future(run_job(jobs_by_key[key]))] = key
+                del pending[key]
+        assert running, "jobs {} have unsatisfiable dependencies".format(list(pending.keys()))
+        finished, _ = await asyncio.wait(list(running.keys()), return_when=asyncio.FIRST_COMPLETED)
+        for task in finished:
+            key = running.pop(task)
+            if task.exception() is not None:
+                failure = failure or task.exception()
+            elif task.result() is False:
+                unrunnable.add(key)
+            else:
+                done.add(key)
+        # pending is in list order, so a job's dependencies are seen before the job
+        for key, dependencies in list(pending.items()):
+            if any(dependency in unrunnable for dependency in dependencies):
+                unrunnable.add(key)
+                skipped.append(key)
+                del pending[key]
+
+    if failure is not None:
+        raise failure
+    return skipped
+
+
+class JobStatusWatcher(object):
+    '''
+    Tracks the status of any number of jobs in a project from a single asyncio task.
+
+    Status changes are read from a change stream on db.jobs when the database supports it
+    (cryoSPARC's MongoDB runs as a replica set), so waiters wake up as soon as a job reaches
+    the status they are waiting for. The watched jobs are also polled with one query per
+    poll_interval, which is the only source of updates when change streams are unavailable.
+    '''
+
+    def __init__(self, db, project_uid, poll_interval=1.0, stream_poll_interval=10.0):
+        self.db = db
+        self.project_uid = project_uid
+        self.poll_interval = poll_interval
+        self.stream_poll_interval = stream_poll_interval
+        self.waiters = defaultdict(list)
+        self.statuses = {}
+        self.using_change_stream = False
+        self.loop = None
+        self.poll_task = None
+        self.stream_thread = None
+        self.closed = False
+
+    async def start(self):
+        self.loop = asyncio.get_event_loop()
+        self.stream_thread = threading.Thread(target=self._follow_change_stream, daemon=True)
+        self.stream_thread.start()
+        self.poll_task = asyncio.ensure_future(self._poll())
+
+    async def stop(self):
+        self.closed = True
+        if self.poll_task is not None:
+            self.poll_task.cancel()
+
+    async def wait(self, job_uid, statuses, timeout):
+        '''
+        Returns the status of the job once it is one of `statuses`, or its last known status
+        after `timeout` seconds.
+        '''
+        if self.statuses.get(job_uid) in statuses:
+            return self.statuses[job_uid]
+        future = self.loop.create_future()
+        self.waiters[job_uid].append((statuses, future))
+        self._check_now()
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return self.statuses.get(job_uid)
+        finally:
+            self.waiters[job_uid] = [waiter for waiter in self.waiters[job_uid] if waiter[1] is not future]
+            if not self.waiters[job_uid]:
+                del self.waiters[job_uid]
+
+    def _check_now(self):
+        # a newly watched job may already have finished, so check it without waiting for the next poll
+        asyncio.ensure_future(self._query(list(self.waiters.keys())))
+
+    def _update(self, job_uid, status):
+        self.statuses[job_uid] = status
+        for statuses, future in self.waiters.get(job_uid, []):
+            if status in statuses and not future.done():
+                future.set_result(status)
+
+    async def _query(self, job_uids):
+        if not job_uids:
+            return
+        query = {'project_uid' : self.project_uid, 'uid' : {'$in' : job_uids}}
+        docs = await self.loop.run_in_executor(None, lambda: list(self.db.jobs.find(query, {'uid' : 1, 'status' : 1})))
+        for doc in docs:
+            self._update(doc['uid'], doc['status'])
+
+    async def _poll(self):
+        while not self.closed:
+            await self._query(list(self.waiters.keys()))
+            await asyncio.sleep(self.stream_poll_interval if self.using_change_stream else self.poll_interval)
+
+    def _follow_change_stream(self):
+        pipeline = [{'$match' : {
+            'operationType' : {'$in' : ['update', 'replace']},
+            'fullDocument.project_uid' : self.project_uid,
+        }}]
+        try:
+            with self.db.jobs.watch(pipeline, full_document='updateLookup') as stream:
+                self.using_change_stream = True
+                for change in stream:
+                    if self.closed:
+                        break
+                    doc = change.get('fullDocument') or {}
+                    if 'uid' in doc and 'status' in doc:
+                        self.loop.call_soon_threadsafe(self._update, doc['uid'], doc['status'])
+        except Exception as e:
+            print (" Job change stream unavailable ({}), polling job status every {} seconds".format(e, self.poll_interval))
+        self.using_change_stream = False
+
+
+def get_job_gpu_demand(job_type, num_gpus):
+    '''
+    Returns how many of the num_gpus available GPUs a job of this type should be given.
+    '''
+    demand = JOB_TYPE_GPU_DEMAND.get(job_type, 1)
+    if demand is None:
+        demand = num_gpus
+    return min(demand, num_gpus)
+
+
+def get_job_num_gpus(job_info, num_gpus):
+    '''
+    Returns how many GPUs a job entry should be given: its own num_gpus if set
+    (e.g. by the GPU scaling study), otherwise the demand of its job type.
+    '''
+    if 'num_gpus' in job_info:
+        return min(job_info['num_gpus'], num_gpus)
+    return get_job_gpu_demand(job_info['job_type'], num_gpus)
+
+
+def is_multi_gpu_job_type(job_type):
+    '''
+    Returns whether jobs of job_type spread their work over all of the GPUs they are given.
+    '''
+    return job_type in JOB_TYPE_GPU_DEMAND and JOB_TYPE_GPU_DEMAND[job_type] is None
+
+
+def get_job_params(job_info, job_gpus):
+    '''
+    Returns the params to create a job with. Jobs that spread their work over several GPUs
+    are told to use all of the GPUs they were given through compute_num_gpus.
+    '''
+    params = dict(job_info.get('params', {}))
+    if is_multi_gpu_job_type(job_info['job_type']) and job_gpus and MULTI_GPU_PARAM not in params:
+        params[MULTI_GPU_PARAM] = len(job_gpus)
+    return params
+
+
+def get_scaling_gpu_counts(num_gpus):
+    '''
+    Returns the GPU counts for a scaling study on num_gpus GPUs: 1, 2, 4, ... and num_gpus itself.
+    '''
+    counts = []
+    count = 1
+    while count < num_gpus:
+        counts.append(count)
+        count *= 2
+    counts.append(num_gpus)
+    return counts
+
+
+def expand_gpu_scaling(jobs, job_key, gpu_counts):
+    '''
+    Replaces the job job_key with one copy per GPU count, keyed <job_key>_gpus<count>.
+    The copies share the inputs of the original, so the upstream jobs run once.
+    '''
+    expanded = []
+    for job_info in jobs:
+        if job_info['key'] != job_key:
+            expanded.append(job_info)
+            continue
+        for count in gpu_counts:
+            scaled_info = copy.deepcopy(job_info)
+            scaled_info['key'] = '{}_gpus{}'.format(job_key, count)
+            scaled_info['job_title'] = '{} ({} GPU{})'.format(job_info['job_title'], count, 's' if count > 1 else '')
+            scaled_info['num_gpus'] = count
+            expanded.append(scaled_info)
+    return expanded
+
+
+def fit_linear(xs, ys):
+    '''
+    Least squares fit of y = intercept + slope * x. Returns (slope, intercept, r2),
+    or None if there are fewer than two distinct x values.
+    '''
+    if len(set(xs)) < 2:
+        return None
+    x_mean = sum(xs) / float(len(xs))
+    y_mean = sum(ys) / float(len(ys))
+    sxx = sum((x - x_mean) ** 2 for x in xs)
+    slope = sum((x - x_mean) * (y - y_mean) for x, y in zip(xs, ys)) / sxx
+    intercept = y_mean - slope * x_mean
+    ss_total = sum((y - y_mean) ** 2 for y in ys)
+    ss_residual = sum((y - intercept - slope * x) ** 2 for x, y in zip(xs, ys))
+    r2 = 1.0 - ss_residual / ss_total if ss_total > 0 else 1.0
+    return slope, intercept, r2
+
+
+def fit_amdahl(runtimes):
+    '''
+    Fits Amdahl's law, T(n) = T(1) * (s + (1 - s) / n), to runtimes by GPU count n
+    with least squares on T(n) = a + b / n. Returns the serial fraction s, or None
+    if there are fewer than two GPU counts.
+    '''
+    fit = fit_linear([1.0 / n for n in runtimes], [runtimes[n] for n in runtimes])
+    if fit is None:
+        return None
+    b, a, _ = fit
+    if a + b <= 0:
+        return None
+    return min(1.0, max(0.0, a / (a + b)))
+
+
+def parse_sweep_values(text):
+    '''
+    Parses the values of a --sweep PARAM=VALUES argument: a comma separated list
+    (e.g. 50,100,200 or False,True or C1,C6), start..stop for powers of two multiples of start
+    (25..400 is 25,50,100,200,400) or start..stop:step for evenly spaced values.
+    '''
+    def parse_value(value):
+        value = value.strip()
+        for convert in (int, float):
+            try:
+                return convert(value)
+            except ValueError:
+                pass
+        if value in ('True', 'true'):
+            return True
+        if value in ('False', 'false'):
+            return False
+        return value
+
+    text = text.strip().lstrip('[').rstrip(']')
+    if '..' in text:
+        start, stop = text.split('..', 1)
+        step = None
+        if ':' in stop:
+            stop, step = stop.split(':', 1)
+        start, stop = parse_value(start), parse_value(stop)
+        step = parse_value(step) if step is not None else None
+        def is_number(value):
+            return isinstance(value, (int, float)) and not isinstance(value, bool)
+        assert is_number(start) and is_number(stop) and (step is None or is_number(step)), \
+            "invalid sweep range {}: start..stop[:step] takes numbers, list other values with commas".format(text)
+        assert 0 < start <= stop, "invalid sweep range {}: start must be positive and not above stop".format(text)
+        assert step is None or step > 0, "invalid sweep range {}: step must be positive".format(text)
+        values = []
+        value = start
+        while value <= stop:
+            values.append(value)
+            value = value + step if step is not None else value * 2
+        return values
+    return [parse_value(value) for value in text.split(',')]
+
+
+def expand_parameter_sweep(jobs, job_key, grid):
+    '''
+    Replaces the job job_key with one copy per point of the parameter grid (every combination
+    of the values of each swept parameter), keyed <job_key>_sweep<index>. Each copy records
+    the values it was run with in 'sweep_params'. The copies share the inputs of the original.
+
+    :param grid: parameter name -> list of values
+    :type grid: OrderedDict
+    '''
+    points = [OrderedDict()]
+    for name, values in iter(grid.items()):
+        points = [OrderedDict(list(point.items()) + [(name, value)]) for point in points for value in values]
+    expanded = []
+    for job_info in jobs:
+        if job_info['key'] != job_key:
+            expanded.append(job_info)
+            continue
+        for index, point in enumerate(points):
+            sweep_info = copy.deepcopy(job_info)
+            sweep_info['key'] = '{}_sweep{}'.format(job_key, index)
+            sweep_info['job_title'] = '{} ({})'.format(job_info['job_title'], ', '.join('{}={}'.format(name, value) for name, value in iter(point.items())))
+            sweep_info['params'].update(point)
+            sweep_info['sweep_params'] = point
+            expanded.append(sweep_info)
+    return expanded
+
+
+def fit_scaling_curve(xs, ys):
+    '''
+    Fits runtime against a numeric parameter both linearly (T = a + b * x) and as a
+    power law (T = a * x^b, fitted on log-log axes). Returns both fits with their R^2.
+    '''
+    curve = OrderedDict([('points', [[x, y] for x, y in sorted(zip(xs, ys))])])
+    linear = fit_linear(xs, ys)
+    if linear is not None:
+        curve['linear'] = OrderedDict([('slope', linear[0]), ('intercept', linear[1]), ('r2', linear[2])])
+    if all(x > 0 for x in xs) and all(y > 0 for y in ys):
+        power = fit_linear([math.log(x) for x in xs], [math.log(y) for y in ys])
+        if power is not None:
+            curve['power_law'] = OrderedDict([('exponent', power[0]), ('coefficient', math.exp(power[1])), ('r2', power[2])])
+    return curve
+
+
+def predict_runtime(curve, x):
+    '''
+    Predicts the runtime at parameter value x with whichever fit of the curve has the higher R^2.
+    '''
+    fits = []
+    if 'linear' in curve:
+        fits.append((curve['linear']['r2'], curve['linear']['intercept'] + curve['linear']['slope'] * x))
+    if 'power_law' in curve and x > 0:
+        fits.append((curve['power_law']['r2'], curve['power_law']['coefficient'] * x ** curve['power_law']['exponent']))
+    if not fits:
+        return None
+    return max(fits)[1]
+
+
+def summarize_parameter_sweep(points):
+    '''
+    Builds a scaling curve for every numeric swept parameter, with one curve per combination
+    of the other swept parameters' values.
+
+    :param points: list of (sweep_params, runtime)
+    :type points: list
+    '''
+    curves = []
+    names = list(points[0][0].keys()) if points else []
+    for name in names:
+        if not all(isinstance(params[name], (int, float)) and not isinstance(params[name], bool) for params, _ in points):
+            continue
+        groups = OrderedDict()
+        for params, runtime in points:
+            fixed = tuple((other, params[other]) for other in names if other != name)
+            groups.setdefault(fixed, []).append((params[name], runtime))
+        for fixed, values in iter(groups.items()):
+            curve = fit_scaling_curve([x for x, _ in values], [y for _, y in values])
+            if 'linear' not in curve:
+                continue
+            curve['parameter'] = name
+            curve['fixed'] = OrderedDict(fixed)
+            curves.append(curve)
+    return OrderedDict([('points', [OrderedDict([('params', params), ('runtime', runtime)]) for params, runtime in points]), ('curves', curves)])
+
+
+def summarize_gpu_scaling(runtimes):
+    '''
+    Returns speedup and parallel efficiency relative to the 1-GPU runtime, and the fitted
+    Amdahl serial fraction, from a dictionary of runtime by GPU count.
+    '''
+    baseline = runtimes.get(1)
+    table = OrderedDict()
+    for count in sorted(runtimes):
+        speedup = baseline / runtimes[count] if baseline and runtimes[count] else None
+        table[count] = OrderedDict([
+            ('runtime', runtimes[count]),
+            ('speedup', speedup),
+            ('efficiency', speedup / count if speedup is not None else None),
+        ])
+    return OrderedDict([('gpu_counts', table), ('amdahl_serial_fraction', fit_amdahl(runtimes))])
+
+
+class GpuPool(object):
+    '''
+    Hands out disjoint subsets of the benchmark GPUs to jobs running at the same time,
+    and records which GPUs were allocated to which job and when, by clock (time.time by default).
+    Must be created inside the event loop that runs the benchmark.
+    '''
+
+    def __init__(self, gpu_devidxs, clock=None):
+        self.gpu_devidxs = list(gpu_devidxs)
+        self.free_gpus = list(gpu_devidxs)
+        self.condition = asyncio.Condition()
+        self.clock = clock or time.time
+        self.start_time = self.clock()
+        self.allocations = []
+
+    async def acquire(self, count):
+        '''
+        Waits until `count` GPUs are free and returns their device indices.
+        '''
+        assert count <= len(self.gpu_devidxs), "cannot allocate {} of {} GPUs".format(count, len(self.gpu_devidxs))
+        async with self.condition:
+            await self.condition.wait_for(lambda: len(self.free_gpus) >= count)
+            gpus = self.free_gpus[:count]
+            del self.free_gpus[:count]
+        return gpus, self.clock()
+
+    async def acquire_gpus(self, gpus):
+        '''
+        Waits until the given GPUs are free and takes them, for jobs that were already placed on them.
+        '''
+        assert all(gpu in self.gpu_devidxs for gpu in gpus), "GPU(s) {} are not benchmark GPUs {}".format(gpus, self.gpu_devidxs)
+        async with self.condition:
+            await self.condition.wait_for(lambda: all(gpu in self.free_gpus for gpu in gpus))
+            for gpu in gpus:
+                self.free_gpus.remove(gpu)
+        return list(gpus), self.clock()
+
+    async def release(self, key, gpus, acquired_at):
+        async with self.condition:
+            self.allocations.append({'key' : key, 'gpus' : gpus, 'start' : acquired_at - self.start_time, 'end' : self.clock() - self.start_time})
+            self.free_gpus.extend(gpus)
+            self.free_gpus.sort(key=self.gpu_devidxs.index)
+            self.condition.notify_all()
+
+    def utilization_summary(self):
+        '''
+        Summarises GPU allocation over the lifetime of the pool: the fraction of GPU time
+        allocated to jobs overall and per GPU, and a timeline of the number of busy GPUs.
+        '''
+        wall_time = self.clock() - self.start_time
+        per_gpu = OrderedDict((gpu, 0.0) for gpu in self.gpu_devidxs)
+        changes = defaultdict(int)
+        for allocation in self.allocations:
+            if not allocation['gpus']:
+                continue
+            for gpu in allocation['gpus']:
+                per_gpu[gpu] += allocation['end'] - allocation['start']
+            changes[round(allocation['start'], 3)] += len(allocation['gpus'])
+            changes[round(allocation['end'], 3)] -= len(allocation['gpus'])
+        timeline = [[0.0, 0]]
+        busy = 0
+        for t in sorted(changes):
+            busy += changes[t]
+            if busy != timeline[-1][1]:
+                timeline.append([t, busy])
+        busy_gpu_seconds = sum(per_gpu.values())
+        return {
+            'num_gpus' : len(self.gpu_devidxs),
+            'wall_time' : wall_time,
+            'busy_gpu_seconds' : busy_gpu_seconds,
+            'utilization' : busy_gpu_seconds / (wall_time * len(self.gpu_devidxs)) if wall_time > 0 and self.gpu_devidxs else 0.0,
+            'per_gpu' : OrderedDict((str(gpu), seconds / wall_time if wall_time > 0 else 0.0) for gpu, seconds in iter(per_gpu.items())),
+            'timeline' : timeline,
+        }
+
+
+# Streamlog lines that mark the start of an iteration (or of the next unit of work
+# for jobs that process movies / micrographs one at a time).
+STREAMLOG_ITERATION_PATTERNS = [
+    re.compile(r'^\s*(?:-+\s*)?(?:start of\s+)?iteration\s+(\d+)', re.IGNORECASE),
+    re.compile(r'^\s*(?:-+\s*)?(?:[\d.]+:\s*)?processing\s+(\d+)\s+of\s+\d+', re.IGNORECASE),
+]
+
+# A running job is a straggler when its recent iterations, or the one in progress, take
+# straggler_factor times longer than its earlier iterations did (and at least STRAGGLER_MIN_SECONDS)
+STRAGGLER_CHECK_INTERVAL = 30.0
+STRAGGLER_MIN_SECONDS = 60.0
+STRAGGLER_WINDOW = 3
+
+
+class StreamlogAnalyzer(object):
+    '''
+    Splits a job's runtime into phases using the job's status timestamps and the
+    created_at times of its text streamlog events:
+
+        queue_wait  queued_at   -> launched_at
+        launch      launched_at -> started_at
+        setup       started_at  -> first iteration (data loading, SSD cache copy, ...)
+        iterations  first iteration -> start of the last iteration
+        finalize    start of the last iteration -> completed_at (last iteration and output writing)
+
+    Iterations whose duration is far from the median (modified z-score above
+    outlier_threshold) are reported as outliers.
+    '''
+
+    def __init__(self, outlier_threshold=3.5):
+        self.outlier_threshold = outlier_threshold
+        self.iteration_starts = []
+        self.num_events = 0
+
+    def add_event(self, created_at, text):
+        self.num_events += 1
+        for pattern in STREAMLOG_ITERATION_PATTERNS:
+            if pattern.match(text):
+                self.iteration_starts.append(created_at)
+                break
+
+    def check_progress(self, expected, straggler_factor, now, min_seconds=STRAGGLER_MIN_SECONDS, window=STRAGGLER_WINDOW):
+        '''
+        Returns why the job is a straggler compared to its expected iteration and finalize times,
+        or None if it isn't: the median of its last `window` iterations took more than straggler_factor
+        times the expected iteration time, or the iteration still in progress at `now` (which may be
+        the last one, followed by the finalize phase) has taken straggler_factor times longer than both.
+        '''
+        iteration_limit = max(min_seconds, straggler_factor * expected['iteration'])
+        iteration_times = [(b - a).total_seconds() for a, b in zip(self.iteration_starts, self.iteration_starts[1:])]
+        if len(iteration_times) >= window and median(iteration_times[-window:]) > iteration_limit:
+            return "iterations take {:.0f} seconds, {:.1f}x the {:.0f} seconds of earlier runs".format(
+                median(iteration_times[-window:]), median(iteration_times[-window:]) / expected['iteration'], expected['iteration'])
+        in_progress_limit = max(min_seconds, straggler_factor * (expected['iteration'] + (expected['finalize'] or 0)))
+        if self.iteration_starts and (now - self.iteration_starts[-1]).total_seconds() > in_progress_limit:
+            return "no new iteration for {:.0f} seconds, iterations took {:.0f} seconds in earlier runs".format(
+                (now - self.iteration_starts[-1]).total_seconds(), expected['iteration'])
+        return None
+
+    def summary(self, job_timestamps):
+        '''
+        :param job_timestamps: the job document's queued_at, launched_at, started_at and completed_at
+        :type job_timestamps: dict
+        '''
+        def seconds(start, end):
+            if start is None or end is None:
+                return None
+            return (end - start).total_seconds()
+
+        queued_at = job_timestamps.get('queued_at')
+        launched_at = job_timestamps.get('launched_at')
+        started_at = job_timestamps.get('started_at')
+        completed_at = job_timestamps.get('completed_at')
+        first_iteration = self.iteration_starts[0] if self.iteration_starts else None
+        last_iteration = self.iteration_starts[-1] if self.iteration_starts else None
+        iteration_times = [seconds(a, b) for a, b in zip(self.iteration_starts, self.iteration_starts[1:])]
+
+        outliers = []
+        if len(iteration_times) >= 3:
+            center = median(iteration_times)
+            deviation = median([abs(t - center) for t in iteration_times])
+            for index, t in enumerate(iteration_times):
+                if deviation > 0:
+                    score = 0.6745 * (t - center) / deviation
+                elif t != center:
+                    score = float('inf') if t > center else float('-inf')
+                else:
+                    score = 0.0
+                if abs(score) > self.outlier_threshold:
+                    outliers.append({'iteration' : index, 'seconds' : t, 'median_seconds' : center})
+
+        return OrderedDict([
+            ('queue_wait', seconds(queued_at, launched_at or started_at)),
+            ('launch', seconds(launched_at, started_at)),
+            ('setup', seconds(started_at, first_iteration or completed_at)),
+            ('iterations', seconds(first_iteration, last_iteration)),
+            ('finalize', seconds(last_iteration, completed_at)),
+            ('num_iterations', len(self.iteration_starts)),
+            ('iteration_median', median(iteration_times)),
+            ('iteration_times', iteration_times),
+            ('outlier_iterations', outliers),
+            ('num_events', self.num_events),
+        ])
+
+
+class StreamlogExporter(object):
+    '''
+    Copies a job's text streamlog events from the database to a file while the job runs.
+    Must be created inside the event loop that runs the benchmark.
+
+    Every interval seconds, the events created since the last one written are read with a
+    projected cursor in batches of batch_size and appended to the file (gzip-compressed if
+    compress is set), so the export never holds a job's whole streamlog in memory and only
+    a small remainder is left to copy once the job completes. Each event is also passed to
+    the analyzer as it is written.
+    '''
+
+    def __init__(self, db, project_uid, job_uid, path, analyzer, batch_size=1000, compress=False, interval=5.0):
+        self.db = db
+        self.query = {'project_uid' : project_uid, 'job_uid' : job_uid, 'type' : 'text'}
+        self.path = path + '.gz' if compress else path
+        self.analyzer = analyzer
+        self.batch_size = batch_size
+        self.compress = compress
+        self.interval = interval
+        self.last_id = None
+        self.num_events = 0
+        self.stopped = asyncio.Event()
+
+    def drain(self, openfile):
+        query = dict(self.query)
+        if self.last_id is not None:
+            query['_id'] = {'$gt' : self.last_id}
+        cursor = self.db.events.find(query, {'_id' : 1, 'created_at' : 1, 'text' : 1}).sort('_id', 1).batch_size(self.batch_size)
+        for event in cursor:
+            openfile.write("%s  %s\n"%(str(event['created_at']), event['text'].strip('\n')))
+            self.analyzer.add_event(event['created_at'], event['text'])
+            self.last_id = event['_id']
+            self.num_events += 1
+        openfile.flush()
+
+    async def follow(self):
+        '''
+        Exports events until stop() is called, then writes the remaining events and closes the file.
+        '''
+        openfile = gzip.open(self.path, 'wt') if self.compress else open(self.path, 'w')
+        try:
+            while not self.stopped.is_set():
+                await run_blocking(self.drain, openfile)
+                try:
+                    await asyncio.wait_for(self.stopped.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+            await run_blocking(self.drain, openfile)
+        finally:
+            openfile.close()
+
+    def stop(self):
+        self.stopped.set()
+
+
+def find_block_device(path, proc_root='/proc'):
+    '''
+    Returns the /proc/diskstats name of the block device holding path,
+    or None if the path doesn't exist or isn't on a local block device (e.g. NFS, overlay).
+    '''
+    try:
+        st = os.stat(path)
+        with open(os.path.join(proc_root, 'diskstats')) as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) > 3 and int(fields[0]) == os.major(st.st_dev) and int(fields[1]) == os.minor(st.st_dev):
+                    return fields[2]
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+class HostTelemetrySampler(object):
+    '''
+    Samples host CPU, memory, disk and network counters from /proc every interval seconds
+    in a background thread, tagging each sample with the benchmark jobs running at the time.
+
+    Disk throughput is recorded for the block devices holding the given paths
+    (e.g. the input data directory and the SSD cache). Samples are kept as columns
+    and written as a compact JSON object of equal-length arrays.
+
+    :param paths: label -> path whose block device should be sampled
+    :type paths: dict
+    :param proc_root: root of the /proc tree to read, so a fake tree can be used for testing
+    :type proc_root: str
+    '''
+
+    def __init__(self, paths, interval=5.0, proc_root='/proc'):
+        self.interval = interval
+        self.proc_root = proc_root
+        self.devices = OrderedDict()
+        for label, path in iter(paths.items()):
+            device = find_block_device(path, proc_root) if path else None
+            if device is not None:
+                self.devices.setdefault(device, []).append(label)
+        self.columns = OrderedDict()
+        self.running = set()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.previous = None
+        self.start_time = None
+
+    def job_started(self, key):
+        with self.lock:
+            self.running.add(key)
+
+    def job_finished(self, key):
+        with self.lock:
+            self.running.discard(key)
+
+    def read_counters(self):
+        counters = {'time' : time.time()}
+
+        with open(os.path.join(self.proc_root, 'stat')) as f:
+            cpu = [int(v) for v in f.readline().split()[1:]]
+        counters['cpu_total'] = sum(cpu[:8])
+        counters['cpu_idle'] = cpu[3]
+        counters['cpu_iowait'] = cpu[4] if len(cpu) > 4 else 0
+
+        meminfo = {}
+        with open(os.path.join(self.proc_root, 'meminfo')) as f:
+            for line in f:
+                name, value = line.split(':', 1)
+                meminfo[name] = int(value.split()[0]) * 1024
+        counters['mem_used_bytes'] = meminfo['MemTotal'] - meminfo.get('MemAvailable', meminfo.get('MemFree', 0))
+        counters['mem_cached_bytes'] = meminfo.get('Cached', 0)
+
+        with open(os.path.join(self.proc_root, 'diskstats')) as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) > 9 and fields[2] in self.devices:
+                    counters['disk_{}_read_bytes'.format(fields[2])] = int(fields[5]) * 512
+                    counters['disk_{}_write_bytes'.format(fields[2])] = int(fields[9]) * 512
+
+        rx_bytes = tx_bytes = 0
+        with open(os.path.join(self.proc_root, 'net', 'dev')) as f:
+            for line in f:
+                if ':' not in line:
+                    continue
+                interface, values = line.split(':', 1)
+                if interface.strip() == 'lo':
+                    continue
+                values = values.split()
+                rx_bytes += int(values[0])
+                tx_bytes += int(values[8])
+        counters['net_rx_bytes'] = rx_bytes
+        counters['net_tx_bytes'] = tx_bytes
+        return counters
+
+    def sample(self):
+        '''
+        Reads the counters and appends one row of rates since the previous sample.
+        The first call only records the baseline.
+        '''
+        current = self.read_counters()
+        previous, self.previous = self.previous, current
+        if previous is None:
+            self.start_time = current['time']
+            return
+        elapsed = current['time'] - previous['time']
+        if elapsed <= 0:
+            return
+        cpu_total = current['cpu_total'] - previous['cpu_total']
+        with self.lock:
+            running = '+'.join(sorted(self.running))
+        row = OrderedDict([
+            ('time', round(current['time'] - self.start_time, 3)),
+            ('running', running),
+            ('cpu_busy', 1.0 - (current['cpu_idle'] + current['cpu_iowait'] - previous['cpu_idle'] - previous['cpu_iowait']) / cpu_total if cpu_total > 0 else 0.0),
+            ('cpu_iowait', (current['cpu_iowait'] - previous['cpu_iowait']) / cpu_total if cpu_total > 0 else 0.0),
+            ('mem_used_bytes', current['mem_used_bytes']),
+            ('mem_cached_bytes', current['mem_cached_bytes']),
+        ])
+        for name in sorted(current):
+            if name.startswith('disk_') or name.startswith('net_'):
+                row[name + '_per_s'] = (current[name] - previous.get(name, current[name])) / elapsed
+        for name, value in iter(row.items()):
+            self.columns.setdefault(name, []).append(round(value, 4) if isinstance(value, float) else value)
+
+    def run(self):
+        self.sample()
+        while not self.stopped.wait(self.interval):
+            self.sample()
+        self.sample()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            json.dump({
+                'interval' : self.interval,
+                'devices' : self.devices,
+                'columns' : self.columns,
+            }, f, separators=(',', ':'))
+
+
+# Job parameters that point at input files on disk
+INPUT_PATH_PARAMS = ['blob_paths', 'gainref_path', 'particle_meta_path', 'particle_blob_path', 'volume_blob_path']
+
+# Below these rates (MB/s), reading inputs or writing outputs is likely to dominate job runtimes
+MIN_SEQUENTIAL_READ_MB_S = 500
+MIN_RANDOM_READ_MB_S = 50
+MIN_WRITE_MB_S = 300
+
+
+def get_input_files(jobs):
+    '''
+    Returns the sorted list of existing files referenced by the input path parameters of the jobs,
+    expanding wildcards and listing the files directly inside referenced directories.
+    '''
+    files = set()
+    for job_info in jobs:
+        for param in INPUT_PATH_PARAMS:
+            pattern = job_info.get('params', {}).get(param)
+            if not pattern:
+                continue
+            for path in glob.glob(pattern):
+                if os.path.isdir(path):
+                    files.update(os.path.join(path, name) for name in os.listdir(path) if os.path.isfile(os.path.join(path, name)))
+                elif os.path.isfile(path):
+                    files.add(path)
+    return sorted(files)
+
+
+def drop_from_page_cache(path):
+    '''
+    Asks the kernel to evict a file's pages from the page cache. Returns False if that isn't possible.
+    '''
+    try:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+        return True
+    except (OSError, AttributeError):
+        return False
+
+
+def measure_sequential_read(paths, max_bytes, block_size=4 * 1024 * 1024):
+    '''
+    Reads the files front to back, up to max_bytes in total, and returns (bytes read, seconds).
+    '''
+    total = 0
+    start = time.time()
+    for path in paths:
+        with open(path, 'rb', buffering=0) as f:
+            while total < max_bytes:
+                data = f.read(min(block_size, max_bytes - total))
+                if not data:
+                    break
+                total += len(data)
+        if total >= max_bytes:
+            break
+    return total, time.time() - start
+
+
+def measure_random_read(paths, num_reads, block_size=64 * 1024, seed=0):
+    '''
+    Reads num_reads blocks at random offsets across the files and returns (bytes read, seconds).
+    '''
+    rng = random.Random(seed)
+    sizes = [(path, os.path.getsize(path)) for path in paths]
+    sizes = [(path, size) for path, size in sizes if size >= block_size]
+    if not sizes:
+        return 0, 0.0
+    total = 0
+    start = time.time()
+    for _ in range(num_reads):
+        path, size = rng.choice(sizes)
+        with open(path, 'rb', buffering=0) as f:
+            f.seek(rng.randrange(0, size - block_size + 1))
+            total += len(f.read(block_size))
+    return total, time.time() - start
+
+
+def measure_write(directory, num_bytes, block_size=4 * 1024 * 1024):
+    '''
+    Writes num_bytes to a scratch file in directory, fsyncs and removes it. Returns (bytes written, seconds).
+    '''
+    path = os.path.join(directory, '.cryosparc_benchmark_io_{}'.format(os.getpid()))
+    block = os.urandom(block_size)
+    total = 0
+    start = time.time()
+    try:
+        with open(path, 'wb') as f:
+            while total < num_bytes:
+                total += f.write(block[:min(block_size, num_bytes - total)])
+            f.flush()
+            os.fsync(f.fileno())
+        return total, time.time() - start
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def run_io_preflight(jobs, write_dirs, max_bytes=1024 * 1024 * 1024, random_reads=2000):
+    '''
+    Measures how fast the benchmark's input files can be read (sequentially and at random offsets,
+    after dropping them from the page cache where permitted) and how fast the given directories
+    can be written. Returns the measurements and a list of warnings for storage that is slow
+    enough to dominate job runtimes.
+
+    :param write_dirs: label -> directory to measure write throughput in
+    :type write_dirs: dict
+    '''
+    def rate(num_bytes, seconds):
+        return num_bytes / seconds / 1e6 if seconds > 0 else None
+
+    files = get_input_files(jobs)
+    result = OrderedDict([('num_input_files', len(files)), ('input_bytes', sum(os.path.getsize(path) for path in files))])
+    warnings = []
+    if files:
+        cache_dropped = all([drop_from_page_cache(path) for path in files])
+        result['page_cache_dropped'] = cache_dropped
+        num_bytes, seconds = measure_sequential_read(files, max_bytes)
+        result['sequential_read_MB_s'] = rate(num_bytes, seconds)
+        if cache_dropped:
+            for path in files:
+                drop_from_page_cache(path)
+        num_bytes, seconds = measure_random_read(files, random_reads)
+        result['random_read_MB_s'] = rate(num_bytes, seconds)
+        if cache_dropped:
+            # leave the probed files uncached, so the first jobs still read them cold
+            for path in files:
+                drop_from_page_cache(path)
+        if result['sequential_read_MB_s'] is not None:
+            result['estimated_input_read_seconds'] = result['input_bytes'] / 1e6 / result['sequential_read_MB_s']
+            if result['sequential_read_MB_s'] < MIN_SEQUENTIAL_READ_MB_S:
+                warnings.append("sequential reads of the input data run at {:.0f} MB/s (reading all {:.1f} GB takes about {:.0f} seconds)".format(
+                    result['sequential_read_MB_s'], result['input_bytes'] / 1e9, result['estimated_input_read_seconds']))
+        if result['random_read_MB_s'] is not None and result['random_read_MB_s'] < MIN_RANDOM_READ_MB_S:
+            warnings.append("random reads of the input data run at {:.0f} MB/s".format(result['random_read_MB_s']))
+    else:
+        warnings.append("no input files found for the selected jobs")
+
+    result['write_MB_s'] = OrderedDict()
+    for label, directory in iter(write_dirs.items()):
+        if not directory or not os.path.isdir(directory):
+            continue
+        try:
+            num_bytes, seconds = measure_write(directory, min(max_bytes, 256 * 1024 * 1024))
+        except OSError as e:
+            warnings.append("could not write to {} ({}): {}".format(label, directory, e))
+            continue
+        result['write_MB_s'][label] = rate(num_bytes, seconds)
+        if result['write_MB_s'][label] is not None and result['write_MB_s'][label] < MIN_WRITE_MB_S:
+            warnings.append("writes to {} ({}) run at {:.0f} MB/s".format(label, directory, result['write_MB_s'][label]))
+    result['warnings'] = warnings
+    return result
+
+
+def read_into_page_cache(path, block_size=16 * 1024 * 1024):
+    '''
+    Reads a whole file so that it ends up in the page cache. Returns the number of bytes read.
+    '''
+    total = 0
+    with open(path, 'rb', buffering=0) as f:
+        try:
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+        except (OSError, AttributeError):
+            pass
+        while True:
+            data = f.read(block_size)
+            if not data:
+                break
+            total += len(data)
+    return total
+
+
+def prepare_page_cache(paths, cache_state, num_threads=8):
+    '''
+    Puts the files into a known page cache state before the timed jobs run:
+    'warm' reads every file in parallel so it is cached, 'cold' evicts every file from the cache.
+    Returns a record of what was done, to be stored with the results.
+    '''
+    start = time.time()
+    result = OrderedDict([('mode', cache_state), ('num_files', len(paths))])
+    if cache_state == 'warm':
+        with ThreadPoolExecutor(max_workers=num_threads) as executor:
+            result['bytes_read'] = sum(executor.map(read_into_page_cache, paths))
+    elif cache_state == 'cold':
+        # eviction needs no root access, but pages mapped by other processes can stay cached
+        result['all_evicted'] = all([drop_from_page_cache(path) for path in paths])
+    result['seconds'] = time.time() - start
+    return result
+
+
+# Job parameter that makes a job copy its particles to the worker's SSD cache before processing them
+SSD_CACHE_PARAM = 'compute_use_ssd'
+
+
+def get_ssd_path():
+    return os.environ.get('CRYOSPARC_SSD_PATH', os.environ.get('SSDPATH'))
+
+
+def expand_ssd_cache_runs(jobs, keys=None):
+    '''
+    Adds two runs with the SSD cache enabled after every job that has a compute_use_ssd parameter
+    (only the jobs in keys, if given): <key>_ssd_cold, which fills the cache, then <key>_ssd_warm,
+    which reads from it. The original job still runs without the cache, first.
+
+    The particles of the SSD runs come from a fresh copy of the import job they are read from
+    (<import key>_for_<key>), as the cache is keyed by file path and the original import's particles
+    may already be cached. Jobs whose particles come from another job (e.g. a refinement) read the
+    same files as that job, so their cold run may find them cached already.
+    '''
+    imports = dict((job_info['key'], job_info) for job_info in jobs if job_info['job_type'] == 'import_particles')
+    expanded = []
+    for job_info in jobs:
+        expanded.append(job_info)
+        if SSD_CACHE_PARAM not in job_info.get('params', {}) or (keys is not None and job_info['key'] not in keys):
+            continue
+        key = job_info['key']
+        fresh_imports = {}
+        for connects in job_info.get('input_group_connects', {}).values():
+            for connect in connects:
+                import_key = connect['input_job_name']
+                if import_key in imports and import_key not in fresh_imports:
+                    fresh_info = copy.deepcopy(imports[import_key])
+                    fresh_info['key'] = '{}_for_{}'.format(import_key, key)
+                    fresh_info['job_title'] = '{} (for {} SSD cache runs)'.format(fresh_info['job_title'], key)
+                    fresh_info['ssd_cache_run'] = 'fresh_import'
+                    fresh_imports[import_key] = fresh_info['key']
+                    expanded.append(fresh_info)
+        previous = key
+        for state in ['cold', 'warm']:
+            ssd_info = copy.deepcopy(job_info)
+            ssd_info['key'] = '{}_ssd_{}'.format(key, state)
+            ssd_info['job_title'] = '{} (SSD cache {})'.format(job_info['job_title'], state)
+            ssd_info['params'][SSD_CACHE_PARAM] = True
+            ssd_info['ssd_cache_run'] = state
+            for connects in ssd_info.get('input_group_connects', {}).values():
+                for connect in connects:
+                    connect['input_job_name'] = fresh_imports.get(connect['input_job_name'], connect['input_job_name'])
+            # runs one after the other, so the warm run finds what the cold run cached
+            ssd_info['setup_requires'] = [fresh_imports.get(dependency, dependency) for dependency in job_info['setup_requires']] + [previous]
+            previous = ssd_info['key']
+            expanded.append(ssd_info)
+    return expanded
+
+
+def snapshot_ssd_cache(ssd_path):
+    '''
+    Returns relative path -> (size, mtime) for every file under the SSD cache directory.
+    '''
+    snapshot = {}
+    for root, _, names in os.walk(ssd_path):
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                st = os.lstat(path)
+            except OSError:
+                continue
+            snapshot[os.path.relpath(path, ssd_path)] = (st.st_size, st.st_mtime)
+    return snapshot
+
+
+def get_epoch_seconds(timestamp):
+    '''
+    Seconds since the epoch of a job timestamp from the database, which stores UTC times.
+    '''
+    if timestamp.tzinfo is None:
+        return (timestamp - datetime.datetime(1970, 1, 1)).total_seconds()
+    return timestamp.timestamp()
+
+
+def diff_ssd_cache(before, after, started_at=None):
+    '''
+    Compares two snapshots of the SSD cache: the bytes and files added or grown in between,
+    the bytes removed (evicted), the cache size after, and, given the epoch time the job started,
+    how long after the start the last cached file was written (the time it took to fill the cache).
+    '''
+    added_bytes = 0
+    added_files = 0
+    last_write = None
+    for path, (size, mtime) in iter(after.items()):
+        old_size, old_mtime = before.get(path, (0, None))
+        if size > old_size or (old_mtime is not None and mtime != old_mtime):
+            added_bytes += max(0, size - old_size)
+            added_files += 1
+            last_write = mtime if last_write is None else max(last_write, mtime)
+    removed_bytes = sum(size for path, (size, _) in iter(before.items()) if path not in after)
+    fill_seconds = None
+    if started_at is not None and last_write is not None:
+        fill_seconds = max(0.0, last_write - started_at)
+    return OrderedDict([
+        ('bytes_copied', added_bytes),
+        ('files_copied', added_files),
+        ('bytes_evicted', removed_bytes),
+        ('cache_bytes', sum(size for size, _ in after.values())),
+        ('fill_seconds', fill_seconds),
+    ])
+
+
+def summarize_ssd_cache(jobs, timings, ssd_cache_usage):
+    '''
+    Returns, for each job run with and without the SSD cache, the runtimes without the cache,
+    with a cold cache and with a warm one, what the cold run copied, and the warm run's speedup.
+    '''
+    summary = OrderedDict()
+    for job_info in jobs:
+        if job_info.get('ssd_cache_run') != 'cold':
+            continue
+        key = job_info['key'][:-len('_ssd_cold')]
+        cold_key, warm_key = key + '_ssd_cold', key + '_ssd_warm'
+        row = OrderedDict([
+            ('job_type', job_info['job_type']),
+            ('no_cache', timings.get(key)),
+            ('cold', timings.get(cold_key)),
+            ('warm', timings.get(warm_key)),
+            ('cold_cache', ssd_cache_usage.get(cold_key)),
+            ('warm_cache', ssd_cache_usage.get(warm_key)),
+        ])
+        row['speedup'] = row['no_cache'] / row['warm'] if row['no_cache'] and row['warm'] else None
+        row['cold_overhead'] = row['cold'] / row['no_cache'] if row['cold'] and row['no_cache'] else None
+        # the cold run copied nothing: the particles were cached before it started
+        row['cold_was_cached'] = bool(row['cold_cache']) and row['cold_cache']['bytes_copied'] == 0
+        summary[key] = row
+    return summary
+
+
+def select_evenly(items, count):
+    '''
+    Returns count items spread evenly over the list (all of them if count >= len(items)),
+    so that a subset covers the whole acquisition rather than just its start.
+    '''
+    return [item for index, item in enumerate(items) if is_selected(index, len(items), count)]
+
+
+def is_selected(index, total, count):
+    '''
+    Whether item index of total is one of count evenly spread items, decided without seeing the other items.
+    '''
+    return (index + 1) * count // total > index * count // total
+
+
+def get_subset_count(total, fraction=None, maximum=None):
+    count = total
+    if fraction is not None:
+        count = min(count, int(math.ceil(total * fraction)))
+    if maximum is not None:
+        count = min(count, maximum)
+    return max(1, count) if total else 0
+
+
+def symlink_into(source, link_path):
+    '''
+    Links link_path to source, replacing an earlier link. The data itself is never copied.
+    '''
+    mkdir_p(os.path.dirname(link_path))
+    if os.path.lexists(link_path):
+        os.remove(link_path)
+    os.symlink(os.path.abspath(source), link_path)
+
+
+def iter_star_lines(f):
+    '''
+    Streams a STAR file, yielding (line, columns, is_row) where columns are the column names
+    of the loop the line belongs to and is_row is True for the data rows of a loop.
+    '''
+    columns = []
+    in_loop = False
+    for line in f:
+        stripped = line.strip()
+        if stripped.startswith('data_'):
+            columns, in_loop = [], False
+        elif stripped == 'loop_':
+            columns, in_loop = [], True
+        elif in_loop and stripped.startswith('_'):
+            columns.append(stripped.split()[0][1:])
+        elif in_loop and stripped and not stripped.startswith('#'):
+            yield line, columns, True
+            continue
+        yield line, columns, False
+
+
+def subset_star_file(source, destination, fraction=None, max_particles=None):
+    '''
+    Writes destination with an evenly spread subset of the particles of the STAR file source,
+    streaming through the file twice (once to count the particles) so it is never held in memory.
+    Lines other than the particle rows are copied unchanged.
+
+    :returns: (particles kept, particles in source, paths of the stacks the kept particles are in)
+    '''
+    total = 0
+    with open(source) as f:
+        for _, columns, is_row in iter_star_lines(f):
+            if is_row and 'rlnImageName' in columns:
+                total += 1
+    count = get_subset_count(total, fraction, max_particles)
+
+    index = 0
+    stacks = set()
+    with open(source) as f, open(destination, 'w') as out:
+        for line, columns, is_row in iter_star_lines(f):
+            if is_row and 'rlnImageName' in columns:
+                keep = is_selected(index, total, count)
+                index += 1
+                if not keep:
+                    continue
+                image_name = line.split()[columns.index('rlnImageName')]
+                stacks.add(image_name.split('@', 1)[-1])
+            out.write(line)
+    return count, total, stacks
+
+
+def make_input_subset(jobs, subset_dir, fraction=None, max_particles=None, max_movies=None):
+    '''
+    Returns a copy of the jobs whose import jobs read only part of the data, and a summary of
+    how much was kept. Movie imports get an evenly spread subset of their movies (max_movies is
+    shared between the movie imports in proportion to their size, keeping at least one movie
+    for each), particle imports an evenly spread subset of the particles of their STAR file.
+    Only the files that are needed are symlinked into subset_dir; the STAR files are rewritten there.
+    '''
+    subset_dir = os.path.abspath(subset_dir)
+    summary = OrderedDict([
+        ('fraction_requested', fraction),
+        ('max_particles', max_particles),
+        ('max_movies', max_movies),
+        ('subset_dir', subset_dir),
+        ('imports', OrderedDict()),
+    ])
+    movies = OrderedDict()
+    for job_info in jobs:
+        if job_info['job_type'] == 'import_movies':
+            movies[job_info['key']] = sorted(glob.glob(job_info['params']['blob_paths']))
+    total_movies = sum(len(paths) for paths in movies.values())
+
+    subset_jobs = []
+    for job_info in jobs:
+        job_info = copy.deepcopy(job_info)
+        key = job_info['key']
+        params = job_info.get('params', {})
+        link_dir = os.path.join(subset_dir, key)
+        if job_info['job_type'] == 'import_movies':
+            share = None
+            if max_movies is not None:
+                share = max_movies * len(movies[key]) // total_movies
+            kept = select_evenly(movies[key], get_subset_count(len(movies[key]), fraction, share))
+            for path in kept:
+                symlink_into(path, os.path.join(link_dir, os.path.basename(path)))
+            params['blob_paths'] = os.path.join(link_dir, os.path.basename(params['blob_paths']))
+            summary['imports'][key] = OrderedDict([('kept', len(kept)), ('total', len(movies[key]))])
+        elif job_info['job_type'] == 'import_particles':
+            mkdir_p(link_dir)
+            meta_path = os.path.join(link_dir, os.path.basename(params['particle_meta_path']))
+            kept, total, stacks = subset_star_file(params['particle_meta_path'], meta_path, fraction, max_particles)
+            blob_dir = params.get('particle_blob_path') or os.path.dirname(params['particle_meta_path'])
+            for stack in stacks:
+                # absolute stack paths are read from where they are
+                if not os.path.isabs(stack):
+                    symlink_into(os.path.join(blob_dir, stack), os.path.join(link_dir, stack))
+            params['particle_meta_path'] = meta_path
+            params['particle_blob_path'] = link_dir
+            summary['imports'][key] = OrderedDict([('kept', kept), ('total', total), ('stacks', len(stacks))])
+        else:
+            subset_jobs.append(job_info)
+            continue
+        counts = summary['imports'][key]
+        counts['fraction'] = counts['kept'] / float(counts['total']) if counts['total'] else None
+        subset_jobs.append(job_info)
+
+    kept = sum(counts['kept'] for counts in summary['imports'].values())
+    total = sum(counts['total'] for counts in summary['imports'].values())
+    summary['fraction'] = kept / float(total) if total else None
+    return subset_jobs, summary
+
+
+def get_job_content_key(job_type, params, input_group_connects, version):
+    '''
+    Returns a hash identifying what a job computes: its type, the parameters set on it,
+    the outputs it takes as inputs and the cryoSPARC version. Two jobs with the same key
+    produce interchangeable outputs. Input paths, and therefore the dataset, are part of the params.
+    The number of GPUs a job runs on doesn't change its outputs, so compute_num_gpus is left out.
+    '''
+    params = sorted((name, value) for name, value in iter(params.items()) if name != MULTI_GPU_PARAM)
+    connects = sorted((name, sorted(groups)) for name, groups in iter(input_group_connects.items()) if groups)
+    content = json.dumps([job_type, version, params, connects], sort_keys=True, default=str)
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+def get_reusable_keys(jobs, job=None, measured_keys=None):
+    '''
+    Returns the keys of the jobs that may be taken from earlier runs: imports, and in job only
+    mode everything the selected job depends on. The jobs being measured never are: the selected
+    job, its GPU scaling and sweep copies (measured_keys) and the SSD cache runs.
+    '''
+    measured_keys = set(measured_keys or [])
+    reusable_keys = set()
+    for job_info in jobs:
+        key = split_repeat_key(job_info['key'])[0]
+        if key == job or key in measured_keys or 'ssd_cache_run' in job_info or 'num_gpus' in job_info or 'sweep_params' in job_info:
+            continue
+        if 'import' in job_info['job_type'] or job:
+            reusable_keys.add(job_info['key'])
+    return reusable_keys
+
+
+def find_reusable_jobs(db, project_uid, job_types):
+    '''
+    Returns a dictionary mapping content key to the uid of the most recently completed job
+    with that key, over the completed jobs of the given types in the project.
+    '''
+    docs = db.jobs.find(
+        {'project_uid' : project_uid, 'job_type' : {'$in' : list(job_types)}, 'status' : 'completed'},
+        {'uid' : 1, 'job_type' : 1, 'params_spec' : 1, 'input_slot_groups' : 1, 'version' : 1, 'completed_at' : 1, 'deleted' : 1})
+    index = {}
+    for doc in sorted(docs, key=lambda doc: doc.get('completed_at') or datetime.datetime.min):
+        if doc.get('deleted'):
+            continue
+        params = dict((name, spec['value']) for name, spec in iter((doc.get('params_spec') or {}).items()))
+        input_group_connects = defaultdict(list)
+        for group in doc.get('input_slot_groups') or []:
+            for connection in group.get('connections', []):
+                input_group_connects[group['name']].append('{}.{}'.format(connection['job_uid'], connection['group_name']))
+        index[get_job_content_key(doc['job_type'], params, input_group_connects, doc.get('version'))] = doc['uid']
+    return index
+
+
+def find_child_jobs(db, project_uid, created_after, exclude_uids=()):
+    '''
+    Returns the jobs of the project created after a job that creates and queues jobs itself
+    (e.g. the extensive workflow), oldest first, leaving out exclude_uids (the benchmark's own jobs).
+    The project should be used by the benchmark only, as other users' jobs would be counted too.
+    '''
+    docs = db.jobs.find(
+        {'project_uid' : project_uid, 'created_at' : {'$gt' : created_after}},
+        {'uid' : 1, 'job_type' : 1, 'status' : 1, 'created_at' : 1, 'queued_at' : 1, 'launched_at' : 1, 'started_at' : 1, 'completed_at' : 1, 'deleted' : 1})
+    return sorted([doc for doc in docs if doc['uid'] not in exclude_uids and not doc.get('deleted')], key=lambda doc: doc['created_at'])
+
+
+def get_child_job_keys(key, children):
+    '''
+    Names the child jobs of key after their job type, in the order they were created:
+    <key>_<job type>, then <key>_<job type>_2 and so on for further jobs of the same type,
+    so that the same child has the same key in every run of the workflow.
+    '''
+    counts = defaultdict(int)
+    child_keys = OrderedDict()
+    for doc in children:
+        counts[doc['job_type']] += 1
+        child_key = '{}_{}'.format(key, doc['job_type'])
+        if counts[doc['job_type']] > 1:
+            child_key += '_{}'.format(counts[doc['job_type']])
+        child_keys[child_key] = doc
+    return child_keys
+
+
+def load_timings_history(paths):
+    '''
+    Loads the results of earlier runs from *_benchmark_timings.json files,
+    given directly or found anywhere under the given directories.
+    Each result gets a 'path' entry with the file it came from.
+    '''
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in names if name.endswith('_benchmark_timings.json'))
+        elif os.path.isfile(path):
+            files.append(path)
+    history = []
+    for path in sorted(set(files)):
+        try:
+            with open(path) as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            print (" Skipping unreadable timings file {}".format(path))
+            continue
+        result['path'] = path
+        history.append(result)
+    return history
+
+
+def get_subset_limits(fraction=None, max_particles=None, max_movies=None):
+    '''
+    Returns the description of a subset run as make_input_subset summarizes it, before the
+    fraction of the data it keeps is known, or None when the whole input data is read.
+    '''
+    if fraction is None and max_particles is None and max_movies is None:
+        return None
+    return OrderedDict([('fraction_requested', fraction), ('max_particles', max_particles), ('max_movies', max_movies)])
+
+
+def get_subset_setup(subset):
+    '''
+    Returns what identifies the input data of a run: None for all of it, else the limits the
+    subset was made with (--fraction, --max_particles and --max_movies) and the fraction of the
+    data kept, rounded as subsets are spread evenly (None if not known yet).
+    '''
+    if not subset:
+        return None
+    fraction = subset.get('fraction')
+    requested = subset.get('fraction_requested')
+    if fraction is not None and fraction >= 0.995:
+        return None
+    if requested is not None and requested >= 0.995:
+        requested = None
+    if requested is None and subset.get('max_particles') is None and subset.get('max_movies') is None and fraction is None:
+        return None
+    return ((round(requested, 2) if requested is not None else None, subset.get('max_particles'), subset.get('max_movies')),
+            round(fraction, 2) if fraction is not None else None)
+
+
+def get_run_setup(subset=None, parallel=1, cache_state=None):
+    '''
+    Returns what, besides the instance type and dataset, makes runtimes comparable between runs:
+    the input data read (see get_subset_setup), the number of jobs run at a time and the page
+    cache state.
+    '''
+    return (get_subset_setup(subset), parallel or 1, cache_state)
+
+
+def get_result_setup(result):
+    cache_state = result.get('cache_state')
+    if isinstance(cache_state, dict):
+        cache_state = cache_state.get('mode')
+    return get_run_setup(result.get('subset'), result.get('parallel', 1), cache_state)
+
+
+def filter_timings_history(history, subset=None, parallel=1, cache_state=None):
+    '''
+    Returns the earlier results run on the same setup (see get_run_setup), so that e.g. a smoke
+    test on a tenth of the data doesn't set the timeouts or estimates of full runs. A subset
+    without its kept fraction (see get_subset_limits) matches the runs made with the same limits.
+    '''
+    subset_setup, parallel, cache_state = get_run_setup(subset, parallel, cache_state)
+    def matches(result):
+        result_subset, result_parallel, result_cache_state = get_result_setup(result)
+        if (result_parallel, result_cache_state) != (parallel, cache_state):
+            return False
+        if subset_setup is None or result_subset is None:
+            return subset_setup == result_subset
+        return result_subset[0] == subset_setup[0] and subset_setup[1] in [None, result_subset[1]]
+    return [result for result in history if matches(result)]
+
+
+def get_historical_runtimes(history, key, instance_type=None, dataset=None):
+    '''
+    Returns the recorded runtimes of a job key (including its repeated runs) from results of
+    the same instance type and dataset. If there are none, falls back to every result,
+    since older results don't record where they ran. Returns (runtimes, matched) where
+    matched tells whether the runtimes come from the same instance type and dataset.
+    '''
+    matching = []
+    other = []
+    for result in history:
+        runtimes = [jobtime for job_key, jobtime in iter(result.get('timings', {}).items()) if split_repeat_key(job_key)[0] == key]
+        if result.get('instance_type') == instance_type and result.get('dataset') == dataset:
+            matching.extend(runtimes)
+        else:
+            other.extend(runtimes)
+    if matching:
+        return matching, True
+    return other, False
+
+
+def estimate_job_durations(jobs, history, instance_type=None, dataset=None):
+    '''
+    Estimates each job's runtime as the median of its historical runtimes.
+    Returns key -> (seconds, source), where seconds is None for jobs that never ran before
+    and source says whether the estimate comes from the same instance type and dataset.
+    '''
+    estimates = OrderedDict()
+    for job_info in jobs:
+        runtimes, matched = get_historical_runtimes(history, split_repeat_key(job_info['key'])[0], instance_type, dataset)
+        if runtimes:
+            estimates[job_info['key']] = (median(runtimes), 'instance' if matched else 'other runs')
+        else:
+            estimates[job_info['key']] = (None, 'no history')
+    return estimates
 
-sys.path.append(os.environ['CRYOSPARC_ROOT_DIR'])
-import cryosparc_compute.jobs.runcommon as rc
 
-from collections import OrderedDict, defaultdict
-import argparse
-import time
-import datetime
-import json
-import errno
+# Adaptive timeouts: a job may run for the 99th percentile of its earlier runtimes times a
+# safety factor, but never less than ADAPTIVE_TIMEOUT_MIN seconds or more than its suite timeout.
+# At least MIN_TIMEOUT_HISTORY earlier runtimes on the same instance type and dataset are needed.
+ADAPTIVE_TIMEOUT_MIN = 300
+MIN_TIMEOUT_HISTORY = 3
 
-cli = None
-db = None
 
-def get_benchmark_jobs_dict(input_data_dir = "/", job_types_only=False, dataset_selected=None, datasets_only=False, modes_only=False):
+def percentile(values, q):
+    '''
+    The q-th percentile (0-100) of the values, interpolating linearly between the closest ranks.
     '''
-    This dictionary holds all the jobs and their parameters required to run for the actual benchmark.
+    values = sorted(values)
+    if not values:
+        return None
+    position = (len(values) - 1) * q / 100.0
+    lower = int(math.floor(position))
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
 
-    :param input_data_dir: the directory user specified where the benchmark data is located
-    :type input_data_dir: str
+
+def get_adaptive_timeout(history, key, default_timeout, factor, instance_type=None, dataset=None):
     '''
-    benchmark_jobs = {
-        'preprocess' : {
-            10028 : [
-                {
-                    'setup_requires' : [],
-                    'advanced' : False,
-                    'key' : 'import_movies_1',
-                    'job_type' : 'import_movies',
-                    'job_title' : "Import Movies 1",
-                    'params' : {
-                        'blob_paths' : os.path.join(input_data_dir, 'data/Micrographs/Micrographs_part1/*.mrcs'),
-                        'psize_A' : 1.03,
-                        'accel_kv' : 300,
-                        'cs_mm' : 2.7,
-                        'total_dose_e_per_A2' : 100,
-                    },
-                    'timeout' : 1800
-                },
-                {
-                    'setup_requires' : [],
-                    'advanced' : False,
-                    'key' : 'import_movies_2', 
-                    'job_type' : 'import_movies', 
-                    'job_title' : 'Import Movies 2', 
-                    'params' : {
-                        'blob_paths' : os.path.join(input_data_dir, 'data/Micrographs/Micrographs_part2/*.mrcs'),
-                        'psize_A' : 1.03,
-                        'accel_kv' : 300,
-                        'cs_mm' : 2.7,
-                        'total_dose_e_per_A2' : 100,
-                    },
-                    'timeout' : 1800
-                },
-                {
-                    'setup_requires' : ['import_movies_1', 'import_movies_2'],
-                    'advanced' : False,
-                    'key' : 'patch_motion', 
-                    'job_type' : 'patch_motion_correction_multi', 
-                    'job_title' : 'Patch Motion Correction', 
-                    'params' : {
-                        'do_plots' : False
-                    },
-                    'input_group_connects' : { 
-                        'movies' : [
-                            {
-                                'input_job_name' : 'import_movies_1',
-                                'group_name' : 'imported_movies'
-                            },
-                            {
-                                'input_job_name' : 'import_movies_2',
-                                'group_name' : 'imported_movies'
-                            }
-                        ] 
-                    }
-                },
-                {
-                    'setup_requires' : ['patch_motion'],
-                    'advanced' : False,
-                    'key' : 'patch_ctf_est', 
-                    'job_type' : 'patch_ctf_estimation_multi', 
-                    'job_title' : 'Patch CTF Estimation', 
-                    'params' : {
-                        'do_plots' : False
-                    },
-                    'input_group_connects' : {
-                        'exposures': [
-                            {
-                                'input_job_name' : 'patch_motion',
-                                'group_name' : 'micrographs'
-                            }
-                        ]
-                    }
-                }
-            ],
-            10025 : [
-                {
-                    'setup_requires' : [],
-                    'advanced' : False,
-                    'key' : 'import_movies', 
-                    'job_type' : 'import_movies', 
-                    'job_title' : 'Import Movies', 
-                    'params' : {
-                        'blob_paths': os.path.join(input_data_dir, 'data/14sep05c_raw_196/*.frames.mrc'),
-                        'gainref_path': os.path.join(input_data_dir, 'data/14sep05c_raw_196/norm-amibox05-0.mrc'),
-                        'gainref_flip_y' : True,
-                        'psize_A' : 0.6575,
-                        'accel_kv' : 300,
-                        'cs_mm' : 2.7,
-                        'total_dose_e_per_A2' : 53
-                    },
-                    'timeout' : 1800
-                },
-                {
-                    'setup_requires' : ['import_movies'],
-                    'advanced' : False,
-                    'key' : 'patch_motion', 
-                    'job_type' : 'patch_motion_correction_multi', 
-                    'job_title' : 'Patch Motion Correction',
-                    'params' : {
-                        'do_plots' : False
-                    },
-                    'input_group_connects' : {
-                        'movies': [
-                            {
-                                'input_job_name' : 'import_movies',
-                                'group_name': 'imported_movies'
-                            }
-                        ]
-                    }
-                },
-                {
-                    'setup_requires' : ['patch_motion'],
-                    'advanced' : False,
-                    'key' : 'patch_ctf_est', 
-                    'job_type' : 'patch_ctf_estimation_multi', 
-                    'job_title' : 'Patch CTF Estimation',
-                    'params' : {
-                        'do_plots' : False
-                    },
-                    'input_group_connects' : {
-                        'exposures': [
-                            {
-                                'input_job_name' : 'patch_motion',
-                                'group_name' : 'micrographs'
-                            }
-                        ]
-                    }
-                },
-                {
-
-                }
-            ]
-        },
-        'reconstruct' : {
-            10028 : [
-                {
-                    'setup_requires' : [],
-                    'advanced' : False,
-                    'key' : 'import_volumes', 
-                    'job_type' : 'import_volumes', 
-                    'job_title' : 'Import Volume',
-                    'params' : {
-                        'volume_blob_path' : os.path.join(input_data_dir, 'data/Volumes/cryosparc_P5_J286_class_00_final_volume.mrc')
-                    },
-                    'timeout' : 1800
-                },
-                {
-                    'setup_requires' : [],
-                    'advanced' : False,
-                    'key' : 'import_particles', 
-                    'job_type' : 'import_particles', 
-                    'job_title' : 'Import Particles',
-                    'params' : {
-                        'particle_meta_path' : os.path.join(input_data_dir, 'data/Particles/shiny_2sets.star'), 
-                        'particle_blob_path' : os.path.join(input_data_dir, 'data/Particles'), 
-                    },
-                    'timeout' : 1800
-                },
-                {
-                    'setup_requires' : ['import_particles', 'import_volumes'],
-                    'advanced' : True,
-                    'key' : 'class_2D_050', 
-                    'job_type' : 'class_2D', 
-                    'job_title' : '2D Classification- 50 Classes',
-                    'params' : {
-                        'compute_use_ssd' : False,
-                        'class2D_K' : 50,
-                        'random_seed' : 0,
-                    },
-                    'input_group_connects' : {
-                        'particles' : [
-                            {
-                                'input_job_name' : 'import_particles',
-                                'group_name' : 'imported_particles'
-                            }
-                        ]
-                    }
-                },
-                {
-                    'setup_requires' : ['import_particles', 'import_volumes'],
-                    'advanced' : True,
-                    'key' : 'class_2D_100', 
-                    'job_type' : 'class_2D', 
-                    'job_title' : '2D Classification- 100 Classes',
-                    'params' : {
-                        'compute_use_ssd' : False,
-                        'class2D_K' : 100,
-                        'random_seed' : 0,
-                    },
-                    'input_group_connects' : {
-                        'particles' : [
-                            {
-                                'input_job_name' : 'import_particles',
-                                'group_name' : 'imported_particles'
-                            }
-                        ]
-                    }
-                },
-                {
-                    'setup_requires' : ['import_particles', 'import_volumes'],
-                    'advanced' : True,
-                    'key' : 'class_2D_200', 
-                    'job_type' : 'class_2D', 
-                    'job_title' : '2D Classification- 200 Classes',
-                    'params' : {
-                        'compute_use_ssd' : False,
-                        'class2D_K' : 200,
-                        'random_seed' : 0,
-                    },
-                    'input_group_connects' : {
-                        'particles' : [
-                            {
-                                'input_job_name' : 'import_particles',
-                                'group_name' : 'imported_particles'
-                            }
-                        ]
-                    }
-                },
-                {
-                    'setup_requires' : ['import_particles', 'import_volumes'],
-                    'advanced' : True,
-                    'key' : 'homo_abinit_1', 
-                    'job_type' : 'homo_abinit', 
-                    'job_title' : 'Ab-Initio- 1 Class',
-                    'params' : {
-                            'compute_use_ssd' : False,
-                            'abinit_K' : 1,
-                            'random_seed' : 0,
-                    },
-                    'input_group_connects' : {
-                        'particles' : [
-                            {
-                                'input_job_name' : 'import_particles',
-                                'group_name' : 'imported_particles'
-                            }
-                        ]
-                    }
-                },
-                {
-                    'setup_requires' : ['import_particles', 'import_volumes'],
-                    'advanced' : True,
-                    'key' : 'homo_abinit_3', 
-                    'job_type' : 'homo_abinit', 
-                    'job_title' : 'Ab-Initio- 3 Class',
-                    'params' : {
-                            'compute_use_ssd' : False,
-                            'abinit_K' : 3,
-                            'random_seed' : 0,
-                    },
-                    'input_group_connects' : {
-                        'particles' : [
-                            {
-                                'input_job_name' : 'import_particles',
-                                'group_name' : 'imported_particles'
-                            }
-                        ]
-                    }
-                },
-                {
-                    'setup_requires' : ['import_particles', 'import_volumes'],
-                    'advanced' : True,
-                    'key' : 'hetero_refine_3', 
-                    'job_type' : 'hetero_refine', 
-                    'job_title' : 'Heterogenous Refinement- 3 Class',
-                    'params' : {
-                            'compute_use_ssd' : False,
-                            'random_seed' : 0
-                    },
-                    'input_group_connects' : {
-                        'particles' : [
-                            {
-                                'input_job_name' : 'import_particles',
-                                'group_name' : 'imported_particles'
-                            }
-                        ],
-                        'volume' :  [
-                            {
-                                'input_job_name' : 'import_volumes',
-                                'group_name' : 'imported_volume_1'
-                            },
-                            {
-                                'input_job_name' : 'import_volumes',
-                                'group_name' : 'imported_volume_1'
-                            },
-                            {
-                                'input_job_name' : 'import_volumes',
-                                'group_name' : 'imported_volume_1'
-                            }
-                        ]
-                    }
-                },
-                {
-                    'setup_requires' : ['import_particles', 'import_volumes'],
-                    'advanced' : True,
-                    'key' : 'hetero_refine_6', 
-                    'job_type' : 'hetero_refine', 
-                    'job_title' : 'Heterogenous Refinement- 6 Class',
-                    'params' : {
-                            'compute_use_ssd' : False,
-                            'random_seed' : 0,
-                    },
-                    'input_group_connects' : {
-                        'particles' : [
-                            {
-                                'input_job_name' : 'import_particles',
-                                'group_name' : 'imported_particles'
-                            }
-                        ],
-                        'volume' :  [
-                            {
-                                'input_job_name' : 'import_volumes',
-                                'group_name' : 'imported_volume_1'
-                            },
-                            {
-                                'input_job_name' : 'import_volumes',
-                                'group_name' : 'imported_volume_1'
-                            },
-                            {
-                                'input_job_name' : 'import_volumes',
-                                'group_name' : 'imported_volume_1'
-                            },
-                            {
-                                'input_job_name' : 'import_volumes',
-                                'group_name' : 'imported_volume_1'
-                            },
-                            {
-                                'input_job_name' : 'import_volumes',
-                                'group_name' : 'imported_volume_1'
-                            },
-                            {
-                                'input_job_name' : 'import_volumes',
-                                'group_name' : 'imported_volume_1'
-                            }
-                        ]
-                    }
-                },
-                {
-                    'setup_requires' : ['import_particles', 'import_volumes'],
-                    'advanced' : True,
-                    'key' : 'homo_refine', 
-                    'job_type' : 'homo_refine', 
-                    'job_title' : 'Homogeneous Refinement (Engine v2)',
-                    'params' : {
-                            'compute_use_ssd' : False,
-                            'random_seed' : 0,
-                    },
-                    'input_group_connects' : {
-                        'particles' : [
-                            {
-                                'input_job_name' : 'import_particles',
-                                'group_name' : 'imported_particles'
-                            }
-                        ],
-                        'volume' : [
-                            {
-                                'input_job_name' : 'import_volumes',
-                                'group_name' : 'imported_volume_1'
-                            }
-                        ]
-                    }
-                },
-                {
-                    'setup_requires' : ['import_particles', 'import_volumes'],
-                    'advanced' : False,
-                    'key' : 'homo_refine_new', 
-                    'job_type' : 'homo_refine_new', 
-                    'job_title' : 'New Homogeneous Refinement (Engine v3)',
-                    'params' : {
-                            'compute_use_ssd' : False,
-                            'random_seed' : 0,
-                    },
-                    'input_group_connects' : {
-                        'particles' : [
-                            {
-                                'input_job_name' : 'import_particles',
-                                'group_name' : 'imported_particles'
-                            }
-                        ],
-                        'volume' : [
-                            {
-                                'input_job_name' : 'import_volumes',
-                                'group_name' : 'imported_volume_1'
-                            }
-                        ]
-                    }
-                },
-                {
-                    'setup_requires' : ['import_particles', 'import_volumes'],
-                    'advanced' : True,
-                    'key' : 'homo_refine_sym_6', 
-                    'job_type' : 'homo_refine', 
-                    'job_title' : 'Homogeneous Refinement C6 Symmetry Enforced (Engine v2)',
-                    'params' : {
-                            'compute_use_ssd' : False,
-                            'random_seed' : 0,
-                            'refine_symmetry' : 'C6',
-                    },
-                    'input_group_connects' : {
-                        'particles' : [
-                            {
-                                'input_job_name' : 'import_particles',
-                                'group_name' : 'imported_particles'
-                            }
-                        ],
-                        'volume' : [
-                            {
-                                'input_job_name' : 'import_volumes',
-                                'group_name' : 'imported_volume_1'
-                            }
-                        ]
-                    }
-                },
-                {
-                    'setup_requires' : ['import_particles', 'import_volumes'],
-                    'advanced' : False,
-                    'key' : 'homo_refine_new_sym_6', 
-                    'job_type' : 'homo_refine_new', 
-                    'job_title' : 'New Homogeneous Refinement C6 Symmetry Enforced (Engine v3)',
-                    'params' : {
-                            'compute_use_ssd' : False,
-                            'random_seed' : 0,
-                            'refine_symmetry' : 'C6',
-                    },
-                    'input_group_connects' : {
-                        'particles' : [
-                            {
-                                'input_job_name' : 'import_particles',
-                                'group_name' : 'imported_particles'
-                            }
-                        ],
-                        'volume' : [
-                            {
-                                'input_job_name' : 'import_volumes',
-                                'group_name' : 'imported_volume_1'
-                            }
-                        ]
-                    }
-                },
-                {
-                    'setup_requires' : ['import_particles', 'import_volumes'],
-                    'advanced' : True,
-                    'key' : 'nonuniform_refine', 
-                    'job_type' : 'nonuniform_refine', 
-                    'job_title' : 'Non-Uniform Refinement',
-                    'params' : {
-                            'compute_use_ssd' : False,
-                            'random_seed' : 0,
-                    },
-                    'input_group_connects' : {
-                        'particles' : [
-                            {
-                                'input_job_name' : 'import_particles',
-                                'group_name' : 'imported_particles'
-                            }
-                        ],
-                        'volume' : [
-                            {
-                                'input_job_name' : 'import_volumes',
-                                'group_name' : 'imported_volume_1'
-                            }
-                        ]
-                    }
-                },
-                {
-                    'setup_requires' : ['import_particles', 'import_volumes'],
-                    'advanced' : True,
-                    'key' : 'var_3D_3', 
-                    'job_type' : 'var_3D', 
-                    'job_title' : '3 Mode 3D Variability',
-                    'params' : {
-                        'compute_use_ssd' : False,
-                        'var_filter_res' : 8,
-                        'var_K' : 3,
-                    },
-                    'input_group_connects' : {
-                        'particles' : [
-                            {
-                                'input_job_name' : 'homo_refine',
-                                'group_name' : 'particles'
-                            }
-                        ],
-                        'mask' :  [
-                            {
-                                'input_job_name' : 'homo_refine',
-                                'group_name' : 'mask'
-                            }
-                        ]
-                    }
-                },
-                {
-                    'setup_requires' : ['import_particles', 'import_volumes'],
-                    'advanced' : True,
-                    'key' : 'var_3D_6', 
-                    'job_type' : 'var_3D', 
-                    'job_title' : '6 Mode 3D Variability',
-                    'params' : {
-                            'compute_use_ssd' : False,
-                            'var_filter_res' : 8,
-                            'var_K' : 6,
-                    },
-                    'input_group_connects' : {
-                        'particles' : [
-                            {
-                                'input_job_name' : 'homo_refine',
-                                'group_name' : 'particles'
-                            }
-                        ],
-                        'mask' :  [
-                            {
-                                'input_job_name' : 'homo_refine',
-                                'group_name' : 'mask'
-                            }
-                        ]
-                    }
-                }
-            ]
-        }
-    }
+    Returns (timeout, p99) for a job key from its runtimes in earlier runs on the same instance type
+    and dataset, or (default_timeout, None) if there aren't enough of them.
+    '''
+    runtimes, matched = get_historical_runtimes(history, split_repeat_key(key)[0], instance_type, dataset)
+    if not matched or len(runtimes) < MIN_TIMEOUT_HISTORY:
+        return default_timeout, None
+    p99 = percentile(runtimes, 99)
+    return min(default_timeout, max(ADAPTIVE_TIMEOUT_MIN, int(math.ceil(p99 * factor)))), p99
 
-    if job_types_only:
-        job_types = []
-        for mode, datasets in iter(benchmark_jobs.items()):
-            for dataset in datasets:
-                if dataset == dataset_selected:
-                    for job in benchmark_jobs[mode][dataset]:
-                        job_types.append(job['key'])
-        return job_types
-    if datasets_only:
-        datasets_available = []
-        for mode, datasets in iter(benchmark_jobs.items()):
-            datasets_available.extend(datasets.keys())
-        return datasets_available
-    if modes_only:
-        modes_available = []
-        for mode, datasets in iter(benchmark_jobs.items()):
-            for dataset in datasets:
-                if dataset == dataset_selected:
-                    modes_available.append(mode)
-        return benchmark_jobs.keys()
 
-    return benchmark_jobs
+def get_historical_progress(history, key, instance_type=None, dataset=None):
+    '''
+    Returns the medians of a job key's median iteration time and finalize time in earlier runs
+    on the same instance type and dataset, or None if its iterations were never recorded.
+    '''
+    key = split_repeat_key(key)[0]
+    iteration_medians = []
+    finalize_times = []
+    for result in history:
+        if result.get('instance_type') != instance_type or result.get('dataset') != dataset:
+            continue
+        for job_key, phase in iter((result.get('phases') or {}).items()):
+            if split_repeat_key(job_key)[0] == key and phase.get('iteration_median'):
+                iteration_medians.append(phase['iteration_median'])
+                if phase.get('finalize') is not None:
+                    finalize_times.append(phase['finalize'])
+    if not iteration_medians:
+        return None
+    return OrderedDict([('iteration', median(iteration_medians)), ('finalize', median(finalize_times))])
+
+
+def find_critical_path(jobs, durations):
+    '''
+    Returns (length, keys) of the longest chain of dependent jobs, given each job's duration.
+    '''
+    dag = build_job_dag(jobs)
+    finish = {}
+    previous = {}
+    for key, dependencies in iter(dag.items()):
+        start = 0.0
+        previous[key] = None
+        for dependency in dependencies:
+            if finish[dependency] > start:
+                start = finish[dependency]
+                previous[key] = dependency
+        finish[key] = start + durations[key]
+    if not finish:
+        return 0.0, []
+    key = max(finish, key=finish.get)
+    length = finish[key]
+    path = []
+    while key is not None:
+        path.append(key)
+        key = previous[key]
+    return length, list(reversed(path))
+
+
+# Orders in which run_job_dag starts jobs that are ready at the same time (--policy): in suite
+# order (fifo), longest job first, or the job heading the longest chain of remaining work first
+# (critical_path). The runtimes of earlier runs rank the jobs.
+SCHEDULING_POLICIES = ['fifo', 'longest', 'critical_path']
+
+
+def get_remaining_path_lengths(jobs, durations):
+    '''
+    Returns, for each job, its duration plus that of the longest chain of jobs depending on it.
+    '''
+    dag = build_job_dag(jobs)
+    dependents = defaultdict(list)
+    for key, dependencies in iter(dag.items()):
+        for dependency in dependencies:
+            dependents[dependency].append(key)
+    lengths = {}
+    for key in reversed(list(dag.keys())):
+        lengths[key] = durations[key] + max([lengths[dependent] for dependent in dependents[key]] or [0.0])
+    return lengths
+
+
+def get_particle_sources(jobs):
+    '''
+    Returns, for each job, the particle import jobs it reads from, directly or through other jobs:
+    the files a job with the SSD cache on copies to the cache.
+    '''
+    jobs_by_key = OrderedDict((job_info['key'], job_info) for job_info in jobs)
+    sources = {}
+    for key, dependencies in iter(build_job_dag(jobs).items()):
+        sources[key] = set()
+        for dependency in dependencies:
+            if jobs_by_key[dependency]['job_type'] == 'import_particles':
+                sources[key].add(dependency)
+            else:
+                sources[key] |= sources[dependency]
+    return sources
+
+
+def get_job_priorities(jobs, durations, policy='fifo'):
+    '''
+    Returns the priority of each job under one of SCHEDULING_POLICIES for run_job_dag,
+    given each job's duration: the lowest value goes first, ties in list order.
+    '''
+    order = dict((job_info['key'], index) for index, job_info in enumerate(jobs))
+    if policy == 'fifo':
+        return order
+    if policy == 'longest':
+        return dict((key, (-durations[key], index)) for key, index in iter(order.items()))
+    if policy == 'critical_path':
+        lengths = get_remaining_path_lengths(jobs, durations)
+        return dict((key, (-lengths[key], index)) for key, index in iter(order.items()))
+    raise ValueError("unknown scheduling policy {}, expected one of {}".format(policy, SCHEDULING_POLICIES))
+
+
+class VirtualTimeSelector(selectors.DefaultSelector):
+    '''
+    Selector of a VirtualTimeEventLoop: instead of waiting for the next timer, it moves the
+    loop's clock forward to it.
+    '''
+
+    def __init__(self):
+        super(VirtualTimeSelector, self).__init__()
+        self.loop = None
+
+    def select(self, timeout=None):
+        assert timeout is not None, "the simulation is waiting for something other than the clock"
+        self.loop.virtual_time += timeout
+        return super(VirtualTimeSelector, self).select(0)
+
+
+class VirtualTimeEventLoop(asyncio.SelectorEventLoop):
+    '''
+    Event loop whose clock only moves when every task is waiting for a timer, and then jumps
+    straight to the next one, so that asyncio.sleep() takes no real time. Used to replay the
+    benchmark's own scheduling (run_job_dag and GpuPool) with the runtimes of earlier runs.
+    '''
+
+    def __init__(self):
+        selector = VirtualTimeSelector()
+        super(VirtualTimeEventLoop, self).__init__(selector)
+        selector.loop = self
+        self.virtual_time = 0.0
+
+    def time(self):
+        return self.virtual_time
+
+
+class SharedDevice(object):
+    '''
+    A device used evenly by all the transfers on it at the same time, such as the SSD cache
+    filled by several jobs, for simulations on a VirtualTimeEventLoop.
+    Must be created inside the event loop that runs the simulation.
+    '''
+
+    def __init__(self):
+        self.active = 0
+        self.changed = asyncio.Event()
+
+    def _notify(self):
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    async def transfer(self, seconds):
+        '''
+        Returns once the device has spent `seconds` on this transfer, which takes longer
+        while other transfers share the device.
+        '''
+        loop = asyncio.get_event_loop()
+        self._notify()
+        self.active += 1
+        remaining = seconds
+        try:
+            while remaining > 1e-9:
+                changed, share, started_at = self.changed, self.active, loop.time()
+                try:
+                    await asyncio.wait_for(changed.wait(), remaining * share)
+                except asyncio.TimeoutError:
+                    break
+                remaining -= (loop.time() - started_at) / share
+        finally:
+            self.active -= 1
+            self._notify()
+
+
+def estimate_schedule(jobs, durations, num_gpus, parallel=1, policy='fifo', ssd_fill=None):
+    '''
+    Replays the benchmark's scheduling on a virtual clock given each job's duration: the jobs
+    are run by run_job_dag, at most `parallel` at a time and ready jobs in the order of policy,
+    and each job takes the GPUs its job type needs from a GpuPool before it runs, as in
+    benchmark_cryoSPARC.
+
+    ssd_fill gives, for jobs that use the SSD cache, how many seconds of their duration are spent
+    copying their particles to the cache. Jobs filling the cache at the same time share the SSD,
+    so each fill takes longer; jobs whose particles were already cached by an earlier job skip it.
+
+    Returns the makespan, each job's start and end time, GPUs and wait from becoming ready to
+    starting, the allocated GPU time overall and per GPU, and the cache fill times.
+    '''
+    dag = build_job_dag(jobs)
+    priority = get_job_priorities(jobs, durations, policy)
+    ssd_fill = ssd_fill or {}
+    sources = get_particle_sources(jobs) if ssd_fill else {}
+    cached = set()
+    start = OrderedDict()
+    end = OrderedDict()
+    job_gpus = OrderedDict()
+    fill_seconds = OrderedDict()
+
+    async def replay():
+        loop = asyncio.get_event_loop()
+        gpu_pool = GpuPool(range(num_gpus), clock=loop.time)
+        ssd = SharedDevice()
+
+        async def run_job(job_info):
+            key = job_info['key']
+            gpus, acquired_at = await gpu_pool.acquire(get_job_num_gpus(job_info, num_gpus))
+            start[key], job_gpus[key] = acquired_at, gpus
+            try:
+                fill = min(ssd_fill.get(key) or 0.0, durations[key])
+                if fill and not (sources.get(key) and sources[key] <= cached):
+                    await ssd.transfer(fill)
+                    fill_seconds[key] = loop.time() - acquired_at
+                    cached.update(sources.get(key, set()))
+                else:
+                    fill = 0.0
+                await asyncio.sleep(durations[key] - fill)
+            finally:
+                await gpu_pool.release(key, gpus, acquired_at)
+            end[key] = loop.time()
+
+        await run_job_dag(jobs, run_job, parallel=parallel, priority=priority)
+        return gpu_pool.utilization_summary()
+
+    loop = VirtualTimeEventLoop()
+    try:
+        utilization = loop.run_until_complete(replay())
+    finally:
+        loop.close()
+    makespan = utilization['wall_time']
+    ready = dict((key, max([end[dependency] for dependency in dependencies] or [0.0])) for key, dependencies in iter(dag.items()))
+    return OrderedDict([
+        ('policy', policy),
+        ('makespan', makespan),
+        ('start', start),
+        ('end', end),
+        ('gpus', job_gpus),
+        ('queue_wait', OrderedDict((key, start[key] - ready[key]) for key in start)),
+        ('ssd_fill_seconds', fill_seconds),
+        ('busy_gpu_seconds', utilization['busy_gpu_seconds']),
+        ('gpu_utilization', OrderedDict((int(gpu), fraction if makespan > 0 else None) for gpu, fraction in iter(utilization['per_gpu'].items()))),
+        ('gpu_idle_fraction', 1.0 - utilization['utilization'] if num_gpus and makespan > 0 else None),
+    ])
+
+
+def plan_benchmark(jobs, history, num_gpus, parallel, instance_type=None, dataset=None):
+    '''
+    Prints the job graph with estimated runtimes, the critical path, and the expected makespan
+    of serial and parallel execution without running anything. Returns the plan.
+    '''
+    estimates = estimate_job_durations(jobs, history, instance_type, dataset)
+    durations = dict((key, seconds or 0.0) for key, (seconds, _) in iter(estimates.items()))
+    critical_path_length, critical_path = find_critical_path(jobs, durations)
+    serial = estimate_schedule(jobs, durations, num_gpus, 1)
+    parallel_schedule = estimate_schedule(jobs, durations, num_gpus, parallel)
+
+    dag = build_job_dag(jobs)
+    print (" Job graph ({} jobs, * marks the critical path, estimates from {} earlier run(s)):".format(len(jobs), len(history)))
+    for job_info in jobs:
+        key = job_info['key']
+        seconds, source = estimates[key]
+        print ("  {} {:<24} {:<32} GPUs {:<2} {:>10}  ({})  after: {}".format(
+            '*' if key in critical_path else ' ', key, job_info['job_type'], get_job_num_gpus(job_info, num_gpus),
+            '%.0f s' % seconds if seconds is not None else '?', source, ', '.join(dag[key]) or '-'))
+    missing = [key for key, (seconds, _) in iter(estimates.items()) if seconds is None]
+    print ("-----------------------------------------------------------------------")
+    print (" Critical path: %.0f seconds" % critical_path_length)
+    print (" Serial makespan: %.0f seconds, GPU idle %.0f%%" % (serial['makespan'], 100 * (serial['gpu_idle_fraction'] or 0)))
+    print (" Makespan with --parallel %d on %d GPU(s): %.0f seconds, GPU idle %.0f%%" % (
+        parallel, num_gpus, parallel_schedule['makespan'], 100 * (parallel_schedule['gpu_idle_fraction'] or 0)))
+    if missing:
+        print (" WARNING: no earlier runtimes for {}, counted as 0 seconds".format(', '.join(missing)))
+    return OrderedDict([
+        ('estimates', estimates),
+        ('critical_path', critical_path),
+        ('critical_path_seconds', critical_path_length),
+        ('serial', serial),
+        ('parallel', parallel_schedule),
+    ])
+
+
+def estimate_ssd_fill(jobs, durations, history, fill_fraction=None):
+    '''
+    Returns how many seconds each job that uses the SSD cache spends filling it: the median fill
+    time of its cold cache runs (--ssd_cache) in the history, or fill_fraction of its duration.
+    With fill_fraction, every job that can use the cache is counted as using it, otherwise
+    only the jobs that have it switched on in the suite.
+    '''
+    fills = OrderedDict()
+    for job_info in jobs:
+        key = job_info['key']
+        params = job_info.get('params', {})
+        if SSD_CACHE_PARAM not in params or (fill_fraction is None and not params[SSD_CACHE_PARAM]):
+            continue
+        measured = []
+        for result in history:
+            summary = ((result.get('ssd_cache') or {}).get('jobs') or {}).get(key) or {}
+            if (summary.get('cold_cache') or {}).get('fill_seconds') is not None:
+                measured.append(summary['cold_cache']['fill_seconds'])
+        if measured:
+            fills[key] = median(measured)
+        elif fill_fraction is not None:
+            fills[key] = fill_fraction * durations[key]
+    return fills
+
+
+def simulate_schedules(jobs, history, gpu_counts, policies, parallel, instance_type=None, dataset=None, ssd_fill_fraction=None):
+    '''
+    Replays the job graph through run_job_dag and GpuPool (see estimate_schedule) with the runtimes
+    of earlier runs for each GPU count and scheduling policy, and prints the makespan, the utilization
+    of each GPU and the time jobs wait to start once ready. With parallel 1, as many jobs run at once
+    as the GPUs allow.
+    '''
+    estimates = estimate_job_durations(jobs, history, instance_type, dataset)
+    durations = dict((key, seconds or 0.0) for key, (seconds, _) in iter(estimates.items()))
+    ssd_fill = estimate_ssd_fill(jobs, durations, history, ssd_fill_fraction)
+    if parallel <= 1:
+        parallel = len(jobs)
+    print (" Simulated schedules of {} jobs, runtimes from {} earlier run(s){}:".format(
+        len(jobs), len(history), ', {} job(s) filling the SSD cache'.format(len(ssd_fill)) if ssd_fill else ''))
+    print ("  {:>4} {:<14} {:>10} {:>10} {:>10}   {}".format('GPUs', 'policy', 'makespan', 'mean wait', 'max wait', 'GPU utilization'))
+    simulations = []
+    for num_gpus in gpu_counts:
+        for policy in policies:
+            schedule = estimate_schedule(jobs, durations, num_gpus, parallel, policy, ssd_fill)
+            waits = list(schedule['queue_wait'].values())
+            schedule['num_gpus'] = num_gpus
+            schedule['mean_queue_wait'] = sum(waits) / len(waits) if waits else 0.0
+            schedule['max_queue_wait'] = max(waits) if waits else 0.0
+            simulations.append(schedule)
+            print ("  {:>4} {:<14} {:>8.0f} s {:>8.0f} s {:>8.0f} s   {}".format(
+                num_gpus, policy, schedule['makespan'], schedule['mean_queue_wait'], schedule['max_queue_wait'],
+                ' '.join('%.0f%%' % (100 * utilization) if utilization is not None else '-' for utilization in schedule['gpu_utilization'].values())))
+    missing = [key for key, (seconds, _) in iter(estimates.items()) if seconds is None]
+    if missing:
+        print (" WARNING: no earlier runtimes for {}, counted as 0 seconds".format(', '.join(missing)))
+    return simulations
+
+
+# Result store: every run's per-job runtimes, keyed by what they were measured on
+RESULTS_DB_NAME = 'benchmark_results.sqlite'
+RESULTS_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS runs (
+        run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        path TEXT UNIQUE,
+        recorded_at REAL,
+        version TEXT,
+        dataset INTEGER,
+        mode TEXT,
+        instance_type TEXT,
+        gpu_model TEXT,
+        cache_state TEXT,
+        fraction REAL,
+        project_uid TEXT,
+        workspace_uid TEXT,
+        parallel INTEGER
+    )''',
+    '''CREATE TABLE IF NOT EXISTS samples (
+        run_id INTEGER REFERENCES runs(run_id),
+        job_key TEXT,
+        sample INTEGER,
+        runtime REAL
+    )''',
+    'CREATE INDEX IF NOT EXISTS samples_job_key ON samples (job_key, run_id)',
+]
+# A job is flagged as regressed when it is slower by at least this fraction,
+# and the slowdown is significant at this level
+REGRESSION_MIN_SLOWDOWN = 0.05
+REGRESSION_ALPHA = 0.05
+
+
+def get_gpu_model(targets, worker_hostname, gpu_devidxs):
+    '''
+    Returns the model name of the benchmark GPUs from the worker's scheduler target, or None
+    if cryoSPARC doesn't report it. Mixed models are listed together.
+    '''
+    target = rc.com.query(targets, lambda t : t.get('hostname') == worker_hostname) if targets else None
+    if not target or not target.get('gpus'):
+        return None
+    names = sorted(set(gpu['name'] for gpu in target['gpus'] if gpu.get('id') in gpu_devidxs and gpu.get('name')))
+    return ', '.join(names) or None
+
+
+def open_results_store(path):
+    conn = sqlite3.connect(path)
+    for statement in RESULTS_SCHEMA:
+        conn.execute(statement)
+    # stores made before runs were keyed by --parallel get the column, filled in from the timings files
+    if 'parallel' not in [row[1] for row in conn.execute('PRAGMA table_info(runs)')]:
+        conn.execute('ALTER TABLE runs ADD COLUMN parallel INTEGER')
+        for run_id, run_path in conn.execute('SELECT run_id, path FROM runs').fetchall():
+            if os.path.exists(run_path):
+                with open(run_path) as f:
+                    conn.execute('UPDATE runs SET parallel = ? WHERE run_id = ?', (json.load(f).get('parallel', 1), run_id))
+    conn.commit()
+    return conn
+
+
+def get_result_samples(result):
+    '''
+    Returns the measured runtimes of each job key of a timings result, without warmup runs,
+    and the time to the first job of a run started with the container.
+    '''
+    samples = OrderedDict()
+    statistics = result.get('statistics') or {}
+    for job_key, runtime in iter(result.get('timings', {}).items()):
+        key, run = split_repeat_key(job_key)
+        if key in statistics and 'runs' in statistics[key]:
+            samples[key] = statistics[key]['runs']
+        elif run == 0:
+            samples[key] = [runtime]
+    # tracked like a job, so that slower container startups are flagged too
+    startup = result.get('startup') or {}
+    if startup.get(TIME_TO_FIRST_JOB_KEY) is not None:
+        samples[TIME_TO_FIRST_JOB_KEY] = [startup[TIME_TO_FIRST_JOB_KEY]]
+    return samples
+
+
+def ingest_result(conn, result, path):
+    '''
+    Adds a timings result to the result store, once per file. Returns its run id.
+    '''
+    path = os.path.abspath(path)
+    row = conn.execute('SELECT run_id FROM runs WHERE path = ?', (path,)).fetchone()
+    if row:
+        return row[0]
+    cache_state = result.get('cache_state')
+    if isinstance(cache_state, dict):
+        cache_state = cache_state.get('mode')
+    subset = result.get('subset') or {}
+    workspace_uid = os.path.basename(path).split('_')[1] if os.path.basename(path).count('_') > 1 else None
+    cursor = conn.execute(
+        'INSERT INTO runs (path, recorded_at, version, dataset, mode, instance_type, gpu_model, cache_state, fraction, project_uid, workspace_uid, parallel) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        (path, os.path.getmtime(path), result.get('version'), result.get('dataset'), result.get('mode') or None, result.get('instance_type'),
+         result.get('gpu_model'), cache_state, subset.get('fraction'), result.get('project_uid'), workspace_uid, result.get('parallel', 1)))
+    run_id = cursor.lastrowid
+    for key, runtimes in iter(get_result_samples(result).items()):
+        conn.executemany('INSERT INTO samples (run_id, job_key, sample, runtime) VALUES (?, ?, ?, ?)',
+                         [(run_id, key, index, runtime) for index, runtime in enumerate(runtimes)])
+    conn.commit()
+    return run_id
+
+
+def get_baseline_samples(conn, run_id, job_key, baseline_runs, baseline_version=None):
+    '''
+    Returns the runtimes of job_key in the last baseline_runs runs recorded before run_id
+    on the same dataset, instance type, GPU model, cache state, data fraction and number of
+    jobs run at a time (optionally only those of baseline_version), and the number of runs they came from.
+    '''
+    query = '''SELECT r.run_id FROM runs r, runs new
+        WHERE new.run_id = ? AND r.run_id != new.run_id AND r.recorded_at <= new.recorded_at
+        AND r.dataset IS new.dataset AND r.instance_type IS new.instance_type AND r.gpu_model IS new.gpu_model
+        AND r.cache_state IS new.cache_state AND r.fraction IS new.fraction AND r.parallel IS new.parallel
+        AND EXISTS (SELECT 1 FROM samples s WHERE s.run_id = r.run_id AND s.job_key = ?)'''
+    params = [run_id, job_key]
+    if baseline_version is not None:
+        query += ' AND r.version = ?'
+        params.append(baseline_version)
+    query += ' ORDER BY r.recorded_at DESC, r.run_id DESC LIMIT ?'
+    params.append(baseline_runs)
+    baseline_ids = [row[0] for row in conn.execute(query, params)]
+    if not baseline_ids:
+        return [], 0
+    rows = conn.execute('SELECT runtime FROM samples WHERE job_key = ? AND run_id IN ({})'.format(','.join('?' * len(baseline_ids))),
+                        [job_key] + baseline_ids)
+    return [row[0] for row in rows], len(baseline_ids)
+
+
+def incomplete_beta(a, b, x):
+    '''
+    Regularized incomplete beta function I_x(a, b), by its continued fraction.
+    '''
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    if x > (a + 1.0) / (a + b + 2.0):
+        return 1.0 - incomplete_beta(b, a, 1.0 - x)
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log(1.0 - x)) / a
+    # modified Lentz's method
+    tiny = 1e-300
+    c, d = 1.0, 1.0 - (a + b) * x / (a + 1.0)
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    fraction = d
+    for m in range(1, 300):
+        for numerator in (m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)), -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))):
+            d = 1.0 + numerator * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            fraction *= c * d
+        if abs(c * d - 1.0) < 1e-14:
+            break
+    return front * fraction
+
+
+def student_t_sf(t, df):
+    '''
+    Probability that Student's t distribution with df degrees of freedom exceeds t.
+    '''
+    tail = 0.5 * incomplete_beta(df / 2.0, 0.5, df / (df + t * t))
+    return tail if t > 0 else 1.0 - tail
+
+
+def slowdown_p_value(baseline, new):
+    '''
+    One-sided test of whether the runtimes in new are slower than the baseline runtimes:
+    Welch's t-test when both have repeated runs, otherwise whether a single new runtime
+    lies above the baseline's prediction interval. Returns the p-value, or None if the
+    baseline has fewer than two runtimes.
+    '''
+    if len(baseline) < 2 or not new:
+        return None
+    baseline_stats, new_stats = summarize_samples(baseline), summarize_samples(new)
+    difference = new_stats['mean'] - baseline_stats['mean']
+    if len(new) > 1:
+        baseline_var = baseline_stats['stdev'] ** 2 / len(baseline)
+        new_var = new_stats['stdev'] ** 2 / len(new)
+        scale = math.sqrt(baseline_var + new_var)
+        df = (baseline_var + new_var) ** 2 / (baseline_var ** 2 / (len(baseline) - 1) + new_var ** 2 / (len(new) - 1)) if scale > 0 else 1
+    else:
+        scale = baseline_stats['stdev'] * math.sqrt(1.0 + 1.0 / len(baseline))
+        df = len(baseline) - 1
+    if scale == 0:
+        return 0.0 if difference > 0 else 1.0
+    return student_t_sf(difference / scale, df)
+
+
+def compare_run(conn, run_id, baseline_runs=5, baseline_version=None):
+    '''
+    Compares every job of a stored run against its rolling baseline. Returns one row per job
+    with the baseline and new mean runtimes, the relative change, the p-value of the slowdown
+    and whether it counts as a regression.
+    '''
+    rows = []
+    job_keys = [row[0] for row in conn.execute('SELECT DISTINCT job_key FROM samples WHERE run_id = ? ORDER BY rowid', (run_id,))]
+    for job_key in job_keys:
+        new = [row[0] for row in conn.execute('SELECT runtime FROM samples WHERE run_id = ? AND job_key = ? ORDER BY sample', (run_id, job_key))]
+        baseline, num_runs = get_baseline_samples(conn, run_id, job_key, baseline_runs, baseline_version)
+        row = OrderedDict([
+            ('job', job_key),
+            ('baseline_runs', num_runs),
+            ('baseline_mean', summarize_samples(baseline).get('mean')),
+            ('new_mean', summarize_samples(new)['mean']),
+            ('change', None),
+            ('p_value', slowdown_p_value(baseline, new)),
+        ])
+        if row['baseline_mean']:
+            row['change'] = row['new_mean'] / row['baseline_mean'] - 1.0
+        row['regression'] = (row['p_value'] is not None and row['p_value'] < REGRESSION_ALPHA
+                             and row['change'] >= REGRESSION_MIN_SLOWDOWN)
+        rows.append(row)
+    return rows
+
+
+def print_comparison(conn, run_id, rows):
+    version, dataset, instance_type, gpu_model, cache_state, path = conn.execute(
+        'SELECT version, dataset, instance_type, gpu_model, cache_state, path FROM runs WHERE run_id = ?', (run_id,)).fetchone()
+    print (" Comparing {} against earlier runs".format(path))
+    print ("  cryoSPARC {}, EMPIAR {}, instance type {}, GPU {}, cache {}".format(version, dataset, instance_type, gpu_model, cache_state))
+    print ("  {:<24} {:>5} {:>12} {:>12} {:>8} {:>8}".format('job', 'runs', 'baseline (s)', 'new (s)', 'change', 'p'))
+    for row in rows:
+        if row['baseline_mean'] is None:
+            print ("  {:<24} {:>5} {:>12} {:>12.2f}   no baseline".format(row['job'], 0, '-', row['new_mean']))
+            continue
+        print ("  {:<24} {:>5} {:>12.2f} {:>12.2f} {:>+7.1%} {:>8} {}".format(
+            row['job'], row['baseline_runs'], row['baseline_mean'], row['new_mean'], row['change'],
+            '%.3f' % row['p_value'] if row['p_value'] is not None else '-', 'REGRESSION' if row['regression'] else ''))
+    regressions = [row['job'] for row in rows if row['regression']]
+    if regressions:
+        print (" {} job(s) regressed: {}".format(len(regressions), ', '.join(regressions)))
+    return regressions
+
 
+# Environment variable with the path of the startup report written by entry.sh: when the
+# container started and how long each step took until cryoSPARC was ready to queue jobs.
+# Shells opened in the container with docker exec don't have it, so entry.sh's default is used.
+STARTUP_REPORT_ENV = 'CS_STARTUP_REPORT'
+DEFAULT_STARTUP_REPORT = '/tmp/cryosparc_startup.json'
+# Key of the time from the container starting to the first benchmark job being queued
+TIME_TO_FIRST_JOB_KEY = 'time_to_first_job'
 
-def get_job_info(benchmark_jobs_dict, dataset_selected, job_key):
-    for mode, datasets in iter(benchmark_jobs_dict.items()):
-        for dataset in datasets:
-            if dataset == dataset_selected:
-                for job in benchmark_jobs_dict[mode][dataset]:
-                    if job['key'] == job_key:
-                        return job
+
+def load_startup_report():
+    '''
+    Returns the container startup report, or None when not running in the container.
+    '''
+    path = os.environ.get(STARTUP_REPORT_ENV) or DEFAULT_STARTUP_REPORT
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            report = json.load(f, object_pairs_hook=OrderedDict)
+    except ValueError:
+        return None
+    report['path'] = path
+    return report
+
+
+def claim_startup_report(report):
+    '''
+    Marks the startup report as used by the benchmark starting now. Returns False if an earlier
+    benchmark already used it, as only the first benchmark after the container started
+    measures the time to its first job from the container starting.
+    '''
+    if report.get('benchmark_started_at') is not None:
+        return False
+    report['benchmark_started_at'] = time.time()
+    write_run_journal(report.pop('path'), report)
+    return True
+
+
+# Statuses of a job submitted before the benchmark was interrupted that mean it can be
+# followed to completion instead of being launched again
+RESUMABLE_JOB_STATUSES = ['queued', 'launched', 'started', 'running', 'waiting', 'completed']
+JOURNAL_SUFFIX = '_benchmark_journal.json'
+
+
+def write_run_journal(path, journal):
+    '''
+    Replaces the run journal in one step, so an interrupted write never leaves a truncated journal.
+    '''
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(journal, f, indent=1, default=lambda value: value.isoformat() if isinstance(value, datetime.datetime) else str(value))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_run_journal(path):
+    '''
+    Reads a run journal, turning the recorded job timestamps back into datetimes.
+    '''
+    with open(path) as f:
+        journal = json.load(f, object_pairs_hook=OrderedDict)
+    for jobt in journal.get('job_timestamps', {}).values():
+        for field, value in iter(jobt.items()):
+            if isinstance(value, str):
+                jobt[field] = datetime.datetime.fromisoformat(value)
+    return journal
+
+
+def find_run_journal(out_dir):
+    '''
+    Returns the most recently updated journal under out_dir of a run that didn't finish, or None.
+    '''
+    journals = []
+    for root, _, names in os.walk(out_dir):
+        journals.extend(os.path.join(root, name) for name in names if name.endswith(JOURNAL_SUFFIX))
+    for path in sorted(journals, key=os.path.getmtime, reverse=True):
+        try:
+            with open(path) as f:
+                if not json.load(f).get('finished'):
+                    return path
+        except (OSError, ValueError):
+            continue
+    return None
+
+
+def run_blocking(function, *args, **kwargs):
+    '''
+    Runs a blocking call (a command core request, a database query or file output)
+    in the event loop's thread pool, so other jobs keep being scheduled while it runs.
+    '''
+    return asyncio.get_event_loop().run_in_executor(None, functools.partial(function, *args, **kwargs))
 
 
 def mkdir_p(path):
@@ -633,13 +2619,211 @@ def mkdir_p(path):
             raise
 
 
-def connect_and_get_version(master_hostname, command_core_port):
+# Upper bounds (seconds) of the latency histogram buckets of command_core and database calls
+RPC_LATENCY_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+# Database calls that stay open for the whole run and are not timed
+UNTIMED_CALLS = ['watch']
+
+
+class RpcLatencyRecorder(object):
+    '''
+    Collects the latency of every command_core call and database query of a run, by call name
+    (e.g. cli.make_job, db.jobs.find). Calls are made from many threads at once.
+    '''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+
+    def record(self, name, seconds):
+        with self.lock:
+            self.latencies[name].append(seconds)
+
+    def summary(self):
+        '''
+        Returns, by call name, the number of calls, their total, mean, median, 95th percentile and
+        maximum latency in seconds, and a histogram of the number of calls up to each bucket bound.
+        '''
+        with self.lock:
+            latencies = dict((name, list(values)) for name, values in iter(self.latencies.items()))
+        summary = OrderedDict()
+        for name in sorted(latencies, key=lambda name: -sum(latencies[name])):
+            values = latencies[name]
+            histogram = OrderedDict(('<={}'.format(bound), 0) for bound in RPC_LATENCY_BUCKETS)
+            histogram['>{}'.format(RPC_LATENCY_BUCKETS[-1])] = 0
+            for value in values:
+                bound = next((bound for bound in RPC_LATENCY_BUCKETS if value <= bound), None)
+                histogram['<={}'.format(bound) if bound is not None else '>{}'.format(RPC_LATENCY_BUCKETS[-1])] += 1
+            summary[name] = OrderedDict([
+                ('count', len(values)),
+                ('total', sum(values)),
+                ('mean', sum(values) / len(values)),
+                ('median', percentile(values, 50)),
+                ('p95', percentile(values, 95)),
+                ('max', max(values)),
+                ('histogram', histogram),
+            ])
+        return summary
+
+
+class TimedProxy(object):
+    '''
+    Stands in for rc.cli or a collection of rc.db, timing every method call into a
+    RpcLatencyRecorder under <name>.<method>. Database cursors are timed while they are read,
+    as the query only runs then. For rc.db itself (collections=True), the collections are proxied.
+    '''
+
+    def __init__(self, target, recorder, name, collections=False):
+        self._target = target
+        self._recorder = recorder
+        self._name = name
+        self._collections = collections
+
+    def __getattr__(self, attr):
+        value = getattr(self._target, attr)
+        name = '{}.{}'.format(self._name, attr)
+        if self._collections:
+            return TimedProxy(value, self._recorder, name)
+        if attr in UNTIMED_CALLS or not callable(value):
+            return value
+        def timed_call(*args, **kwargs):
+            start = time.time()
+            try:
+                result = value(*args, **kwargs)
+            finally:
+                self._recorder.record(name, time.time() - start)
+            if hasattr(result, 'batch_size'):
+                return TimedCursor(result, self._recorder, name)
+            return result
+        return timed_call
+
+    def __getitem__(self, item):
+        return TimedProxy(self._target[item], self._recorder, '{}.{}'.format(self._name, item))
+
+
+class TimedCursor(object):
+    '''
+    A database cursor that adds the time spent fetching its documents to the latency of the query.
+    '''
+
+    def __init__(self, cursor, recorder, name):
+        self._cursor = cursor
+        self._recorder = recorder
+        self._name = name
+
+    def __getattr__(self, attr):
+        value = getattr(self._cursor, attr)
+        if not callable(value):
+            return value
+        def chained_call(*args, **kwargs):
+            result = value(*args, **kwargs)
+            # sort(), limit() etc. return the cursor to chain further calls
+            if hasattr(result, 'batch_size'):
+                return TimedCursor(result, self._recorder, self._name)
+            return result
+        return chained_call
+
+    def __iter__(self):
+        iterator = iter(self._cursor)
+        elapsed = 0.0
+        try:
+            while True:
+                start = time.time()
+                try:
+                    doc = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    elapsed += time.time() - start
+                yield doc
+        finally:
+            self._recorder.record(self._name + '.fetch', elapsed)
+
+
+def get_cli_capabilities(version):
+    '''
+    Returns which cli arguments the connected cryoSPARC version supports, worked out once per session.
+    '''
+    if version == 'develop':
+        top_version_num, major_version_num = 999, 999
+    else:
+        top_version_num, major_version_num = int(version.split('.')[0][1:]), int(version.split('.')[1])
+    legacy = top_version_num <= 2 and major_version_num < 14
+    return {
+        # cli.make_job() in cryoSPARC versions prior to v2.14.0 didn't have the "title" argument
+        'make_job_title' : not legacy,
+        # cli.enqueue_job() in cryoSPARC versions prior to v2.12.0 didn't have the "hostname" or "gpus" arguments, only "lane"
+        'enqueue_job_placement' : not legacy,
+    }
+
+
+def submit_job(cli, capabilities, project_uid, workspace_uid, user_id, job_type, job_title, params, input_group_connects,
+               worker_hostname, gpus, worker_lane=None, on_created=None):
+    '''
+    Creates a job and queues it on the worker: import jobs are made to go through the scheduler
+    instead of running directly on the master, CPU-only jobs are placed by the scheduler, and
+    versions that can't place jobs on a host get the GPUs through the job's resources and are
+    queued to worker_lane. on_created(job_uid) is called once the job exists, before it is queued.
+    Returns the uid of the job.
+    '''
+    make_job_args = {
+        'job_type' : job_type, 
+        'project_uid' : project_uid, 
+        'workspace_uid' : workspace_uid, 
+        'user_id' : user_id, 
+        'title' : job_title, 
+        'params' : params, 
+        'input_group_connects' : input_group_connects
+    }
+
+    if not capabilities['make_job_title']:
+       del make_job_args['title']
+
+    job_uid = cli.make_job(**make_job_args)
+    if on_created is not None:
+        on_created(job_uid)
+
+    # all changes to the new job are made in a single call
+    job_updates = {}
+    if "import" in job_type:
+        job_updates.update({'run_on_master_direct' : False, 'errors_build_params' : {}})
+
+    enqueue_job_args = {
+        'project_uid' : project_uid,
+        'job_uid' : job_uid, 
+        'hostname' : worker_hostname, 
+        'gpus' : gpus
+    }
+    if not gpus:
+        # CPU-only jobs are placed by the scheduler on the worker
+        del enqueue_job_args['gpus']
+
+    if not capabilities['enqueue_job_placement']:
+        assert worker_lane is not None, "the lane of worker {} is needed to queue jobs with this cryoSPARC version".format(worker_hostname)
+        del enqueue_job_args['hostname']
+        enqueue_job_args.pop('gpus', None)
+        enqueue_job_args['lane'] = worker_lane
+        resources_needed = cli.get_job(project_uid, job_uid, 'resources_needed')['resources_needed']
+        resources_needed['slots']['GPU'] = gpus or []
+        job_updates['resources_needed'] = resources_needed
+
+    if job_updates:
+        cli.update_job(project_uid, job_uid, job_updates)
+    cli.enqueue_job(**enqueue_job_args)
+    return job_uid
+
+
+def connect_and_get_version(master_hostname, command_core_port, recorder=None):
     global cli
     global db
+    assert rc is not None, "cryoSPARC is not available, run this script after eval $(cryosparcm env)"
     print (" Attempting to connect to {}:{}...".format(master_hostname, command_core_port))
     rc.connect(master_hostname, command_core_port)
     cli = rc.cli
     db = rc.db
+    if recorder is not None:
+        cli = TimedProxy(rc.cli, recorder, 'cli')
+        db = TimedProxy(rc.db, recorder, 'db', collections=True)
     print (" Connected to master.")
     sysinfo = cli.get_system_info()
     version = sysinfo['version']
@@ -648,153 +2832,582 @@ def connect_and_get_version(master_hostname, command_core_port):
     return version
 
 
-def benchmark_cryoSPARC(master_hostname, worker_hostname, command_core_port, gpu_devidxs, mode, dataset, project_uid, user_email, output_timings_dir, advanced_mode, job):
+def benchmark_cryoSPARC(master_hostname, worker_hostname, command_core_port, gpu_devidxs, mode, dataset, project_uid, user_email, output_timings_dir, advanced_mode, job, *, parallel=1, compress_streamlogs=False, telemetry_interval=5.0, run_io_check=False, cache_state=None, repeat=1, warmup=0, reuse_jobs=False, suite=None, instance_type=None, scaling=False, sweep=None, fraction=None, max_particles=None, max_movies=None, subset_dir=None, results_db=None, resume=None, timeout_history=None, timeout_factor=2.0, straggler_factor=3.0, ssd_cache=False, policy='fifo', policy_history=None):
     juids = OrderedDict()
     timings = {}
+    job_timestamps = {}
+    phases = OrderedDict()
+    pending_exports = []
+    performance_failures = OrderedDict()
+    skipped_jobs = []
+    ssd_cache_usage = OrderedDict()
+    workflow_jobs = OrderedDict()
+    first_job_queued_at = None
 
-    def queue_and_run_job(key, job_type, job_title = None, params = {}, input_group_connects = {}, timeout = 36000):
-
-        print ("  Running {} ({}) with {} second timeout: ".format(key, job_type, timeout))
-
-        major_version_num = int(version.split('.')[1]) if version != 'develop' else 999
-        top_version_num = int(version.split('.')[0][1:]) if version != 'develop' else 999
-
-        make_job_args = {
-            'job_type' : job_type, 
-            'project_uid' : project_uid, 
-            'workspace_uid' : workspace_uid, 
-            'user_id' : bench_uuid, 
-            'title' : job_title, 
-            'params' : params, 
-            'input_group_connects' : input_group_connects
-        }
-
-        if top_version_num <= 2 and major_version_num < 14:
-           # cli.make_job() in cryoSPARC versions prior to v2.14.0 didn't have the "title" argument
-           del make_job_args['title']
+    def get_input_group_connects(job_info):
+        input_group_connects = defaultdict(list)
+        unconstructed_input_group_connects = job_info.get('input_group_connects', False)
+        if unconstructed_input_group_connects:
+            for k,v in iter(unconstructed_input_group_connects.items()):
+                for val in v:
+                    input_group_connects[k].append('{}.{}'.format(juids[val['input_job_name']], val['group_name']))
+        return input_group_connects
 
-        juids[key] = cli.make_job(**make_job_args)
+    async def queue_and_run_job(key, job_type, job_title = None, params = {}, input_group_connects = {}, timeout = 36000, gpus = None, attach = False):
+        nonlocal first_job_queued_at
 
-        if "import" in job_type:
-            cli.update_job(project_uid, juids[key], {'run_on_master_direct' : False, 'errors_build_params' : {}})
-
-        enqueue_job_args = {
-            'project_uid' : project_uid,
-            'job_uid' : juids[key], 
-            'hostname' : worker_hostname, 
-            'gpus' : gpu_devidxs
-        }
+        if gpus is None:
+            gpus = gpu_devidxs
+        if attach:
+            print ("  Re-attaching to {} ({}) as job {} on GPU(s) {} with {} second timeout: ".format(key, job_type, juids[key], gpus, timeout))
+        else:
+            print ("  Running {} ({}) on GPU(s) {} with {} second timeout: ".format(key, job_type, gpus, timeout))
+            loop = asyncio.get_event_loop()
+            def job_created(job_uid):
+                # journaled before the job is queued, so that --resume never launches it a second time;
+                # the journal is written in the event loop's thread, the job is queued once it is saved
+                asyncio.run_coroutine_threadsafe(record_created_job(key, job_uid, gpus), loop).result()
+            await run_blocking(submit_job, cli, capabilities, project_uid, workspace_uid, bench_uuid, job_type, job_title, params,
+                               input_group_connects, worker_hostname, gpus, worker_target['lane'] if worker_target else None, job_created)
+            if first_job_queued_at is None:
+                first_job_queued_at = time.time()
 
-        if top_version_num <= 2 and major_version_num < 14:
-            # cli.enqueue_job() in cryoSPARC versions prior to v2.12.0 didn't have the "hostname" or "gpus" arguments, only "lane"
-            del enqueue_job_args['hostname']
-            del enqueue_job_args['gpus']
-            targets = cli.get_scheduler_targets()
-            target = rc.com.query(targets, lambda t : t['hostname'] == worker_hostname)
-            enqueue_job_args['lane'] = target['lane']
-            resources_needed = cli.get_job(project_uid, juids[key], 'resources_needed')['resources_needed']
-            resources_needed['slots']['GPU'] = gpu_devidxs
-            cli.update_job(project_uid, juids[key], {'resources_needed' : resources_needed})
-
-        time.sleep(0.3)
-        cli.enqueue_job(**enqueue_job_args)
-        
-        jstatus = rc.wait_job_status(project_uid, juids[key], ['completed'], timeout=timeout)
-        assert jstatus == 'completed', "{} Job did not finish within {} seconds!".format(job_type, timeout)
-            
-        #write out text streamlog events to file within the output directory
-        all_text_events = list(db.events.find({'project_uid':project_uid, 'job_uid':juids[key], 'type':'text'}, {'_id':0, 'created_at':1, 'text':1}))
+        analyzer = StreamlogAnalyzer()
         streamlog_path_abs = os.path.join(streamlog_path_rel, '{}-{}_{}_streamlog.log'.format(key, project_uid, juids[key]))
-        with open(streamlog_path_abs, 'w') as openfile:
-            for event in all_text_events:
-                openfile.write("%s  %s\n"%(str(event['created_at']), event['text'].strip('\n')))
+        exporter = StreamlogExporter(db, project_uid, juids[key], streamlog_path_abs, analyzer, compress=compress_streamlogs)
+        export_task = asyncio.ensure_future(exporter.follow())
+        try:
+            waits = [asyncio.ensure_future(watcher.wait(juids[key], ['completed', 'failed', 'killed'], timeout))]
+            if expected_progress.get(key):
+                waits.append(asyncio.ensure_future(watch_progress(analyzer, expected_progress[key])))
+            finished, unfinished = await asyncio.wait(waits, return_when=asyncio.FIRST_COMPLETED)
+            for task in unfinished:
+                task.cancel()
+            jstatus = waits[0].result() if waits[0] in finished else None
+            if timeout_history is not None and jstatus not in ['completed', 'failed', 'killed']:
+                # a straggler or a timeout: give the GPUs to the remaining jobs
+                if waits[0] in finished:
+                    # the status wait ran out: the job is still queued or running, or its status is unknown
+                    reason = "still {} after {:.0f} seconds".format(jstatus, timeout)
+                else:
+                    reason = waits[1].result()
+                await run_blocking(cli.kill_job, project_uid, juids[key])
+                performance_failures[key] = OrderedDict([
+                    ('job_uid', juids[key]),
+                    ('reason', reason),
+                    ('timeout', timeout),
+                    ('expected_progress', expected_progress.get(key)),
+                ])
+                save_journal()
+                print ("    Killed {} as a performance failure: {}".format(key, reason))
+                return False
+            assert jstatus == 'completed', "{} Job did not complete within {} seconds (status {})!".format(job_type, timeout, jstatus)
+        finally:
+            exporter.stop()
+            pending_exports.append(export_task)
 
-        jobt = db.jobs.find_one({'project_uid':project_uid,'uid':juids[key]},{'started_at':1, 'completed_at':1})
+        jobt = await run_blocking(db.jobs.find_one, {'project_uid':project_uid,'uid':juids[key]},{'queued_at':1, 'launched_at':1, 'started_at':1, 'completed_at':1})
+        job_timestamps[key] = jobt
         jobtime = (jobt['completed_at'] - jobt['started_at']).total_seconds()
         timings[key] = jobtime
+        save_journal()
         print ("    Job runtime: %.2f seconds" % jobtime)
+        # the rest of the streamlog is written while dependent jobs get started
+        pending_exports.append(asyncio.ensure_future(finish_export(key, export_task, analyzer, jobt)))
+        if job_type in WORKFLOW_JOB_TYPES:
+            await time_child_jobs(key, timeout)
+
+    async def time_child_jobs(key, timeout):
+        parent = await run_blocking(db.jobs.find_one, {'project_uid':project_uid,'uid':juids[key]}, {'created_at':1})
+        children = await run_blocking(find_child_jobs, db, project_uid, parent['created_at'], set(juids.values()))
+        # the workflow may finish before the last jobs it queued; together they get the workflow's timeout
+        deadline = time.time() + timeout
+        for doc in children:
+            await watcher.wait(doc['uid'], ['completed', 'failed', 'killed'], max(0.0, deadline - time.time()))
+        children = await run_blocking(find_child_jobs, db, project_uid, parent['created_at'], set(juids.values()))
+        workflow_jobs[key] = OrderedDict()
+        print ("    {} job(s) run by the workflow:".format(len(children)))
+        for child_key, doc in iter(get_child_job_keys(key, children).items()):
+            workflow_jobs[key][child_key] = OrderedDict([('job_uid', doc['uid']), ('job_type', doc['job_type']), ('status', doc['status'])])
+            if doc['status'] == 'completed' and doc.get('started_at') is not None:
+                job_timestamps[child_key] = dict((field, doc.get(field)) for field in ['queued_at', 'launched_at', 'started_at', 'completed_at'])
+                timings[child_key] = (doc['completed_at'] - doc['started_at']).total_seconds()
+                print ("      {:<40} {} {:>10.2f} seconds".format(child_key, doc['uid'], timings[child_key]))
+            else:
+                print ("      {:<40} {} {}".format(child_key, doc['uid'], doc['status']))
+        save_journal()
+
+    async def watch_progress(analyzer, expected):
+        while True:
+            await asyncio.sleep(STRAGGLER_CHECK_INTERVAL)
+            reason = analyzer.check_progress(expected, straggler_factor, datetime.datetime.utcnow(), STRAGGLER_MIN_SECONDS)
+            if reason is not None:
+                return reason
+
+    async def finish_export(key, export_task, analyzer, jobt):
+        await export_task
+        phases[key] = analyzer.summary(jobt)
+        save_journal()
+        if phases[key]['outlier_iterations']:
+            print ("    {} iteration(s) of {} took unusually long or short: {}".format(
+                len(phases[key]['outlier_iterations']), key, [outlier['iteration'] for outlier in phases[key]['outlier_iterations']]))
+
+    async def record_created_job(key, job_uid, gpus):
+        juids[key] = job_uid
+        job_gpus_by_key[key] = gpus
+        save_journal()
 
+    def save_journal(finished = False):
+        write_run_journal(journal_path, OrderedDict([
+            ('finished', finished),
+            ('dataset', dataset),
+            ('mode', mode),
+            ('job', job),
+            ('advanced', advanced_mode),
+            ('version', version),
+            ('project_uid', project_uid),
+            ('workspace_uid', workspace_uid),
+            ('sessions', sessions),
+            ('job_uids', juids),
+            ('job_gpus', job_gpus_by_key),
+            ('timings', timings),
+            ('job_timestamps', job_timestamps),
+            ('phases', phases),
+            ('reused_jobs', reused_jobs),
+            ('performance_failures', performance_failures),
+            ('skipped_jobs', skipped_jobs),
+            ('workflow_jobs', workflow_jobs),
+        ]))
 
     def write_timings_and_disconnect():
         timings_path_abs = os.path.join(streamlog_path_rel,'{}_{}_benchmark_timings.json'.format(project_uid, workspace_uid))
         with open (timings_path_abs, 'w') as f:
-            json.dump({'version' : version, 'project_uid':project_uid, 'job_uids' : juids, 'timings' : timings}, f)
+            json.dump({
+                'version' : version,
+                'suite_version' : suite.version,
+                'dataset' : dataset,
+                'mode' : mode,
+                'job' : job,
+                'advanced' : advanced_mode,
+                'instance_type' : instance_type,
+                'gpu_model' : gpu_model,
+                'gpus' : gpu_devidxs,
+                'project_uid' : project_uid,
+                'job_uids' : juids,
+                'timings' : timings,
+                'parallel' : parallel,
+                'policy' : policy,
+                'wall_time' : wall_time,
+                'gpu_utilization' : gpu_utilization,
+                'inter_job_gaps' : inter_job_gaps,
+                'phases' : phases,
+                'telemetry_file' : telemetry_path_abs,
+                'io_preflight' : io_preflight,
+                'cache_state' : cache_preparation,
+                'repeat' : repeat,
+                'warmup' : warmup,
+                'statistics' : statistics,
+                'reused_jobs' : reused_jobs,
+                'gpu_scaling' : gpu_scaling,
+                'parameter_sweep' : parameter_sweep,
+                'subset' : subset,
+                'resumes' : len(sessions) - 1,
+                'adaptive_timeouts' : adaptive_timeouts,
+                'performance_failures' : performance_failures,
+                'skipped_jobs' : skipped_jobs,
+                'ssd_cache' : ssd_cache_summary,
+                'workflow_jobs' : workflow_jobs,
+                'startup' : startup,
+                'rpc_latency' : rpc_summary,
+            }, f)
 
         rc.disconnect()
+        return timings_path_abs
 
 
-    version = connect_and_get_version(master_hostname, command_core_port)
+    if suite is None:
+        suite = get_benchmark_suite(input_data_dir)
+    suite_errors = suite.validate()
+    assert not suite_errors, "the benchmark suite is invalid:\n  {}".format('\n  '.join(suite_errors))
+
+    jobs = select_benchmark_jobs(suite, dataset, mode, advanced_mode, job)
+    # fails on missing dependencies before anything is created in cryoSPARC
+    build_job_dag(jobs)
+
+    subset = None
+    if fraction is not None or max_particles is not None or max_movies is not None:
+        if subset_dir is None:
+            limits = [('f', fraction), ('p', max_particles), ('m', max_movies)]
+            subset_dir = os.path.join(output_timings_dir, 'subset_{}'.format('_'.join('{}{}'.format(name, value) for name, value in limits if value is not None)))
+        jobs, subset = make_input_subset(jobs, subset_dir, fraction, max_particles, max_movies)
+        print (" Benchmarking a subset of the input data in {}".format(subset['subset_dir']))
+        for key, counts in iter(subset['imports'].items()):
+            print ("  {:<24} {} of {} ({:.1%})".format(key, counts['kept'], counts['total'], counts['fraction'] or 0))
+        print ("-----------------------------------------------------------------------")
+
+    startup = load_startup_report()
+    first_after_startup = startup is not None and claim_startup_report(startup)
+    rpc_latency = RpcLatencyRecorder()
+    version = connect_and_get_version(master_hostname, command_core_port, rpc_latency)
+    capabilities = get_cli_capabilities(version)
+    try:
+        targets = cli.get_scheduler_targets()
+    except Exception:
+        targets = None
+    gpu_model = get_gpu_model(targets, worker_hostname, gpu_devidxs)
+    worker_target = rc.com.query(targets, lambda t : t.get('hostname') == worker_hostname) if targets else None
 
     if user_email is None:
         user_email = 'Benchmark'
     bench_uuid = cli.get_id_by_email (user_email)
-    workspace_uid = cli.create_empty_workspace(
-        project_uid=project_uid, 
-        created_by_user_id=bench_uuid, 
-        title='EMPIAR %d -%s%s Benchmark on %s at %s' % (dataset, " Advanced " if advanced_mode else " ", mode.title() if mode else job, worker_hostname, datetime.datetime.now())
-    )
-    print (" Created workspace {} in {}".format(workspace_uid, project_uid))
+    journal = None
+    if resume is not None:
+        journal = load_run_journal(resume)
+        assert (journal['project_uid'], journal['dataset'], journal['mode'], journal['job'], journal['advanced']) == (project_uid, dataset, mode, job, advanced_mode), \
+            "{} is the journal of a different benchmark (project {}, dataset {}, mode {}, job {}, advanced {})".format(
+                resume, journal['project_uid'], journal['dataset'], journal['mode'], journal['job'], journal['advanced'])
+        workspace_uid = journal['workspace_uid']
+        print (" Resuming the benchmark in workspace {} of {}".format(workspace_uid, project_uid))
+    else:
+        workspace_uid = cli.create_empty_workspace(
+            project_uid=project_uid, 
+            created_by_user_id=bench_uuid, 
+            title='EMPIAR %d -%s%s Benchmark on %s at %s' % (dataset, " Advanced " if advanced_mode else " ", mode.title() if mode else job, worker_hostname, datetime.datetime.now())
+        )
+        print (" Created workspace {} in {}".format(workspace_uid, project_uid))
     print ("-----------------------------------------------------------------------")
     streamlog_path_rel = os.path.join(output_timings_dir,'{}_{}_events'.format(project_uid, workspace_uid))
     mkdir_p(streamlog_path_rel)
+    journal_path = os.path.join(streamlog_path_rel, '{}_{}{}'.format(project_uid, workspace_uid, JOURNAL_SUFFIX))
+    sessions = list(journal['sessions']) if journal is not None else []
+    sessions.append(datetime.datetime.now().isoformat())
+    job_gpus_by_key = OrderedDict()
     print (" Writing job streamlog contents to folder {}".format(streamlog_path_rel))
     print ("-----------------------------------------------------------------------")
     print (" BENCHMARK START")
     print ("-----------------------------------------------------------------------")
 
-    benchmark_jobs = get_benchmark_jobs_dict(input_data_dir)
+    measured_keys = [job] if job else None
+    if scaling:
+        gpu_counts = get_scaling_gpu_counts(len(gpu_devidxs))
+        jobs = expand_gpu_scaling(jobs, job, gpu_counts)
+        measured_keys = ['{}_gpus{}'.format(job, count) for count in gpu_counts]
+        print (" GPU scaling study of {} on {} GPU(s)".format(job, ', '.join(str(count) for count in gpu_counts)))
+        print ("-----------------------------------------------------------------------")
+
+    if sweep:
+        jobs = expand_parameter_sweep(jobs, job, sweep)
+        sweep_keys = [job_info['key'] for job_info in jobs if 'sweep_params' in job_info]
+        measured_keys = sweep_keys
+        print (" Parameter sweep of {} over {} point(s): {}".format(job, len(sweep_keys), ', '.join('{}={}'.format(name, values) for name, values in iter(sweep.items()))))
+        print ("-----------------------------------------------------------------------")
 
-    if job:
-        # job only mode
-        def run_single_job(job_info):
-            if len(job_info['setup_requires']) == 0:
-                input_group_connects = defaultdict(list)
-                unconstructed_input_group_connects = job_info.get('input_group_connects', False)
-                if unconstructed_input_group_connects:
-                    for k,v in iter(unconstructed_input_group_connects.items()):
-                        for val in v:
-                            input_group_connects[k].append('{}.{}'.format(juids[val['input_job_name']], val['group_name']))
-
-                queue_and_run_job(
-                    key = job_info['key'],
-                    job_type = job_info['job_type'],
-                    job_title = job_info['job_title'],
-                    params = job_info.get('params', {}),
-                    input_group_connects = input_group_connects,
-                    timeout = job_info.get('timeout', 36000),
-                )
-            else:
-                while len(job_info['setup_requires']):
-                    job_key = job_info['setup_requires'].pop(0)
-                    new_job_info = get_job_info(benchmark_jobs, dataset, job_key)
-                    run_single_job(new_job_info)
-                run_single_job(job_info)
-                
-        job_info = get_job_info(benchmark_jobs, dataset, job)
-        run_single_job(job_info)
+    ssd_path = get_ssd_path()
+    if ssd_cache:
+        jobs = expand_ssd_cache_runs(jobs, [job] if job else None)
+        print (" Running {} job(s) without the SSD cache, then with it cold and warm (cache in {})".format(
+            len([job_info for job_info in jobs if job_info.get('ssd_cache_run') == 'cold']), ssd_path))
+        print ("-----------------------------------------------------------------------")
 
-    else:
-        for job in benchmark_jobs[mode][dataset]:
-            if not advanced_mode and job['advanced']:
-                continue
+    num_runs = warmup + repeat
+    if num_runs > 1:
+        # in job only mode, only the selected job is repeated
+        jobs = expand_repeats(jobs, num_runs, measured_keys)
+        print (" Running each job {} times, discarding the first {} run(s)".format(num_runs, warmup))
+        print ("-----------------------------------------------------------------------")
 
-            input_group_connects = defaultdict(list)
-            unconstructed_input_group_connects = job.get('input_group_connects', False)
-            if unconstructed_input_group_connects:
-                for k,v in iter(unconstructed_input_group_connects.items()):
-                    for val in v:
-                        input_group_connects[k].append('{}.{}'.format(juids[val['input_job_name']], val['group_name']))
-
-            queue_and_run_job(
-                key = job['key'],
-                job_type = job['job_type'],
-                job_title = job['job_title'],
-                params = job.get('params', {}),
-                input_group_connects = input_group_connects,
-                timeout = job.get('timeout', 36000),
+    io_preflight = None
+    if run_io_check:
+        print (" Measuring storage throughput...")
+        try:
+            project_dir = cli.get_project_dir_abs(project_uid)
+        except Exception:
+            project_dir = None
+        io_preflight = run_io_preflight(jobs, OrderedDict([('project_dir', project_dir), ('ssd_path', get_ssd_path())]))
+        if io_preflight.get('sequential_read_MB_s') is not None:
+            print ("  Input data: {} files, {:.1f} GB, sequential read {:.0f} MB/s, random read {:.0f} MB/s".format(
+                io_preflight['num_input_files'], io_preflight['input_bytes'] / 1e9, io_preflight['sequential_read_MB_s'], io_preflight['random_read_MB_s'] or 0))
+        for label, write_rate in iter(io_preflight['write_MB_s'].items()):
+            print ("  {} write: {:.0f} MB/s".format(label, write_rate or 0))
+        for warning in io_preflight['warnings']:
+            print ("  WARNING: {}, storage may dominate the measured runtimes".format(warning))
+        print ("-----------------------------------------------------------------------")
+
+    cache_preparation = OrderedDict([('mode', cache_state)])
+    if cache_state is not None:
+        print (" Preparing {} page cache for the input data...".format(cache_state))
+        cache_preparation = prepare_page_cache(get_input_files(jobs), cache_state)
+        print ("  {} files in {:.1f} seconds".format(cache_preparation['num_files'], cache_preparation['seconds']))
+        if cache_state == 'cold' and not cache_preparation['all_evicted']:
+            print ("  WARNING: some input files could not be evicted from the page cache")
+        print ("-----------------------------------------------------------------------")
+
+    reusable_keys = set()
+    reusable_jobs = {}
+    reused_jobs = OrderedDict()
+    if reuse_jobs:
+        reusable_keys = get_reusable_keys(jobs, job, measured_keys)
+        reusable_jobs = find_reusable_jobs(db, project_uid, set(job_info['job_type'] for job_info in jobs if job_info['key'] in reusable_keys))
+        print (" Found {} completed job(s) in {} that may be reused".format(len(reusable_jobs), project_uid))
+        print ("-----------------------------------------------------------------------")
+
+    if journal is not None:
+        juids.update(journal['job_uids'])
+        job_gpus_by_key.update(journal['job_gpus'])
+        timings.update(journal['timings'])
+        job_timestamps.update(journal['job_timestamps'])
+        phases.update(journal['phases'])
+        reused_jobs.update(journal['reused_jobs'])
+        workflow_jobs.update(journal.get('workflow_jobs', {}))
+        performance_failures.update(journal.get('performance_failures', {}))
+        skipped_jobs.extend(journal.get('skipped_jobs', []))
+        print (" {} job(s) completed and {} failed before the benchmark was interrupted, {} were still submitted".format(
+            len(timings) + len(reused_jobs), len(performance_failures) + len(skipped_jobs),
+            len([key for key in juids if key not in timings and key not in reused_jobs and key not in performance_failures])))
+        print ("-----------------------------------------------------------------------")
+    save_journal()
+
+    adaptive_timeouts = None
+    job_timeouts = {}
+    expected_progress = {}
+    if timeout_history is not None:
+        timeout_history = filter_timings_history(timeout_history, subset, parallel, cache_state)
+        adaptive_timeouts = OrderedDict()
+        print (" Adaptive timeouts from {} earlier run(s), p99 runtime x {}:".format(len(timeout_history), timeout_factor))
+        for job_info in jobs:
+            key = job_info['key']
+            job_timeouts[key], p99 = get_adaptive_timeout(timeout_history, key, job_info.get('timeout', 36000), timeout_factor, instance_type, dataset)
+            expected_progress[key] = get_historical_progress(timeout_history, key, instance_type, dataset)
+            adaptive_timeouts[key] = OrderedDict([('timeout', job_timeouts[key]), ('p99', p99), ('expected_progress', expected_progress[key])])
+            print ("  {:<24} {:>8.0f} s{}".format(key, job_timeouts[key], '' if p99 is not None else ' (not enough history)'))
+        print ("-----------------------------------------------------------------------")
+
+    priority = None
+    if policy != 'fifo':
+        policy_history = filter_timings_history(policy_history or [], subset, parallel, cache_state)
+        estimates = estimate_job_durations(jobs, policy_history, instance_type, dataset)
+        priority = get_job_priorities(jobs, dict((key, seconds or 0.0) for key, (seconds, _) in iter(estimates.items())), policy)
+        print (" Ready jobs are started by the {} policy, ranked by the runtimes of {} earlier run(s)".format(policy, len(policy_history)))
+        print ("-----------------------------------------------------------------------")
+
+    async def run_job(job_info):
+        key = job_info['key']
+        if key in timings or key in reused_jobs:
+            print ("  Skipping {}, completed as job {} before the benchmark was resumed".format(key, juids[key]))
+            return
+        if key in performance_failures or key in skipped_jobs:
+            # killed or skipped before the resume: its dependents are skipped again
+            print ("  Skipping {}, it failed before the benchmark was resumed".format(key))
+            return False
+        attach = False
+        if key in juids:
+            status = (await run_blocking(cli.get_job, project_uid, juids[key], 'status'))['status']
+            attach = status in RESUMABLE_JOB_STATUSES
+            if not attach:
+                print ("  Launching {} again, job {} was {}".format(key, juids[key], status))
+                del juids[key]
+        if not attach and job_info['key'] in reusable_keys:
+            input_group_connects = get_input_group_connects(job_info)
+            content_key = get_job_content_key(job_info['job_type'], job_info.get('params', {}), input_group_connects, version)
+            if content_key in reusable_jobs:
+                juids[job_info['key']] = reusable_jobs[content_key]
+                reused_jobs[job_info['key']] = reusable_jobs[content_key]
+                print ("  Reusing {} from completed job {}".format(job_info['key'], reusable_jobs[content_key]))
+                save_journal()
+                return
+        if attach:
+            job_gpus, acquired_at = await gpu_pool.acquire_gpus(job_gpus_by_key.get(key, []))
+        else:
+            job_gpus, acquired_at = await gpu_pool.acquire(get_job_num_gpus(job_info, len(gpu_devidxs)))
+        if telemetry is not None:
+            telemetry.job_started(job_info['key'])
+        measure_ssd_cache = job_info.get('ssd_cache_run') in ['cold', 'warm']
+        if measure_ssd_cache:
+            cache_before = await run_blocking(snapshot_ssd_cache, ssd_path)
+        try:
+            result = await queue_and_run_job(
+                key = job_info['key'],
+                job_type = job_info['job_type'],
+                job_title = job_info['job_title'],
+                params = get_job_params(job_info, job_gpus),
+                input_group_connects = get_input_group_connects(job_info),
+                timeout = job_timeouts.get(key, job_info.get('timeout', 36000)),
+                gpus = job_gpus,
+                attach = attach,
             )
+            if measure_ssd_cache and key in job_timestamps:
+                cache_after = await run_blocking(snapshot_ssd_cache, ssd_path)
+                ssd_cache_usage[key] = diff_ssd_cache(cache_before, cache_after, get_epoch_seconds(job_timestamps[key]['started_at']))
+                print ("    SSD cache: {:.2f} GB copied{}".format(ssd_cache_usage[key]['bytes_copied'] / 1e9,
+                    ' in %.1f seconds' % ssd_cache_usage[key]['fill_seconds'] if ssd_cache_usage[key]['fill_seconds'] is not None else ''))
+            return result
+        finally:
+            if telemetry is not None:
+                telemetry.job_finished(job_info['key'])
+            await gpu_pool.release(job_info['key'], job_gpus, acquired_at)
+
+    gpu_pool = None
+    watcher = None
+
+    async def run_benchmark():
+        nonlocal gpu_pool, watcher
+        gpu_pool = GpuPool(gpu_devidxs)
+        watcher = JobStatusWatcher(db, project_uid)
+        await watcher.start()
+        try:
+            for key in await run_job_dag(jobs, run_job, parallel=parallel, priority=priority):
+                if key not in skipped_jobs:
+                    skipped_jobs.append(key)
+        finally:
+            await watcher.stop()
+            await asyncio.gather(*pending_exports, return_exceptions=True)
+        return gpu_pool.utilization_summary()
+
+    telemetry = None
+    telemetry_path_abs = None
+    if telemetry_interval > 0:
+        telemetry = HostTelemetrySampler(
+            OrderedDict([('input_data_dir', input_data_dir), ('ssd_path', get_ssd_path())]),
+            interval=telemetry_interval)
+        telemetry_path_abs = os.path.join(streamlog_path_rel, '{}_{}_telemetry.json'.format(project_uid, workspace_uid))
+        print (" Sampling host telemetry every {} seconds into {}".format(telemetry_interval, telemetry_path_abs))
+        telemetry.start()
 
-    write_timings_and_disconnect()
+    benchmark_start = time.time()
+    try:
+        gpu_utilization = asyncio.run(run_benchmark())
+    finally:
+        if telemetry is not None:
+            telemetry.stop()
+            telemetry.write(telemetry_path_abs)
+    wall_time = time.time() - benchmark_start
+    print ("-----------------------------------------------------------------------")
+    print (" Benchmark wall time: %.2f seconds" % wall_time)
+    print (" GPU allocation: %.1f%% of %d GPU(s) over the run" % (100 * gpu_utilization['utilization'], gpu_utilization['num_gpus']))
+    if performance_failures:
+        print (" Performance failures: {}".format(', '.join(performance_failures.keys())))
+    if skipped_jobs:
+        print (" Skipped because their inputs failed: {}".format(', '.join(skipped_jobs)))
+    rpc_summary = rpc_latency.summary()
+    if rpc_summary:
+        print (" {} command_core and database calls took {:.1f} seconds in total:".format(
+            sum(calls['count'] for calls in rpc_summary.values()), sum(calls['total'] for calls in rpc_summary.values())))
+        for name, calls in list(rpc_summary.items())[:5]:
+            print ("  {:<28} {:>6} calls  mean {:>8.1f} ms  p95 {:>8.1f} ms  total {:>7.1f} s".format(
+                name, calls['count'], 1000 * calls['mean'], 1000 * calls['p95'], calls['total']))
+    if startup is not None:
+        startup.pop('path', None)
+        startup[TIME_TO_FIRST_JOB_KEY] = None
+        if first_after_startup and first_job_queued_at is not None:
+            startup[TIME_TO_FIRST_JOB_KEY] = first_job_queued_at - startup['started_at']
+        print (" Container startup: ready to queue jobs after %.1f seconds, slowest step %s" % (
+            startup['seconds'], max(startup['steps'], key=lambda step: step['seconds'])['name'] if startup['steps'] else '-'))
+        if startup[TIME_TO_FIRST_JOB_KEY] is not None:
+            print (" Time from the container starting to the first job being queued: %.1f seconds" % startup[TIME_TO_FIRST_JOB_KEY])
+        elif not first_after_startup:
+            print (" Time to the first job not recorded, an earlier benchmark ran since the container started")
+
+    # time from the last dependency completing to the job being queued, i.e. latency added by the harness
+    inter_job_gaps = OrderedDict()
+    for key, dependencies in iter(build_job_dag(jobs).items()):
+        # reused jobs completed in an earlier run and don't count
+        completed_dependencies = [dependency for dependency in dependencies if dependency in job_timestamps]
+        if completed_dependencies and key in job_timestamps:
+            parents_completed_at = max(job_timestamps[dependency]['completed_at'] for dependency in completed_dependencies)
+            inter_job_gaps[key] = (job_timestamps[key]['queued_at'] - parents_completed_at).total_seconds()
+    if inter_job_gaps:
+        print (" Mean gap between a job's inputs completing and the job being queued: %.2f seconds" % (sum(inter_job_gaps.values()) / len(inter_job_gaps)))
+
+    statistics = OrderedDict()
+    if num_runs > 1:
+        runs = defaultdict(dict)
+        for key, jobtime in iter(timings.items()):
+            original_key, run = split_repeat_key(key)
+            runs[original_key][run] = jobtime
+        print (" Runtime over {} run(s) per job:".format(repeat))
+        for job_info in jobs:
+            key = job_info['key']
+            if key not in runs or len(runs[key]) < 2:
+                continue
+            ordered = [runs[key][run] for run in sorted(runs[key])]
+            statistics[key] = summarize_samples(ordered[warmup:])
+            statistics[key]['warmup_runs'] = ordered[:warmup]
+            statistics[key]['runs'] = ordered[warmup:]
+            if statistics[key]['n'] > 0:
+                print ("  {:<24} mean {:>9.2f}  median {:>9.2f}  stdev {:>8.2f}  min {:>9.2f}  max {:>9.2f}".format(
+                    key, statistics[key]['mean'], statistics[key]['median'], statistics[key]['stdev'], statistics[key]['min'], statistics[key]['max']))
+
+    gpu_scaling = None
+    if scaling:
+        runtimes = OrderedDict()
+        for count in gpu_counts:
+            key = '{}_gpus{}'.format(job, count)
+            if key in statistics and statistics[key]['n'] > 0:
+                runtimes[count] = statistics[key]['median']
+            elif key in timings:
+                runtimes[count] = timings[key]
+        gpu_scaling = summarize_gpu_scaling(runtimes)
+        gpu_scaling['job'] = job
+        print ("-----------------------------------------------------------------------")
+        print (" GPU scaling of {}:".format(job))
+        print ("  {:>5} {:>12} {:>9} {:>11}".format('GPUs', 'runtime (s)', 'speedup', 'efficiency'))
+        for count, row in iter(gpu_scaling['gpu_counts'].items()):
+            print ("  {:>5} {:>12.2f} {:>9} {:>11}".format(count, row['runtime'],
+                '%.2f' % row['speedup'] if row['speedup'] is not None else '-',
+                '%.0f%%' % (100 * row['efficiency']) if row['efficiency'] is not None else '-'))
+        if gpu_scaling['amdahl_serial_fraction'] is not None:
+            print ("  Amdahl serial fraction: {:.3f}".format(gpu_scaling['amdahl_serial_fraction']))
+
+    parameter_sweep = None
+    if sweep:
+        sweep_params = dict((split_repeat_key(job_info['key'])[0], job_info['sweep_params']) for job_info in jobs if 'sweep_params' in job_info)
+        points = []
+        for key in sweep_keys:
+            if key in statistics and statistics[key]['n'] > 0:
+                points.append((sweep_params[key], statistics[key]['median']))
+            elif key in timings:
+                points.append((sweep_params[key], timings[key]))
+        parameter_sweep = summarize_parameter_sweep(points)
+        parameter_sweep['job'] = job
+        print ("-----------------------------------------------------------------------")
+        print (" Parameter sweep of {}:".format(job))
+        for point in parameter_sweep['points']:
+            print ("  {:<48} {:>10.2f} s".format(', '.join('{}={}'.format(name, value) for name, value in iter(point['params'].items())), point['runtime']))
+        for curve in parameter_sweep['curves']:
+            largest = curve['points'][-1][0]
+            description = "  runtime vs {}{}: linear slope {:.3g} s/unit (R^2 {:.3f})".format(
+                curve['parameter'], ' at ' + ', '.join('{}={}'.format(name, value) for name, value in iter(curve['fixed'].items())) if curve['fixed'] else '',
+                curve['linear']['slope'], curve['linear']['r2'])
+            if 'power_law' in curve:
+                description += ", power law exponent {:.2f} (R^2 {:.3f})".format(curve['power_law']['exponent'], curve['power_law']['r2'])
+            print (description)
+            print ("    predicted runtime at {}={}: {:.1f} s".format(curve['parameter'], 2 * largest, predict_runtime(curve, 2 * largest)))
+
+    ssd_cache_summary = None
+    if ssd_cache:
+        ssd_cache_summary = OrderedDict([('ssd_path', ssd_path), ('jobs', summarize_ssd_cache(jobs, timings, ssd_cache_usage))])
+        print ("-----------------------------------------------------------------------")
+        print (" SSD cache ({}):".format(ssd_path))
+        print ("  {:<24} {:>10} {:>10} {:>10} {:>10} {:>10} {:>8}".format('job', 'no cache', 'cold', 'warm', 'copied', 'fill', 'speedup'))
+        for key, row in iter(ssd_cache_summary['jobs'].items()):
+            cold_cache = row['cold_cache'] or {}
+            seconds = ['%.1f s' % value if value is not None else '-' for value in [row['no_cache'], row['cold'], row['warm'], cold_cache.get('fill_seconds')]]
+            print ("  {:<24} {:>10} {:>10} {:>10} {:>10} {:>10} {:>8}{}".format(key, seconds[0], seconds[1], seconds[2],
+                '%.2f GB' % (cold_cache['bytes_copied'] / 1e9) if cold_cache else '-', seconds[3],
+                '%.2fx' % row['speedup'] if row['speedup'] else '-',
+                '  (the particles were already cached)' if row['cold_was_cached'] else ''))
+
+    timings_path = write_timings_and_disconnect()
+    save_journal(finished=True)
+
+    if results_db is not None:
+        print ("-----------------------------------------------------------------------")
+        conn = open_results_store(results_db)
+        with open(timings_path) as f:
+            run_id = ingest_result(conn, json.load(f), timings_path)
+        print (" Stored the timings in {}".format(results_db))
+        print_comparison(conn, run_id, compare_run(conn, run_id))
+        conn.close()
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='cryoSPARC Benchmark Tool')
@@ -810,15 +3423,69 @@ if __name__ == '__main__':
     parser.add_argument('--out')
     parser.add_argument('--job')
     parser.add_argument('--user_email')
+    parser.add_argument('--instance_type', default=os.environ.get('INSTANCE_TYPE'), help='instance type recorded with the results and used to pick comparable earlier runs (e.g. dgx1v.32g.4.norm)')
+    parser.add_argument('--plan', default=False, action='store_true', help='print the job graph and estimated makespan from earlier runs without running anything')
+    parser.add_argument('--simulate', default=False, action='store_true', help='simulate the benchmark with the runtimes of earlier runs (--history) for each of --policies and --simulate_gpus, without running anything')
+    parser.add_argument('--policies', default=','.join(SCHEDULING_POLICIES), help='comma separated scheduling policies to simulate, out of {}'.format(', '.join(SCHEDULING_POLICIES)))
+    parser.add_argument('--simulate_gpus', help='comma separated GPU counts to simulate (default: the number of --gpus)')
+    parser.add_argument('--ssd_fill_fraction', type=float, help='simulate every job that can use the SSD cache with it on, spending this fraction of its runtime filling the cache unless measured by --ssd_cache runs')
+    parser.add_argument('--history', nargs='*', help='earlier timings JSON files or directories to estimate runtimes from (default: --out)')
+    parser.add_argument('--suite', help='benchmark suite file (default: benchmark_suite.json next to this script)')
+    parser.add_argument('--parallel', type=int, default=1, help='maximum number of benchmark jobs to run at the same time')
+    parser.add_argument('--policy', default='fifo', choices=SCHEDULING_POLICIES, help='order in which jobs that are ready at the same time are started; longest and critical_path rank them by the runtimes in --history')
+    parser.add_argument('--compress_streamlogs', default=False, action='store_true', help='gzip the exported job streamlogs')
+    parser.add_argument('--telemetry_interval', type=float, default=5.0, help='seconds between host telemetry samples, 0 to disable')
+    parser.add_argument('--io_preflight', default=False, action='store_true', help='measure input data and project/SSD storage throughput before running jobs')
+    parser.add_argument('--repeat', type=int, default=1, help='number of measured runs of each job, reusing the same imports')
+    parser.add_argument('--warmup', type=int, default=0, help='number of extra runs of each job to discard before the measured runs')
+    parser.add_argument('--reuse_jobs', default=False, action='store_true', help='reuse identical completed import jobs (and, with --job, the other jobs it depends on) from the project')
+    parser.add_argument('--scaling', default=False, action='store_true', help='with --job of a multi-GPU job type, run the job on 1, 2, 4, ... of the --gpus one at a time and report speedup and parallel efficiency')
+    parser.add_argument('--sweep', action='append', default=[], metavar='PARAM=VALUES', help='with --job, run the job for every combination of parameter values, e.g. class2D_K=25..400 or compute_use_ssd=False,True (repeatable)')
+    parser.add_argument('--fraction', type=float, help='benchmark an evenly spread fraction of the movies and particles, for quick smoke tests')
+    parser.add_argument('--max_particles', type=int, help='benchmark at most this many particles')
+    parser.add_argument('--max_movies', type=int, help='benchmark at most this many movies (but at least one per movie import)')
+    parser.add_argument('--subset_dir', help='where to write the subset STAR files and links to the data (default: a folder in --out)')
+    parser.add_argument('--results_db', help='SQLite result store every run is added to (default: {} in --out)'.format(RESULTS_DB_NAME))
+    parser.add_argument('--ingest', nargs='+', metavar='PATH', help='add earlier timings JSON files, or the ones under directories, to the result store and exit')
+    parser.add_argument('--compare', nargs='?', const='latest', metavar='TIMINGS_JSON', help='compare a run (by default the latest stored one) against its baseline in the result store and exit, with status 1 if a job regressed')
+    parser.add_argument('--baseline_runs', type=int, default=5, help='number of most recent earlier runs that make up the baseline')
+    parser.add_argument('--baseline_version', help='only compare against runs of this cryoSPARC version')
+    parser.add_argument('--resume', nargs='?', const='latest', metavar='JOURNAL', help='continue an interrupted benchmark from its run journal (by default the latest unfinished one in --out), run with the same options as before')
+    parser.add_argument('--adaptive_timeouts', default=False, action='store_true', help='time jobs out, and kill stragglers early, based on the runtimes in --history instead of the fixed suite timeouts')
+    parser.add_argument('--timeout_factor', type=float, default=2.0, help='with --adaptive_timeouts, a job times out after this many times its 99th percentile runtime')
+    parser.add_argument('--straggler_factor', type=float, default=3.0, help='with --adaptive_timeouts, a job is killed once its iterations take this many times longer than in earlier runs')
+    parser.add_argument('--ssd_cache', default=False, action='store_true', help='also run every job that can use the SSD particle cache with the cache cold and then warm, measuring what is copied to CRYOSPARC_SSD_PATH')
+    parser.add_argument('--cache_state', choices=['cold', 'warm'], help='evict the input data from the page cache (cold) or read it into the cache (warm) before running jobs')
 
     args = parser.parse_args()
     master_hostname = args.master_hostname
     worker_hostname = args.worker_hostname
     base_port = args.port if args.port is not None else 39000
-    assert master_hostname is not None, "--master_hostname is required"
-    assert worker_hostname is not None, "--worker_hostname is required"
+    results_db = args.results_db or (os.path.join(args.out, RESULTS_DB_NAME) if args.out else None)
+    if args.ingest or args.compare:
+        assert results_db is not None, "--results_db or --out is needed to find the result store"
+        conn = open_results_store(results_db)
+        for result in load_timings_history(args.ingest or []):
+            ingest_result(conn, result, result['path'])
+            print (" Stored {}".format(result['path']))
+        regressions = []
+        if args.compare:
+            if args.compare == 'latest':
+                row = conn.execute('SELECT run_id FROM runs ORDER BY recorded_at DESC, run_id DESC LIMIT 1').fetchone()
+                assert row, "the result store {} is empty".format(results_db)
+                run_id = row[0]
+            else:
+                with open(args.compare) as f:
+                    run_id = ingest_result(conn, json.load(f), args.compare)
+            regressions = print_comparison(conn, run_id, compare_run(conn, run_id, args.baseline_runs, args.baseline_version))
+        conn.close()
+        sys.exit(1 if regressions else 0)
+    if not args.plan and not args.simulate:
+        assert master_hostname is not None, "--master_hostname is required"
+        assert worker_hostname is not None, "--worker_hostname is required"
+        assert args.gpus is not None, "--gpus is required"
     command_core_port = base_port + 2
-    gpu_devidxs = [int(v) for v in args.gpus.split(',')]
+    gpu_devidxs = [int(v) for v in args.gpus.split(',')] if args.gpus else [0]
     user_email = args.user_email
 
     print ("-----------------------------------------------------------------------")
@@ -828,8 +3495,11 @@ if __name__ == '__main__':
     print (" port  : ", base_port)
     print (" worker: ", worker_hostname)
     print ("-----------------------------------------------------------------------")
+    suite = get_benchmark_suite(args.input_data_dir or "/", args.suite)
+    suite_errors = suite.validate()
+    assert not suite_errors, "the benchmark suite is invalid:\n  {}".format('\n  '.join(suite_errors))
     print (" Dataset: ")
-    datasets_available = get_benchmark_jobs_dict(datasets_only=True)
+    datasets_available = suite.datasets()
     dataset = args.dataset
     assert dataset in datasets_available, "please specify a valid EMPIAR dataset out of the ones available: {}".format(datasets_available)
     print ("  EMPIAR {}".format(dataset))
@@ -837,12 +3507,26 @@ if __name__ == '__main__':
     job = args.job if args.job is not None else False
     mode = args.mode if args.mode is not None else False
     advanced_mode = args.advanced
+    assert not args.scaling or job, "--scaling needs a --job to study"
+    assert not args.sweep or job, "--sweep needs a --job to sweep"
+    assert not (args.sweep and args.scaling), "--sweep and --scaling can't be combined"
+    assert args.fraction is None or 0 < args.fraction <= 1, "--fraction must be in (0, 1]"
+    assert not args.ssd_cache or (args.repeat == 1 and args.warmup == 0), "--ssd_cache can't be combined with --repeat or --warmup, later runs would find the cache warm"
+    assert not args.ssd_cache or args.plan or (get_ssd_path() and os.path.isdir(get_ssd_path())), "--ssd_cache needs the SSD cache directory in CRYOSPARC_SSD_PATH or SSDPATH"
+    sweep = OrderedDict()
+    for sweep_arg in args.sweep:
+        assert '=' in sweep_arg, "--sweep takes PARAM=VALUES, got {}".format(sweep_arg)
+        name, values = sweep_arg.split('=', 1)
+        sweep[name.strip()] = parse_sweep_values(values)
     if job:
-        jobs_available = get_benchmark_jobs_dict(job_types_only=True, dataset_selected=dataset)
+        jobs_available = suite.job_keys(dataset)
         assert job in jobs_available, "jobs available for this dataset: {}".format(jobs_available)
         print (" Selected job: {}".format(job))
+        if args.scaling:
+            job_type = suite.get_job(dataset, job)['job_type']
+            assert is_multi_gpu_job_type(job_type), "--scaling needs a job that spreads its work over several GPUs, {} is a {} job".format(job, job_type)
     elif mode:
-        modes_available = get_benchmark_jobs_dict(modes_only=True, dataset_selected=dataset)
+        modes_available = suite.modes_for(dataset)
         assert mode in modes_available, "modes available for this dataset: {}".format(modes_available)
         print ("  {} benchmark".format(mode.title()))
         print ("-----------------------------------------------------------------------")
@@ -851,7 +3535,32 @@ if __name__ == '__main__':
             print (" Running all jobs using {} dataset in {} mode".format(dataset, mode))
     print ("-----------------------------------------------------------------------")
     print (" Will run jobs on GPU(s) : ", gpu_devidxs)
+    parallel = args.parallel
+    assert parallel >= 1, "--parallel must be at least 1"
+    assert not (args.scaling and parallel > 1), "--scaling can't be combined with --parallel, the GPU counts would share the node's CPU and I/O"
+    assert args.repeat >= 1 and args.warmup >= 0, "--repeat must be at least 1 and --warmup can't be negative"
+    if parallel > 1:
+        print (" Running up to {} jobs at a time".format(parallel))
+        if args.ssd_cache:
+            print (" WARNING: jobs running at the same time share the SSD cache, its accounting per job is approximate")
     print ("-----------------------------------------------------------------------")
+    if args.plan:
+        history_paths = args.history if args.history is not None else [args.out] if args.out else []
+        history = filter_timings_history(load_timings_history(history_paths), get_subset_limits(args.fraction, args.max_particles, args.max_movies),
+                                         parallel, args.cache_state)
+        plan_benchmark(select_benchmark_jobs(suite, dataset, mode, advanced_mode, job), history,
+                       len(gpu_devidxs), parallel, args.instance_type, dataset)
+        sys.exit(0)
+    if args.simulate:
+        history_paths = args.history if args.history is not None else [args.out] if args.out else []
+        policies = args.policies.split(',')
+        assert all(policy in SCHEDULING_POLICIES for policy in policies), "--policies must be out of {}".format(SCHEDULING_POLICIES)
+        gpu_counts = [int(count) for count in args.simulate_gpus.split(',')] if args.simulate_gpus else [len(gpu_devidxs)]
+        history = filter_timings_history(load_timings_history(history_paths), get_subset_limits(args.fraction, args.max_particles, args.max_movies),
+                                         parallel, args.cache_state)
+        simulate_schedules(select_benchmark_jobs(suite, dataset, mode, advanced_mode, job), history,
+                           gpu_counts, policies, parallel, args.instance_type, dataset, args.ssd_fill_fraction)
+        sys.exit(0)
     print (" Input data will be read from: %s " % args.input_data_dir)
     input_data_dir = args.input_data_dir
     print ("-----------------------------------------------------------------------")
@@ -861,5 +3570,51 @@ if __name__ == '__main__':
     print (" Timings and job streamlogs will be written to: %s " % args.out)
     output_timings_dir = args.out
     print ("-----------------------------------------------------------------------")
+    resume = args.resume
+    timeout_history = None
+    if args.adaptive_timeouts:
+        timeout_history = load_timings_history(args.history if args.history is not None else [output_timings_dir])
+    policy_history = None
+    if args.policy != 'fifo':
+        policy_history = load_timings_history(args.history if args.history is not None else [output_timings_dir])
+    if resume == 'latest':
+        resume = find_run_journal(output_timings_dir)
+        assert resume is not None, "no unfinished benchmark to resume in {}".format(output_timings_dir)
 
-    benchmark_cryoSPARC(master_hostname, worker_hostname, command_core_port, gpu_devidxs, mode, dataset, project_uid, user_email, output_timings_dir, advanced_mode, job)
+    benchmark_cryoSPARC(
+        master_hostname = master_hostname,
+        worker_hostname = worker_hostname,
+        command_core_port = command_core_port,
+        gpu_devidxs = gpu_devidxs,
+        mode = mode,
+        dataset = dataset,
+        project_uid = project_uid,
+        user_email = user_email,
+        output_timings_dir = output_timings_dir,
+        advanced_mode = advanced_mode,
+        job = job,
+        parallel = parallel,
+        compress_streamlogs = args.compress_streamlogs,
+        telemetry_interval = args.telemetry_interval,
+        run_io_check = args.io_preflight,
+        cache_state = args.cache_state,
+        repeat = args.repeat,
+        warmup = args.warmup,
+        reuse_jobs = args.reuse_jobs,
+        suite = suite,
+        instance_type = args.instance_type,
+        scaling = args.scaling,
+        sweep = sweep,
+        fraction = args.fraction,
+        max_particles = args.max_particles,
+        max_movies = args.max_movies,
+        subset_dir = args.subset_dir,
+        results_db = results_db,
+        resume = resume,
+        timeout_history = timeout_history,
+        timeout_factor = args.timeout_factor,
+        straggler_factor = args.straggler_factor,
+        ssd_cache = args.ssd_cache,
+        policy = args.policy,
+        policy_history = policy_history,
+    )
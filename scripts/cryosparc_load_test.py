@@ -0,0 +1,377 @@
+#
+# cryoSPARC Benchmark master/scheduler load test
+#
+# Submits many lightweight jobs (by default the volume import of the benchmark suite) from
+# many simulated users, each with their own workspaces, through the same submit_job as the
+# benchmark, so that imports go through the scheduler instead of running on the master.
+# Jobs arrive at random (Poisson) times at each of the --rates, in jobs per second, so the
+# load on command_core rises step by step. For each step it measures:
+#   - submit latency: make_job + update_job + enqueue_job, and the latency of each call
+#   - queue-to-launch latency: from a job being queued to the scheduler launching it
+#   - command_core throughput: calls served per second, and jobs launched per second
+# Submissions are made from up to --max_inflight threads, so a slow master delays the
+# calls but not the arrivals. The results are written to --out.
+#
+# The simulated users all submit as --user_email, as users can't be created through the cli;
+# they differ in the workspaces their jobs are created in. Run the load test in a project
+# used for nothing else: jobs that haven't launched --step_timeout seconds after the last
+# arrival of a step are killed.
+#
+# $ eval $(/path/to/bin/cryosparcm env)
+# $ python cryosparc_load_test.py --master_hostname localhost --worker_hostname localhost --project_uid P1 \
+#       --user_email user@nvidia.com --input_data_dir /data/EMPIAR/10028 --rates 1,2,5,10 --out /tmp/load_test
+#
+# With --standin, the jobs are submitted to an in-process stand-in for command_core instead,
+# which serves one call at a time and launches queued jobs on a fixed number of worker slots,
+# so that the load test itself can be run and checked offline:
+# $ python cryosparc_load_test.py --standin --rates 5,20,50,100 --out /tmp/load_test
+
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import datetime
+import json
+import random
+import threading
+import time
+
+import cryosparc_benchmark
+from cryosparc_benchmark import BENCHMARK_SUITE_PATH, RpcLatencyRecorder, TimedProxy, get_benchmark_suite, get_cli_capabilities, percentile, mkdir_p, submit_job
+
+# Seconds between checks of whether the jobs of a step have launched
+LAUNCH_POLL_INTERVAL = 1.0
+# Statuses of a job that has been launched, or will never be
+LAUNCHED_JOB_STATUSES = ['launched', 'started', 'running', 'waiting', 'completed', 'failed', 'killed']
+
+
+class StandinDatabase(object):
+    '''
+    The database of LocalCommandCore: db.jobs answers the queries the load test makes.
+    '''
+
+    def __init__(self, core):
+        self.core = core
+        self.jobs = self
+
+    def find(self, query, projection=None):
+        with self.core.lock:
+            uids = query.get('uid', {}).get('$in')
+            docs = [doc for doc in self.core.jobs.values() if uids is None or doc['uid'] in uids]
+            return [dict((field, doc.get(field)) for field in (projection or doc)) for doc in docs]
+
+
+class LocalCommandCore(object):
+    '''
+    In-process stand-in for command_core and the jobs in its database, for running the load test
+    without cryoSPARC. Calls are served one at a time and each takes service_time seconds, so
+    that throughput saturates like a busy master. A scheduler thread launches queued jobs in
+    order every scheduler_interval seconds while one of num_slots worker slots is free;
+    each job then runs for job_seconds.
+    '''
+
+    def __init__(self, num_slots=4, service_time=0.005, scheduler_interval=0.1, job_seconds=1.0):
+        self.num_slots = num_slots
+        self.service_time = service_time
+        self.scheduler_interval = scheduler_interval
+        self.job_seconds = job_seconds
+        self.lock = threading.Lock()
+        self.jobs = OrderedDict()
+        self.queue = []
+        self.running = {}
+        self.num_workspaces = 0
+        self.db = StandinDatabase(self)
+        self.closed = False
+        self.scheduler_thread = threading.Thread(target=self._schedule, daemon=True)
+        self.scheduler_thread.start()
+
+    def _serve(self):
+        time.sleep(self.service_time)
+
+    def get_system_info(self):
+        with self.lock:
+            self._serve()
+            return {'version' : 'standin'}
+
+    def get_id_by_email(self, email):
+        with self.lock:
+            self._serve()
+            return 'standin_user'
+
+    def create_empty_workspace(self, project_uid, created_by_user_id, title=None):
+        with self.lock:
+            self._serve()
+            self.num_workspaces += 1
+            return 'W{}'.format(self.num_workspaces)
+
+    def make_job(self, job_type, project_uid, workspace_uid, user_id, title=None, params=None, input_group_connects=None):
+        with self.lock:
+            self._serve()
+            uid = 'J{}'.format(len(self.jobs) + 1)
+            self.jobs[uid] = {'uid' : uid, 'project_uid' : project_uid, 'workspace_uids' : [workspace_uid], 'job_type' : job_type,
+                              'status' : 'building', 'created_at' : datetime.datetime.utcnow(), 'queued_at' : None, 'launched_at' : None,
+                              'started_at' : None, 'completed_at' : None}
+            return uid
+
+    def enqueue_job(self, project_uid, job_uid, hostname=None, gpus=None, lane=None):
+        with self.lock:
+            self._serve()
+            self.jobs[job_uid].update({'status' : 'queued', 'queued_at' : datetime.datetime.utcnow()})
+            self.queue.append(job_uid)
+
+    def update_job(self, project_uid, job_uid, attrs):
+        with self.lock:
+            self._serve()
+            self.jobs[job_uid].update(attrs)
+
+    def get_job(self, project_uid, job_uid, *fields):
+        with self.lock:
+            self._serve()
+            doc = self.jobs[job_uid]
+            return dict((field, doc.get(field)) for field in fields) if fields else dict(doc)
+
+    def kill_job(self, project_uid, job_uid):
+        with self.lock:
+            self._serve()
+            if job_uid in self.queue:
+                self.queue.remove(job_uid)
+            self.running.pop(job_uid, None)
+            self.jobs[job_uid]['status'] = 'killed'
+
+    def close(self):
+        self.closed = True
+
+    def _schedule(self):
+        while not self.closed:
+            time.sleep(self.scheduler_interval)
+            with self.lock:
+                now = datetime.datetime.utcnow()
+                for uid, ends_at in list(self.running.items()):
+                    if ends_at <= now:
+                        del self.running[uid]
+                        self.jobs[uid].update({'status' : 'completed', 'completed_at' : now})
+                while self.queue and len(self.running) < self.num_slots:
+                    uid = self.queue.pop(0)
+                    self.jobs[uid].update({'status' : 'running', 'launched_at' : now, 'started_at' : now})
+                    self.running[uid] = now + datetime.timedelta(seconds=self.job_seconds)
+
+
+def get_arrival_times(rate, num_jobs, seed=0):
+    '''
+    Returns the submission times, in seconds from the start of a step, of num_jobs jobs
+    arriving independently at rate jobs per second on average.
+    '''
+    rng = random.Random(seed)
+    arrivals = []
+    elapsed = 0.0
+    for _ in range(num_jobs):
+        elapsed += rng.expovariate(rate)
+        arrivals.append(elapsed)
+    return arrivals
+
+
+def summarize_latencies(values):
+    values = [value for value in values if value is not None]
+    if not values:
+        return None
+    return OrderedDict([
+        ('n', len(values)),
+        ('mean', sum(values) / len(values)),
+        ('p50', percentile(values, 50)),
+        ('p95', percentile(values, 95)),
+        ('p99', percentile(values, 99)),
+        ('max', max(values)),
+    ])
+
+
+def run_load_step(cli, db, capabilities, rate, num_jobs, project_uid, workspaces, user_id, job_type, params, worker_hostname,
+                  worker_lane=None, max_inflight=64, step_timeout=600, seed=0):
+    '''
+    Submits num_jobs jobs arriving at rate jobs per second, each in a random one of the workspaces,
+    waits for them to be launched (or kills them after step_timeout seconds), and returns the
+    submit and queue-to-launch latencies and the throughput of the step.
+    '''
+    recorder = RpcLatencyRecorder()
+    timed_cli = TimedProxy(cli, recorder, 'cli')
+    rng = random.Random(seed)
+    job_uids = [None] * num_jobs
+    submit_latencies = [None] * num_jobs
+    errors = []
+
+    def submit(index, workspace_uid):
+        start = time.time()
+        try:
+            def job_created(job_uid):
+                job_uids[index] = job_uid
+            submit_job(timed_cli, capabilities, project_uid, workspace_uid, user_id, job_type, 'Load test job {}'.format(index), params, {},
+                       worker_hostname, None, worker_lane, job_created)
+            submit_latencies[index] = time.time() - start
+        except Exception as e:
+            errors.append(str(e))
+        return time.time()
+
+    step_start = time.time()
+    with ThreadPoolExecutor(max_workers=max_inflight) as executor:
+        futures = []
+        for index, arrival in enumerate(get_arrival_times(rate, num_jobs, seed)):
+            delay = step_start + arrival - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(executor.submit(submit, index, rng.choice(workspaces)))
+        submitted_at = max(future.result() for future in futures)
+    submit_seconds = submitted_at - step_start
+
+    submitted = [uid for uid in job_uids if uid is not None]
+    docs = {}
+    deadline = submitted_at + step_timeout
+    while True:
+        docs = dict((doc['uid'], doc) for doc in db.jobs.find(
+            {'project_uid' : project_uid, 'uid' : {'$in' : submitted}}, {'uid' : 1, 'status' : 1, 'queued_at' : 1, 'launched_at' : 1}))
+        waiting = [uid for uid in submitted if docs.get(uid, {}).get('status') not in LAUNCHED_JOB_STATUSES]
+        if not waiting or time.time() > deadline:
+            break
+        time.sleep(LAUNCH_POLL_INTERVAL)
+    for uid in waiting:
+        cli.kill_job(project_uid, uid)
+
+    launch_latencies = []
+    launch_times = []
+    for uid in submitted:
+        doc = docs.get(uid, {})
+        if doc.get('queued_at') is not None and doc.get('launched_at') is not None:
+            launch_latencies.append((doc['launched_at'] - doc['queued_at']).total_seconds())
+            launch_times.append(doc['launched_at'])
+    launch_seconds = (max(launch_times) - min(launch_times)).total_seconds() if len(launch_times) > 1 else None
+
+    calls = recorder.summary()
+    num_calls = sum(call['count'] for call in calls.values())
+    return OrderedDict([
+        ('rate', rate),
+        ('num_jobs', num_jobs),
+        ('submitted', len(submitted)),
+        ('launched', len(launch_latencies)),
+        ('killed', len(waiting)),
+        ('errors', errors),
+        ('submit_seconds', submit_seconds),
+        ('submitted_per_second', len(submitted) / submit_seconds if submit_seconds > 0 else None),
+        ('calls_per_second', num_calls / submit_seconds if submit_seconds > 0 else None),
+        ('launched_per_second', (len(launch_times) - 1) / launch_seconds if launch_seconds else None),
+        ('submit_latency', summarize_latencies(submit_latencies)),
+        ('queue_to_launch_latency', summarize_latencies(launch_latencies)),
+        ('rpc_latency', calls),
+    ])
+
+
+def run_load_test(cli, db, capabilities, rates, jobs_per_rate, project_uid, user_id, num_users, workspaces_per_user, job_type, params,
+                  worker_hostname, worker_lane=None, max_inflight=64, step_timeout=600, seed=0):
+    workspaces = []
+    for user in range(num_users):
+        for workspace in range(workspaces_per_user):
+            workspaces.append(cli.create_empty_workspace(project_uid=project_uid, created_by_user_id=user_id,
+                                                         title='Load test user {} workspace {}'.format(user + 1, workspace + 1)))
+    print (" Created {} workspace(s) for {} simulated user(s)".format(len(workspaces), num_users))
+    print ("-----------------------------------------------------------------------")
+    print ("  {:>8} {:>6} {:>10} {:>9} {:>10} {:>10} {:>10} {:>12} {:>12}".format(
+        'jobs/s', 'jobs', 'submitted', 'calls/s', 'launch/s', 'submit p50', 'submit p95', 'launch p50', 'launch p95'))
+    steps = []
+    for step, rate in enumerate(rates):
+        result = run_load_step(cli, db, capabilities, rate, jobs_per_rate, project_uid, workspaces, user_id, job_type, params, worker_hostname,
+                               worker_lane, max_inflight, step_timeout, seed + step)
+        steps.append(result)
+        submit = result['submit_latency'] or {}
+        launch = result['queue_to_launch_latency'] or {}
+        def seconds(value, scale=1, unit='s'):
+            return '{:.1f} {}'.format(value * scale, unit) if value is not None else '-'
+        print ("  {:>8} {:>6} {:>10} {:>9} {:>10} {:>10} {:>10} {:>12} {:>12}{}".format(
+            rate, result['num_jobs'], result['submitted'],
+            '%.1f' % result['calls_per_second'] if result['calls_per_second'] else '-',
+            '%.1f' % result['launched_per_second'] if result['launched_per_second'] else '-',
+            seconds(submit.get('p50'), 1000, 'ms'), seconds(submit.get('p95'), 1000, 'ms'), seconds(launch.get('p50')), seconds(launch.get('p95')),
+            '  ({} killed, {} errors)'.format(result['killed'], len(result['errors'])) if result['killed'] or result['errors'] else ''))
+    return OrderedDict([('workspaces', workspaces), ('steps', steps)])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Load test the cryoSPARC master and scheduler with many concurrent job submissions')
+    parser.add_argument('--master_hostname')
+    parser.add_argument('--port', type=int)
+    parser.add_argument('--worker_hostname')
+    parser.add_argument('--project_uid') # project must already exist
+    parser.add_argument('--user_email')
+    parser.add_argument('--input_data_dir', default='/', help='benchmark data, for the job parameters')
+    parser.add_argument('--suite', default=BENCHMARK_SUITE_PATH, help='suite to take the submitted job from (default: benchmark_suite.json next to this script)')
+    parser.add_argument('--dataset', type=int, default=10028)
+    parser.add_argument('--job', default='import_volumes', help='suite job to submit, should be short')
+    parser.add_argument('--rates', default='1,2,5,10', help='comma separated job arrival rates, in jobs per second, one load step each')
+    parser.add_argument('--jobs_per_rate', type=int, default=100)
+    parser.add_argument('--users', type=int, default=10, help='number of simulated users')
+    parser.add_argument('--workspaces_per_user', type=int, default=2)
+    parser.add_argument('--max_inflight', type=int, default=64, help='most submissions in progress at the same time')
+    parser.add_argument('--step_timeout', type=float, default=600, help='seconds to wait for the jobs of a step to launch after the last one was submitted')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', required=True, help='directory to write the results to')
+    parser.add_argument('--standin', default=False, action='store_true', help='submit to a local stand-in for command_core instead of cryoSPARC')
+    parser.add_argument('--standin_slots', type=int, default=4, help='jobs the stand-in runs at the same time')
+    parser.add_argument('--standin_service_ms', type=float, default=5.0, help='time the stand-in takes to serve each call')
+    parser.add_argument('--standin_job_seconds', type=float, default=1.0, help='runtime of each job on the stand-in')
+    args = parser.parse_args()
+
+    rates = [float(rate) for rate in args.rates.split(',')]
+    assert rates and all(rate > 0 for rate in rates), "--rates must be positive"
+    assert args.jobs_per_rate >= 1 and args.users >= 1 and args.workspaces_per_user >= 1 and args.max_inflight >= 1
+
+    print ("-----------------------------------------------------------------------")
+    print ("cryoSPARC Benchmark load test")
+    print ("-----------------------------------------------------------------------")
+    suite = get_benchmark_suite(args.input_data_dir, args.suite)
+    job_info = suite.get_job(args.dataset, args.job)
+    assert job_info is not None, "jobs available for this dataset: {}".format(suite.job_keys(args.dataset))
+    if args.standin:
+        standin = LocalCommandCore(args.standin_slots, args.standin_service_ms / 1000.0, job_seconds=args.standin_job_seconds)
+        cli, db = standin, standin.db
+        version = 'standin'
+        # the stand-in takes the arguments of current versions
+        capabilities = get_cli_capabilities('develop')
+        worker_lane = None
+        project_uid = args.project_uid or 'P1'
+        print (" Submitting to a local stand-in for command_core: {} slot(s), {} ms per call, {} second jobs".format(
+            args.standin_slots, args.standin_service_ms, args.standin_job_seconds))
+    else:
+        assert args.master_hostname is not None and args.worker_hostname is not None, "please specify --master_hostname and --worker_hostname, or use --standin"
+        assert args.project_uid is not None, "please specify the --project_uid to submit the jobs in"
+        version = cryosparc_benchmark.connect_and_get_version(args.master_hostname, (args.port if args.port is not None else 39000) + 2)
+        cli, db = cryosparc_benchmark.cli, cryosparc_benchmark.db
+        capabilities = get_cli_capabilities(version)
+        worker_lane = None
+        if not capabilities['enqueue_job_placement']:
+            worker_target = cryosparc_benchmark.rc.com.query(cli.get_scheduler_targets(), lambda t : t.get('hostname') == args.worker_hostname)
+            worker_lane = worker_target['lane'] if worker_target else None
+        project_uid = args.project_uid
+    user_id = cli.get_id_by_email(args.user_email if args.user_email is not None else 'Benchmark')
+    print (" Submitting {} ({}) {} times at each of {} jobs per second".format(args.job, job_info['job_type'], args.jobs_per_rate, ', '.join(args.rates.split(','))))
+    print ("-----------------------------------------------------------------------")
+
+    started_at = datetime.datetime.now()
+    results = run_load_test(cli, db, capabilities, rates, args.jobs_per_rate, project_uid, user_id, args.users, args.workspaces_per_user,
+                            job_info['job_type'], job_info.get('params', {}), args.worker_hostname, worker_lane, args.max_inflight, args.step_timeout, args.seed)
+    if args.standin:
+        standin.close()
+
+    mkdir_p(args.out)
+    results_path = os.path.join(args.out, '{}_load_test_{}.json'.format(project_uid, started_at.strftime('%Y%m%d-%H%M%S')))
+    with open(results_path, 'w') as f:
+        json.dump(OrderedDict([
+            ('version', version),
+            ('standin', args.standin),
+            ('project_uid', project_uid),
+            ('job', args.job),
+            ('job_type', job_info['job_type']),
+            ('users', args.users),
+            ('workspaces_per_user', args.workspaces_per_user),
+            ('max_inflight', args.max_inflight),
+            ('started_at', started_at.isoformat()),
+            ('workspaces', results['workspaces']),
+            ('steps', results['steps']),
+        ]), f, indent=4)
+    print ("-----------------------------------------------------------------------")
+    print (" Results written to {}".format(results_path))
@@ -1,25 +1,129 @@
 #!/bin/bash
 set -e
+startup_start=$(date +%s.%N)
 echo "Initializing CryoSPARC container"
-[ -e $PROJDIR ] || { echo "Creating project directory"; mkdir $PROJDIR && chmod 777 $PROJDIR; }
-[ -e $SSDPATH ] || { echo "Creating SSD directory"; mkdir $SSDPATH && chmod 777 $SSDPATH; }
 eval $(/opt/cryosparc/cryosparc_master/bin/cryosparcm env)
-cryosparcm start
-cryosparcm createuser --email ${CS_EMAIL} --password ${CS_PASSWORD} --username ${CS_USER} --firstname ${CS_FNAME} --lastname ${CS_LNAME}
 
-if [ -e ${PROJDIR}/*benchmark* ]; then
+# Every step checks whether its work is already done (e.g. when the container is restarted),
+# and the steps that don't depend on each other run at the same time.
+# The time taken by each step is written to $CS_STARTUP_REPORT, which the first benchmark run
+# after startup reads to report the time from the container starting to its first job being queued.
+# Shells opened with docker exec don't inherit the variable, so the benchmark falls back to the default path.
+export CS_STARTUP_REPORT=${CS_STARTUP_REPORT:-/tmp/cryosparc_startup.json}
+# Seconds to wait for command_core to answer after starting cryoSPARC
+CS_STARTUP_TIMEOUT=${CS_STARTUP_TIMEOUT:-600}
+step_log=$(mktemp)
+
+# step NAME COMMAND...: runs and times a startup step. A step with nothing to do returns 2.
+step() {
+	local name=$1 start status=0 state
+	shift
+	start=$(date +%s.%N)
+	"$@" || status=$?
+	case $status in
+		0) state=done ;;
+		2) state=skipped ;;
+		*) state=failed ;;
+	esac
+	echo "$name $state $start $(date +%s.%N)" >> $step_log
+	echo "Step $name $state"
+	[ $state != failed ]
+}
+
+cs_cli() {
+	cryosparcm cli "$1" 2> /dev/null
+}
+
+start_cryosparc() {
+	cs_cli "get_system_info()" > /dev/null && return 2
+	cryosparcm start
+}
+
+make_project_dir() {
+	[ -e $PROJDIR ] && return 2
+	echo "Creating project directory"
+	mkdir $PROJDIR && chmod 777 $PROJDIR
+}
+
+make_ssd_dir() {
+	[ -e $SSDPATH ] && return 2
+	echo "Creating SSD directory"
+	mkdir $SSDPATH && chmod 777 $SSDPATH
+}
+
+remove_lock() {
 	# https://guide.cryosparc.com/setup-configuration-and-management/software-system-guides/guide-data-management-in-cryosparc-v4.0+#use-case-rescuing-a-project-from-an-inoperable-instance
+	ls -d ${PROJDIR}/*benchmark*/cs.lock > /dev/null 2>&1 || return 2
 	echo "Deleting old lock file"
-	[ -e ${PROJDIR}/*benchmark*/cs.lock ] && rm ${PROJDIR}/*benchmark*/cs.lock; \
-	cs_uid=$(cryosparcm cli "get_id_by_email('${CS_EMAIL}')")
-	cryosparcm cli "attach_project(owner_user_id='${cs_uid}', abs_path_export_project_dir='$(ls -d ${PROJDIR}/*benchmark* | head -n 1)')"
-else
-	ls ${PROJDIR}
-	echo "Creating empty project: Benchmark"
-	cryosparcm cli "create_empty_project(owner_user_id = '${CS_USER}', project_container_dir = '$PROJDIR', title='Benchmark')"
-fi
-
-echo "Connecting worker to master and using $SSDPATH for ssdpath"
-/opt/cryosparc/cryosparc_worker/bin/cryosparcw connect --master localhost --worker localhost --ssdpath $SSDPATH
+	rm ${PROJDIR}/*benchmark*/cs.lock
+}
+
+wait_for_command_core() {
+	# command_core can take a while to answer after cryosparcm start returns, back off up to 10 seconds
+	local delay=0.5 waited=0
+	until cs_cli "get_system_info()" > /dev/null; do
+		if awk "BEGIN { exit !($waited >= $CS_STARTUP_TIMEOUT) }"; then
+			echo "command_core did not answer within $CS_STARTUP_TIMEOUT seconds"
+			return 1
+		fi
+		sleep $delay
+		waited=$(awk "BEGIN { print $waited + $delay }")
+		delay=$(awk "BEGIN { print ($delay * 2 > 10) ? 10 : $delay * 2 }")
+	done
+}
+
+create_user() {
+	cs_cli "get_id_by_email('${CS_EMAIL}')" > /dev/null && return 2
+	cryosparcm createuser --email ${CS_EMAIL} --password ${CS_PASSWORD} --username ${CS_USER} --firstname ${CS_FNAME} --lastname ${CS_LNAME}
+}
+
+setup_project() {
+	local project_dir
+	project_dir=$(ls -d ${PROJDIR}/*benchmark* 2> /dev/null | head -n 1)
+	if [ -n "$project_dir" ]; then
+		cs_cli "list_projects()" | grep -q "'$project_dir'" && return 2
+		cs_uid=$(cryosparcm cli "get_id_by_email('${CS_EMAIL}')")
+		cryosparcm cli "attach_project(owner_user_id='${cs_uid}', abs_path_export_project_dir='${project_dir}')"
+	else
+		ls ${PROJDIR}
+		echo "Creating empty project: Benchmark"
+		cryosparcm cli "create_empty_project(owner_user_id = '${CS_USER}', project_container_dir = '$PROJDIR', title='Benchmark')"
+	fi
+}
+
+connect_worker() {
+	cs_cli "get_scheduler_targets()" | grep -q "'hostname': 'localhost'" && return 2
+	echo "Connecting worker to master and using $SSDPATH for ssdpath"
+	/opt/cryosparc/cryosparc_worker/bin/cryosparcw connect --master localhost --worker localhost --ssdpath $SSDPATH
+}
+
+write_startup_report() {
+	local ready_at=$(date +%s.%N)
+	awk -v started_at=$startup_start -v ready_at=$ready_at '
+		{ steps = steps sep sprintf("{\"name\": \"%s\", \"status\": \"%s\", \"started_at\": %.3f, \"seconds\": %.3f}", $1, $2, $3, $4 - $3); sep = ", " }
+		END { printf "{\"started_at\": %.3f, \"ready_at\": %.3f, \"seconds\": %.3f, \"steps\": [%s]}\n", started_at, ready_at, ready_at - started_at, steps }
+	' $step_log > $CS_STARTUP_REPORT
+	echo "Startup steps:"
+	awk '{ printf "  %-24s %-8s %8.1f s (from %.1f s)\n", $1, $2, $4 - $3, $3 - '$startup_start' }' $step_log
+	awk "BEGIN { printf \"Ready to queue jobs after %.1f s\\n\", $ready_at - $startup_start }"
+}
+
+# cryoSPARC starts while the directories are prepared
+pids=()
+step start_cryosparc start_cryosparc & pids+=($!)
+step make_project_dir make_project_dir & pids+=($!)
+step make_ssd_dir make_ssd_dir & pids+=($!)
+step remove_lock remove_lock & pids+=($!)
+for pid in ${pids[@]}; do wait $pid; done
+step wait_for_command_core wait_for_command_core
+
+# the worker doesn't depend on the user or the project
+step connect_worker connect_worker & worker_pid=$!
+step create_user create_user
+step setup_project setup_project
+wait $worker_pid
+write_startup_report
+rm $step_log
+
 set +e
 eval "$@"
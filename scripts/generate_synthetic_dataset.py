@@ -0,0 +1,341 @@
+#
+# cryoSPARC Benchmark synthetic dataset generator
+#
+# Writes a dataset of any size for data-size scaling benchmarks: movie stacks with
+# a gain reference, particle stacks with a matching RELION .star file and a
+# reference volume, all as MRC/MRCS files. Every file is written through a numpy
+# memmap in chunks of at most --chunk_mb, so datasets much larger than memory can
+# be generated. The images are noise around a Gaussian blob; they exercise the I/O
+# and compute of each job like real data, but won't give a meaningful reconstruction.
+#
+# Alongside the data, a suite file is written with the jobs of --template_dataset
+# from benchmark_suite.json, with the import jobs reading the synthetic files, e.g.
+#
+# $ eval $(/path/to/bin/cryosparcm env)
+# $ python generate_synthetic_dataset.py --out_dir /raid/synthetic --num_particles 500000 --box_size 256
+# $ python cryosparc_benchmark.py ... --suite /raid/synthetic/benchmark_suite.json
+#                                     --input_data_dir /raid/synthetic --dataset 0 --mode reconstruct
+#
+# Layout of --out_dir:
+#   data/Micrographs/Micrographs_part<N>/synthetic_movie_<i>.mrcs
+#   data/gain_ref.mrc
+#   data/Particles/synthetic_particles_<i>.mrcs, data/Particles/synthetic_particles.star
+#   data/Volumes/synthetic_volume.mrc
+#   benchmark_suite.json
+
+import os
+from collections import OrderedDict
+import argparse
+import json
+import copy
+import shutil
+import struct
+import time
+
+import numpy as np
+
+from cryosparc_benchmark import BENCHMARK_SUITE_PATH, INPUT_DATA_DIR_PLACEHOLDER, mkdir_p
+
+# MRC data modes by numpy dtype
+MRC_MODES = {
+    np.dtype(np.int8) : 0,
+    np.dtype(np.int16) : 1,
+    np.dtype(np.float32) : 2,
+    np.dtype(np.uint16) : 6,
+}
+MRC_HEADER_BYTES = 1024
+
+
+def write_mrc_header(f, shape, dtype, psize_A, is_volume=False):
+    '''
+    Writes a 1024 byte MRC2014 header for a stack (or volume) of shape (nz, ny, nx).
+    The density statistics are left at their "not computed" values so the header
+    can be written before the data.
+    '''
+    nz, ny, nx = shape
+    header = bytearray(MRC_HEADER_BYTES)
+    struct.pack_into('<4i', header, 0, nx, ny, nz, MRC_MODES[np.dtype(dtype)])
+    struct.pack_into('<3i', header, 28, nx, ny, nz if is_volume else 1)
+    struct.pack_into('<6f', header, 40, nx * psize_A, ny * psize_A, (nz if is_volume else 1) * psize_A, 90.0, 90.0, 90.0)
+    struct.pack_into('<3i', header, 64, 1, 2, 3)
+    # dmin > dmax and dmean < min(dmin, dmax) mean the statistics are not known
+    struct.pack_into('<3f', header, 76, 0.0, -1.0, -2.0)
+    # ispg 0 is a stack of images, 1 a single volume
+    struct.pack_into('<i', header, 88, 1 if is_volume else 0)
+    # MRC2014 format version
+    struct.pack_into('<i', header, 108, 20140)
+    header[208:212] = b'MAP '
+    header[212:216] = b'\x44\x44\x00\x00'
+    struct.pack_into('<f', header, 216, -1.0)
+    label = 'cryoSPARC benchmark synthetic data {}'.format(time.strftime('%Y-%m-%d %H:%M:%S')).encode('ascii')
+    struct.pack_into('<i', header, 220, 1)
+    header[224:224 + len(label)] = label
+    f.write(header)
+
+
+def write_mrc(path, shape, dtype, psize_A, fill_chunk, chunk_bytes, is_volume=False):
+    '''
+    Writes an MRC file of the given shape, filling it through a memmap of the data section,
+    chunk_bytes at a time (at least one section). fill_chunk(start, stop) returns the sections
+    start..stop as an array.
+
+    :returns: the number of bytes written
+    '''
+    nz, ny, nx = shape
+    section_bytes = ny * nx * np.dtype(dtype).itemsize
+    sections_per_chunk = max(1, chunk_bytes // section_bytes)
+    with open(path, 'wb') as f:
+        write_mrc_header(f, shape, dtype, psize_A, is_volume)
+        f.truncate(MRC_HEADER_BYTES + nz * section_bytes)
+    data = np.memmap(path, dtype=np.dtype(dtype).newbyteorder('<'), mode='r+', offset=MRC_HEADER_BYTES, shape=shape)
+    for start in range(0, nz, sections_per_chunk):
+        stop = min(nz, start + sections_per_chunk)
+        data[start:stop] = fill_chunk(start, stop)
+        data.flush()
+    del data
+    return MRC_HEADER_BYTES + nz * section_bytes
+
+
+def poisson_counts(rng, shape, lam, block_bytes):
+    '''
+    Returns an int8 array of the given shape of Poisson distributed counts with mean lam.
+    The counts are drawn block_bytes of int8 output at a time, as numpy draws them as int64
+    and a whole chunk at once would need 8 times its size in memory.
+    '''
+    counts = np.empty(shape, dtype=np.int8)
+    flat = counts.reshape(-1)
+    block = max(1, block_bytes)
+    for start in range(0, flat.size, block):
+        stop = min(flat.size, start + block)
+        flat[start:stop] = rng.poisson(lam, stop - start)
+    return counts
+
+
+def gaussian_blob(shape, sigma):
+    '''
+    A centered Gaussian of the given shape, with values in [0, 1].
+    '''
+    axes = np.meshgrid(*[np.arange(n) - n / 2.0 for n in shape], indexing='ij')
+    return np.exp(-sum(axis ** 2 for axis in axes) / (2.0 * sigma ** 2)).astype(np.float32)
+
+
+def get_movie_parts(suite_doc, template_dataset):
+    '''
+    Returns the number of import_movies jobs of the template dataset, so the movies are
+    split over as many folders as the template imports.
+    '''
+    parts = 1
+    for datasets in suite_doc['modes'].values():
+        jobs = datasets.get(str(template_dataset), [])
+        parts = max(parts, len([job_info for job_info in jobs if job_info.get('job_type') == 'import_movies']))
+    return parts
+
+
+def make_synthetic_suite(suite_doc, template_dataset, dataset_id, paths, physical):
+    '''
+    Returns a suite with only the jobs of template_dataset, as dataset dataset_id, where
+    the import jobs read the synthetic files.
+
+    :param paths: the synthetic files, relative to the output directory
+    :type paths: dict
+    :param physical: the pixel size, voltage, spherical aberration and total dose
+    :type physical: dict
+    '''
+    synthetic = OrderedDict([
+        ('suite_version', suite_doc['suite_version']),
+        ('description', 'Synthetic dataset generated by generate_synthetic_dataset.py from the EMPIAR {} jobs'.format(template_dataset)),
+        ('modes', OrderedDict()),
+    ])
+
+    def data_path(relative_path):
+        return '{}/{}'.format(INPUT_DATA_DIR_PLACEHOLDER, relative_path)
+
+    # the files each import job type reads; modes importing files that weren't generated are left out
+    import_paths = {
+        'import_movies' : ['movies', 'gain_ref'],
+        'import_particles' : ['particle_meta', 'particle_blobs'],
+        'import_volumes' : ['volume'],
+    }
+    for mode, datasets in iter(suite_doc['modes'].items()):
+        if str(template_dataset) not in datasets:
+            continue
+        needed = set(name for job_info in datasets[str(template_dataset)] for name in import_paths.get(job_info['job_type'], []))
+        if not all(paths.get(name) for name in needed):
+            continue
+        jobs = []
+        movie_part = 0
+        for job_info in datasets[str(template_dataset)]:
+            job_info = copy.deepcopy(job_info)
+            params = job_info.get('params', OrderedDict())
+            if job_info['job_type'] == 'import_movies':
+                params['blob_paths'] = data_path(paths['movies'][movie_part % len(paths['movies'])])
+                params['gainref_path'] = data_path(paths['gain_ref'])
+                params['gainref_flip_y'] = False
+                params['psize_A'] = physical['psize_A']
+                params['accel_kv'] = physical['accel_kv']
+                params['cs_mm'] = physical['cs_mm']
+                params['total_dose_e_per_A2'] = physical['total_dose_e_per_A2']
+                movie_part += 1
+            elif job_info['job_type'] == 'import_particles':
+                params['particle_meta_path'] = data_path(paths['particle_meta'])
+                params['particle_blob_path'] = data_path(paths['particle_blobs'])
+            elif job_info['job_type'] == 'import_volumes':
+                params['volume_blob_path'] = data_path(paths['volume'])
+            job_info['params'] = params
+            jobs.append(job_info)
+        synthetic['modes'][mode] = OrderedDict([(str(dataset_id), jobs)])
+    return synthetic
+
+
+def write_particle_star(path, stack_names, particles_per_stack, num_particles, box_size, physical, rng):
+    '''
+    Writes the RELION 3.0 style .star file for the particle stacks, one line at a time.
+    Each particle gets a random defocus, pose and micrograph coordinate.
+    '''
+    columns = [
+        'rlnImageName', 'rlnMicrographName', 'rlnCoordinateX', 'rlnCoordinateY',
+        'rlnDefocusU', 'rlnDefocusV', 'rlnDefocusAngle', 'rlnVoltage', 'rlnSphericalAberration',
+        'rlnAmplitudeContrast', 'rlnMagnification', 'rlnDetectorPixelSize',
+        'rlnAngleRot', 'rlnAngleTilt', 'rlnAnglePsi', 'rlnOriginX', 'rlnOriginY',
+    ]
+    with open(path, 'w') as f:
+        f.write('\ndata_\n\nloop_\n')
+        for index, column in enumerate(columns):
+            f.write('_{} #{}\n'.format(column, index + 1))
+        for start in range(0, num_particles, particles_per_stack):
+            stop = min(num_particles, start + particles_per_stack)
+            count = stop - start
+            stack_name = stack_names[start // particles_per_stack]
+            defocus = rng.uniform(8000.0, 30000.0, count)
+            astigmatism = rng.uniform(0.0, 500.0, count)
+            angles = rng.uniform(0.0, 360.0, (count, 3))
+            angles[:, 1] = np.degrees(np.arccos(rng.uniform(-1.0, 1.0, count)))
+            coordinates = rng.uniform(box_size, 4096 - box_size, (count, 2))
+            for i in range(count):
+                f.write('{:06d}@{} synthetic_micrograph_{:05d}.mrc {:.1f} {:.1f} {:.1f} {:.1f} {:.2f} {:.1f} {:.2f} 0.1 10000.0 {:.4f} {:.3f} {:.3f} {:.3f} 0.0 0.0\n'.format(
+                    i + 1, stack_name, (start + i) // 200, coordinates[i, 0], coordinates[i, 1],
+                    defocus[i] + astigmatism[i], defocus[i] - astigmatism[i], angles[i, 2],
+                    physical['accel_kv'], physical['cs_mm'], physical['psize_A'],
+                    angles[i, 0], angles[i, 1], angles[i, 2]))
+
+
+def generate_dataset(out_dir, num_movies, movie_size, num_frames, num_particles, box_size, particles_per_stack,
+        physical, chunk_mb, seed, suite_path, template_dataset, dataset_id):
+    '''
+    Writes the synthetic dataset and its suite file into out_dir. Returns a summary with the
+    number of files and bytes written and the time it took.
+    '''
+    rng = np.random.default_rng(seed)
+    chunk_bytes = chunk_mb * 1024 * 1024
+    with open(suite_path) as f:
+        suite_doc = json.load(f, object_pairs_hook=OrderedDict)
+    assert any(str(template_dataset) in datasets for datasets in suite_doc['modes'].values()), \
+        "dataset {} is not in {}".format(template_dataset, suite_path)
+
+    movie_parts = get_movie_parts(suite_doc, template_dataset) if num_movies else 0
+    num_stacks = (num_particles + particles_per_stack - 1) // particles_per_stack
+    expected_bytes = (num_movies * (MRC_HEADER_BYTES + num_frames * movie_size * movie_size)
+        + (MRC_HEADER_BYTES + movie_size * movie_size * 4 if num_movies else 0)
+        + num_stacks * MRC_HEADER_BYTES + num_particles * box_size * box_size * 4
+        + MRC_HEADER_BYTES + box_size ** 3 * 4)
+    mkdir_p(out_dir)
+    free_bytes = shutil.disk_usage(out_dir).free
+    print (" Writing {:.1f} GB to {} ({:.1f} GB free)".format(expected_bytes / 1e9, out_dir, free_bytes / 1e9))
+    assert expected_bytes < free_bytes, "not enough free space in {} for the dataset".format(out_dir)
+
+    summary = OrderedDict([('files', 0), ('bytes', 0)])
+    start_time = time.time()
+    paths = OrderedDict([('movies', [])])
+
+    if num_movies:
+        # counting-mode movies: Poisson distributed electron counts, about one per pixel per frame
+        gain = 1.0 + 0.05 * gaussian_blob((movie_size, movie_size), movie_size / 2.0)
+        gain_ref = 'data/gain_ref.mrc'
+        mkdir_p(os.path.join(out_dir, 'data'))
+        summary['bytes'] += write_mrc(os.path.join(out_dir, gain_ref), (1, movie_size, movie_size), np.float32, physical['psize_A'],
+            lambda start, stop: gain[np.newaxis], chunk_bytes)
+        summary['files'] += 1
+        paths['gain_ref'] = gain_ref
+        for part in range(movie_parts):
+            folder = 'data/Micrographs/Micrographs_part{}'.format(part + 1)
+            mkdir_p(os.path.join(out_dir, folder))
+            paths['movies'].append('{}/*.mrcs'.format(folder))
+        for movie in range(num_movies):
+            folder = 'data/Micrographs/Micrographs_part{}'.format(movie % movie_parts + 1)
+            movie_path = os.path.join(out_dir, folder, 'synthetic_movie_{:05d}.mrcs'.format(movie))
+            summary['bytes'] += write_mrc(movie_path, (num_frames, movie_size, movie_size), np.int8, physical['psize_A'],
+                lambda start, stop: poisson_counts(rng, (stop - start, movie_size, movie_size), 1.0, chunk_bytes // 8), chunk_bytes)
+            summary['files'] += 1
+            print ("  movie {}/{}".format(movie + 1, num_movies), end='\r')
+        print ("  {} movies of {} frames of {}x{}".format(num_movies, num_frames, movie_size, movie_size))
+
+    if num_particles:
+        blob = gaussian_blob((box_size, box_size), box_size / 8.0)
+        mkdir_p(os.path.join(out_dir, 'data', 'Particles'))
+        stack_names = []
+        for stack in range(num_stacks):
+            count = min(particles_per_stack, num_particles - stack * particles_per_stack)
+            stack_names.append('synthetic_particles_{:05d}.mrcs'.format(stack))
+            summary['bytes'] += write_mrc(os.path.join(out_dir, 'data', 'Particles', stack_names[-1]), (count, box_size, box_size), np.float32, physical['psize_A'],
+                lambda start, stop: blob + rng.standard_normal((stop - start, box_size, box_size), dtype=np.float32), chunk_bytes)
+            summary['files'] += 1
+        paths['particle_blobs'] = 'data/Particles'
+        paths['particle_meta'] = 'data/Particles/synthetic_particles.star'
+        write_particle_star(os.path.join(out_dir, paths['particle_meta']), stack_names, particles_per_stack, num_particles, box_size, physical, rng)
+        summary['files'] += 1
+        print ("  {} particles of {}x{} in {} stacks".format(num_particles, box_size, box_size, num_stacks))
+
+    mkdir_p(os.path.join(out_dir, 'data', 'Volumes'))
+    paths['volume'] = 'data/Volumes/synthetic_volume.mrc'
+    # the 3D Gaussian is separable, so each chunk of sections is the 2D blob scaled along z
+    section = gaussian_blob((box_size, box_size), box_size / 8.0)
+    z_profile = np.exp(-(np.arange(box_size) - box_size / 2.0) ** 2 / (2.0 * (box_size / 8.0) ** 2)).astype(np.float32)
+    summary['bytes'] += write_mrc(os.path.join(out_dir, paths['volume']), (box_size, box_size, box_size), np.float32, physical['psize_A'],
+        lambda start, stop: z_profile[start:stop, np.newaxis, np.newaxis] * section, chunk_bytes, is_volume=True)
+    summary['files'] += 1
+
+    suite_out = os.path.join(out_dir, 'benchmark_suite.json')
+    with open(suite_out, 'w') as f:
+        json.dump(make_synthetic_suite(suite_doc, template_dataset, dataset_id, paths, physical), f, indent=4)
+    summary['suite'] = suite_out
+    summary['seconds'] = time.time() - start_time
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Generate a synthetic cryoSPARC benchmark dataset of any size')
+    parser.add_argument('--out_dir', required=True, help='directory to write the data and suite file to (use as --input_data_dir)')
+    parser.add_argument('--num_movies', type=int, default=0)
+    parser.add_argument('--movie_size', type=int, default=4096, help='movie width and height in pixels')
+    parser.add_argument('--num_frames', type=int, default=40)
+    parser.add_argument('--num_particles', type=int, default=0)
+    parser.add_argument('--box_size', type=int, default=256)
+    parser.add_argument('--particles_per_stack', type=int, default=10000)
+    parser.add_argument('--psize_A', type=float, default=1.0)
+    parser.add_argument('--accel_kv', type=float, default=300)
+    parser.add_argument('--cs_mm', type=float, default=2.7)
+    parser.add_argument('--total_dose_e_per_A2', type=float, default=50)
+    parser.add_argument('--chunk_mb', type=int, default=256, help='most data held in memory at a time')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--suite', default=BENCHMARK_SUITE_PATH, help='suite to take the jobs from (default: benchmark_suite.json next to this script)')
+    parser.add_argument('--template_dataset', type=int, default=10028, help='dataset whose jobs are run on the synthetic data')
+    parser.add_argument('--dataset_id', type=int, default=0, help='dataset number of the synthetic data in the written suite')
+    args = parser.parse_args()
+
+    assert args.num_movies or args.num_particles, "nothing to generate, set --num_movies and/or --num_particles"
+    assert args.particles_per_stack > 0 and args.box_size > 0 and args.movie_size > 0 and args.num_frames > 0
+
+    print ("-----------------------------------------------------------------------")
+    print ("cryoSPARC Benchmark synthetic dataset")
+    print ("-----------------------------------------------------------------------")
+    physical = OrderedDict([
+        ('psize_A', args.psize_A),
+        ('accel_kv', args.accel_kv),
+        ('cs_mm', args.cs_mm),
+        ('total_dose_e_per_A2', args.total_dose_e_per_A2),
+    ])
+    summary = generate_dataset(args.out_dir, args.num_movies, args.movie_size, args.num_frames, args.num_particles, args.box_size,
+        args.particles_per_stack, physical, args.chunk_mb, args.seed, args.suite, args.template_dataset, args.dataset_id)
+    print ("-----------------------------------------------------------------------")
+    print (" Wrote {} files, {:.2f} GB in {:.1f} seconds".format(summary['files'], summary['bytes'] / 1e9, summary['seconds']))
+    print (" Benchmark it with --suite {} --input_data_dir {} --dataset {}".format(summary['suite'], os.path.abspath(args.out_dir), args.dataset_id))
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The benchmark scripts are not a package; they are imported from the scripts directory,
+# which also works without cryoSPARC installed.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
@@ -0,0 +1,63 @@
+import cryosparc_benchmark as cb
+
+
+def make_job(key, job_type='homo_refine_new', requires=(), params=None):
+    return {'key' : key, 'job_type' : job_type, 'job_title' : key, 'setup_requires' : list(requires), 'params' : dict(params or {})}
+
+
+def make_jobs():
+    return [
+        make_job('import_particles', job_type='import_particles'),
+        make_job('import_volumes', job_type='import_volumes'),
+        make_job('abinit', job_type='homo_abinit', requires=['import_particles']),
+        make_job('refine', requires=['abinit', 'import_volumes']),
+    ]
+
+
+def test_reusable_keys_are_the_imports_of_a_full_benchmark():
+    assert cb.get_reusable_keys(make_jobs()) == {'import_particles', 'import_volumes'}
+
+
+def test_reusable_keys_in_job_mode_are_the_dependencies_of_the_job():
+    assert cb.get_reusable_keys(make_jobs(), job='refine') == {'import_particles', 'import_volumes', 'abinit'}
+
+
+def test_reusable_keys_never_include_the_repeats_of_the_job():
+    jobs = cb.expand_repeats(make_jobs(), 3, repeat_keys=['refine'])
+    assert cb.get_reusable_keys(jobs, job='refine') == {'import_particles', 'import_volumes', 'abinit'}
+
+
+def test_reusable_keys_never_include_gpu_scaling_copies():
+    jobs = cb.expand_gpu_scaling(make_jobs(), 'refine', [1, 2])
+    measured_keys = ['refine_gpus1', 'refine_gpus2']
+    assert cb.get_reusable_keys(jobs, 'refine', measured_keys) == {'import_particles', 'import_volumes', 'abinit'}
+    assert cb.get_reusable_keys(jobs, 'refine') == {'import_particles', 'import_volumes', 'abinit'}
+
+
+def test_reusable_keys_never_include_sweep_copies():
+    jobs = cb.expand_parameter_sweep(make_jobs(), 'refine', {'refine_res_init' : [8, 12]})
+    measured_keys = ['refine_sweep0', 'refine_sweep1']
+    assert cb.get_reusable_keys(jobs, 'refine', measured_keys) == {'import_particles', 'import_volumes', 'abinit'}
+    assert cb.get_reusable_keys(jobs, 'refine') == {'import_particles', 'import_volumes', 'abinit'}
+
+
+def test_reusable_keys_never_include_ssd_cache_runs():
+    jobs = make_jobs()
+    jobs[2]['ssd_cache_run'] = 'cold'
+    assert cb.get_reusable_keys(jobs, job='refine') == {'import_particles', 'import_volumes'}
+
+
+def test_content_key_is_stable_and_ignores_order_and_gpu_count():
+    connects = {'particles' : ['J1.imported_particles'], 'volume' : []}
+    key = cb.get_job_content_key('homo_refine_new', {'a' : 1, 'b' : 'x'}, connects, 'v4.2.1')
+    assert key == cb.get_job_content_key('homo_refine_new', {'b' : 'x', 'a' : 1}, {'particles' : ['J1.imported_particles']}, 'v4.2.1')
+    assert key == cb.get_job_content_key('homo_refine_new', {'a' : 1, 'b' : 'x', cb.MULTI_GPU_PARAM : 4}, connects, 'v4.2.1')
+
+
+def test_content_key_changes_with_what_the_job_computes():
+    connects = {'particles' : ['J1.imported_particles']}
+    key = cb.get_job_content_key('homo_refine_new', {'a' : 1}, connects, 'v4.2.1')
+    assert key != cb.get_job_content_key('nonuniform_refine', {'a' : 1}, connects, 'v4.2.1')
+    assert key != cb.get_job_content_key('homo_refine_new', {'a' : 2}, connects, 'v4.2.1')
+    assert key != cb.get_job_content_key('homo_refine_new', {'a' : 1}, {'particles' : ['J2.imported_particles']}, 'v4.2.1')
+    assert key != cb.get_job_content_key('homo_refine_new', {'a' : 1}, connects, 'v4.4.0')
@@ -0,0 +1,185 @@
+import asyncio
+
+import pytest
+
+import cryosparc_benchmark as cb
+
+
+def make_job(key, job_type='homo_refine_new', requires=()):
+    return {'key' : key, 'job_type' : job_type, 'setup_requires' : list(requires)}
+
+
+def run_virtual(coroutine):
+    '''
+    Runs a coroutine on the benchmark's virtual clock, so asyncio.sleep() takes no real time.
+    '''
+    loop = cb.VirtualTimeEventLoop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def run_dag(jobs, durations, parallel=1, priority=None, fail=(), fail_softly=()):
+    '''
+    Runs the jobs with run_job_dag, each sleeping for its duration. Returns the skipped keys
+    and, per key, when it started and ended.
+    '''
+    started, ended = {}, {}
+
+    async def run_job(job_info):
+        key = job_info['key']
+        started[key] = asyncio.get_event_loop().time()
+        await asyncio.sleep(durations[key])
+        ended[key] = asyncio.get_event_loop().time()
+        if key in fail:
+            raise RuntimeError("{} failed".format(key))
+        if key in fail_softly:
+            return False
+
+    skipped = run_virtual(cb.run_job_dag(jobs, run_job, parallel=parallel, priority=priority))
+    return skipped, started, ended
+
+
+def test_run_job_dag_sequential_in_list_order():
+    jobs = [make_job('a'), make_job('b'), make_job('c')]
+    skipped, started, _ = run_dag(jobs, {'a' : 3, 'b' : 1, 'c' : 2})
+    assert skipped == []
+    assert started == {'a' : 0, 'b' : 3, 'c' : 4}
+
+
+def test_run_job_dag_starts_jobs_once_their_dependencies_complete():
+    jobs = [make_job('a'), make_job('b'), make_job('c', requires=['a']), make_job('d', requires=['b', 'c'])]
+    _, started, ended = run_dag(jobs, {'a' : 2, 'b' : 5, 'c' : 1, 'd' : 1}, parallel=4)
+    assert started['a'] == started['b'] == 0
+    assert started['c'] == ended['a']
+    assert started['d'] == max(ended['b'], ended['c'])
+
+
+def test_run_job_dag_limits_parallel_jobs():
+    jobs = [make_job(key) for key in 'abcd']
+    _, started, _ = run_dag(jobs, dict.fromkeys('abcd', 1), parallel=2)
+    assert sorted(started.values()) == [0, 0, 1, 1]
+
+
+def test_run_job_dag_priority_orders_ready_jobs():
+    jobs = [make_job('a'), make_job('b'), make_job('c')]
+    _, started, _ = run_dag(jobs, dict.fromkeys('abc', 1), priority={'a' : 2, 'b' : 1, 'c' : 0})
+    assert started == {'c' : 0, 'b' : 1, 'a' : 2}
+
+
+def test_run_job_dag_failure_stops_new_jobs_and_raises_after_running_jobs():
+    jobs = [make_job('a'), make_job('b'), make_job('c')]
+    started, ended = {}, {}
+
+    async def run_job(job_info):
+        key = job_info['key']
+        started[key] = True
+        await asyncio.sleep({'a' : 1, 'b' : 5, 'c' : 1}[key])
+        ended[key] = True
+        if key == 'a':
+            raise RuntimeError("a failed")
+
+    with pytest.raises(RuntimeError):
+        run_virtual(cb.run_job_dag(jobs, run_job, parallel=2))
+    assert ended == {'a' : True, 'b' : True}
+    assert 'c' not in started
+
+
+def test_run_job_dag_soft_failure_skips_dependents_only():
+    jobs = [make_job('a'), make_job('b', requires=['a']), make_job('c', requires=['b']), make_job('d')]
+    skipped, started, _ = run_dag(jobs, dict.fromkeys('abcd', 1), fail_softly=['a'])
+    assert skipped == ['b', 'c']
+    assert set(started) == {'a', 'd'}
+
+
+def test_run_job_dag_rejects_unknown_dependencies():
+    with pytest.raises(AssertionError):
+        run_dag([make_job('a', requires=['missing'])], {'a' : 1})
+
+
+def test_gpu_pool_hands_out_disjoint_gpus_and_waits_for_release():
+    async def scenario():
+        loop = asyncio.get_event_loop()
+        pool = cb.GpuPool([0, 1, 2], clock=loop.time)
+        gpus_a, acquired_a = await pool.acquire(2)
+        waiter = asyncio.ensure_future(pool.acquire(2))
+        await asyncio.sleep(4)
+        assert not waiter.done()
+        await pool.release('a', gpus_a, acquired_a)
+        gpus_b, acquired_b = await waiter
+        assert set(gpus_b).isdisjoint(pool.free_gpus)
+        await asyncio.sleep(2)
+        await pool.release('b', gpus_b, acquired_b)
+        return gpus_a, gpus_b, pool.utilization_summary()
+
+    gpus_a, gpus_b, summary = run_virtual(scenario())
+    assert gpus_a == [0, 1]
+    assert len(gpus_b) == 2 and len(set(gpus_b)) == 2
+    assert summary['wall_time'] == 6
+    assert summary['busy_gpu_seconds'] == 2 * 4 + 2 * 2
+    assert summary['utilization'] == pytest.approx(12.0 / 18)
+
+
+def test_gpu_pool_acquire_gpus_takes_the_given_gpus():
+    async def scenario():
+        pool = cb.GpuPool([0, 1], clock=asyncio.get_event_loop().time)
+        gpus, _ = await pool.acquire_gpus([1])
+        return gpus, pool.free_gpus
+
+    assert run_virtual(scenario()) == ([1], [0])
+
+
+def test_gpu_pool_rejects_more_gpus_than_it_has():
+    async def scenario():
+        await cb.GpuPool([0]).acquire(2)
+
+    with pytest.raises(AssertionError):
+        run_virtual(scenario())
+
+
+def test_find_critical_path():
+    jobs = [make_job('a'), make_job('b'), make_job('c', requires=['a']), make_job('d', requires=['b', 'c'])]
+    length, path = cb.find_critical_path(jobs, {'a' : 2, 'b' : 5, 'c' : 4, 'd' : 1})
+    assert length == 7
+    assert path == ['a', 'c', 'd']
+    assert cb.find_critical_path([], {}) == (0.0, [])
+
+
+def test_estimate_schedule_shares_the_gpus():
+    jobs = [make_job('a'), make_job('b'), make_job('c')]
+    durations = {'a' : 2, 'b' : 3, 'c' : 4}
+    serial = cb.estimate_schedule(jobs, durations, num_gpus=2, parallel=1)
+    assert serial['makespan'] == 9
+    one_gpu = cb.estimate_schedule(jobs, durations, num_gpus=1, parallel=3)
+    assert one_gpu['makespan'] == 9
+    assert one_gpu['queue_wait'] == {'a' : 0, 'b' : 2, 'c' : 5}
+    two_gpus = cb.estimate_schedule(jobs, durations, num_gpus=2, parallel=3)
+    assert two_gpus['makespan'] == 6
+    assert two_gpus['busy_gpu_seconds'] == 9
+
+
+def test_estimate_schedule_follows_dependencies_and_gpu_demand():
+    jobs = [
+        make_job('import', job_type='import_movies'),
+        make_job('motion', job_type='patch_motion_correction_multi', requires=['import']),
+        make_job('refine', requires=['motion']),
+    ]
+    schedule = cb.estimate_schedule(jobs, {'import' : 1, 'motion' : 2, 'refine' : 3}, num_gpus=2, parallel=2)
+    assert schedule['gpus'] == {'import' : [], 'motion' : [0, 1], 'refine' : [0]}
+    assert schedule['start'] == {'import' : 0, 'motion' : 1, 'refine' : 3}
+    assert schedule['makespan'] == 6
+
+
+def test_estimate_schedule_policies():
+    jobs = [make_job('short'), make_job('long'), make_job('after_short', requires=['short'])]
+    durations = {'short' : 1, 'long' : 5, 'after_short' : 10}
+    fifo = cb.estimate_schedule(jobs, durations, num_gpus=1, parallel=3)
+    longest = cb.estimate_schedule(jobs, durations, num_gpus=1, parallel=3, policy='longest')
+    critical_path = cb.estimate_schedule(jobs, durations, num_gpus=1, parallel=3, policy='critical_path')
+    assert fifo['start']['short'] == 0
+    assert longest['start']['long'] == 0
+    assert critical_path['start']['short'] == 0
+    assert fifo['makespan'] == longest['makespan'] == critical_path['makespan'] == 16
+    with pytest.raises(ValueError):
+        cb.estimate_schedule(jobs, durations, num_gpus=1, policy='random')
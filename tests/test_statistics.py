@@ -0,0 +1,80 @@
+import math
+
+import pytest
+
+import cryosparc_benchmark as cb
+
+
+def test_percentile_interpolates_between_ranks():
+    values = [5, 1, 4, 2, 3]
+    assert cb.percentile(values, 0) == 1
+    assert cb.percentile(values, 25) == 2
+    assert cb.percentile(values, 50) == 3
+    assert cb.percentile(values, 90) == pytest.approx(4.6)
+    assert cb.percentile(values, 100) == 5
+    assert cb.percentile([7], 99) == 7
+    assert cb.percentile([], 50) is None
+
+
+def test_summarize_samples():
+    summary = cb.summarize_samples([2, 4, 4, 4, 5, 5, 7, 9])
+    assert summary['n'] == 8
+    assert summary['mean'] == 5
+    assert summary['median'] == 4.5
+    assert summary['stdev'] == pytest.approx(math.sqrt(32 / 7.0))
+    half_width = cb.T_95[6] * summary['stdev'] / math.sqrt(8)
+    assert summary['ci95'] == pytest.approx([5 - half_width, 5 + half_width])
+    assert cb.summarize_samples([3.0])['ci95'] is None
+    assert cb.summarize_samples([]) == {'n' : 0}
+
+
+def test_student_t_sf_matches_closed_forms():
+    # df=1 is the Cauchy distribution, df=2 has sf(t) = 1/2 - t / (2 sqrt(t^2 + 2))
+    assert cb.student_t_sf(1.0, 1) == pytest.approx(0.25)
+    assert cb.student_t_sf(0.0, 5) == pytest.approx(0.5)
+    for t in (0.5, 1.0, 3.0):
+        assert cb.student_t_sf(t, 2) == pytest.approx(0.5 - t / (2 * math.sqrt(t * t + 2)))
+        assert cb.student_t_sf(-t, 2) == pytest.approx(0.5 + t / (2 * math.sqrt(t * t + 2)))
+    # large df approaches the normal distribution
+    assert cb.student_t_sf(1.959964, 1e6) == pytest.approx(0.025, abs=1e-4)
+
+
+def test_slowdown_p_value_welch_t_test():
+    # equal variances and sizes: t = 4 / sqrt(2) with 2 degrees of freedom
+    t = 4 / math.sqrt(2)
+    assert cb.slowdown_p_value([1, 3], [5, 7]) == pytest.approx(0.5 - t / (2 * math.sqrt(t * t + 2)))
+    assert cb.slowdown_p_value([5, 7], [1, 3]) == pytest.approx(0.5 + t / (2 * math.sqrt(t * t + 2)))
+
+
+def test_slowdown_p_value_single_run_against_prediction_interval():
+    # one new runtime: t = 2 / sqrt(1 + 1/3) with 2 degrees of freedom
+    t = 2 / math.sqrt(1 + 1 / 3.0)
+    assert cb.slowdown_p_value([1, 2, 3], [4]) == pytest.approx(0.5 - t / (2 * math.sqrt(t * t + 2)))
+
+
+def test_slowdown_p_value_edge_cases():
+    assert cb.slowdown_p_value([10], [20]) is None
+    assert cb.slowdown_p_value([10, 11], []) is None
+    assert cb.slowdown_p_value([10, 10], [11]) == 0.0
+    assert cb.slowdown_p_value([10, 10], [9, 9]) == 1.0
+
+
+def test_fit_amdahl_recovers_the_serial_fraction():
+    runtimes = dict((n, 100.0 * (0.2 + 0.8 / n)) for n in (1, 2, 4, 8))
+    assert cb.fit_amdahl(runtimes) == pytest.approx(0.2)
+    assert cb.fit_amdahl({1 : 100.0, 2 : 50.0, 4 : 25.0}) == pytest.approx(0.0)
+    assert cb.fit_amdahl({1 : 100.0, 2 : 100.0}) == pytest.approx(1.0)
+    assert cb.fit_amdahl({4 : 30.0}) is None
+
+
+def test_summarize_gpu_scaling():
+    summary = cb.summarize_gpu_scaling({1 : 100.0, 2 : 60.0, 4 : 40.0})
+    assert summary['gpu_counts'][2]['speedup'] == pytest.approx(100 / 60.0)
+    assert summary['gpu_counts'][4]['efficiency'] == pytest.approx(2.5 / 4)
+    assert summary['amdahl_serial_fraction'] == pytest.approx(0.2)
+
+
+def test_fit_linear():
+    slope, intercept, r2 = cb.fit_linear([1, 2, 3], [3, 5, 7])
+    assert (slope, intercept, r2) == pytest.approx((2, 1, 1))
+    assert cb.fit_linear([2, 2], [1, 3]) is None
@@ -0,0 +1,141 @@
+import os
+
+import cryosparc_benchmark as cb
+
+
+STAR_HEADER = '''# version 30001
+
+data_optics
+
+loop_
+_rlnOpticsGroup #1
+_rlnVoltage #2
+1 300.0
+
+data_particles
+
+loop_
+_rlnCoordinateX #1
+_rlnImageName #2
+_rlnOpticsGroup #3
+'''
+
+
+def write_star(path, num_particles=10, particles_per_stack=5):
+    with open(path, 'w') as f:
+        f.write(STAR_HEADER)
+        for index in range(num_particles):
+            stack = 'stack_{}.mrcs'.format(index // particles_per_stack)
+            f.write('{:.1f} {:06d}@{} 1\n'.format(10.0 * index, index % particles_per_stack + 1, stack))
+    return path
+
+
+def read_rows(path):
+    with open(path) as f:
+        return [line.split()[1] for line, columns, is_row in cb.iter_star_lines(f) if is_row and 'rlnImageName' in columns]
+
+
+def test_iter_star_lines_finds_the_particle_rows_only():
+    lines = STAR_HEADER.splitlines(True) + ['10.0 000001@stack_0.mrcs 1\n']
+    rows = [(line, columns) for line, columns, is_row in cb.iter_star_lines(lines) if is_row]
+    assert rows == [
+        ('1 300.0\n', ['rlnOpticsGroup', 'rlnVoltage']),
+        ('10.0 000001@stack_0.mrcs 1\n', ['rlnCoordinateX', 'rlnImageName', 'rlnOpticsGroup']),
+    ]
+
+
+def test_subset_star_file_keeps_evenly_spread_particles(tmp_path):
+    source = write_star(str(tmp_path / 'particles.star'))
+    destination = str(tmp_path / 'subset.star')
+    kept, total, stacks = cb.subset_star_file(source, destination, fraction=0.2)
+    assert (kept, total) == (2, 10)
+    assert stacks == {'stack_0.mrcs', 'stack_1.mrcs'}
+    assert read_rows(destination) == ['000005@stack_0.mrcs', '000005@stack_1.mrcs']
+    # everything but the particle rows is copied unchanged
+    with open(destination) as f:
+        assert f.read().startswith(STAR_HEADER)
+
+
+def test_subset_star_file_max_particles(tmp_path):
+    source = write_star(str(tmp_path / 'particles.star'))
+    destination = str(tmp_path / 'subset.star')
+    kept, total, stacks = cb.subset_star_file(source, destination, fraction=0.5, max_particles=1)
+    assert (kept, total, stacks) == (1, 10, {'stack_1.mrcs'})
+    assert len(read_rows(destination)) == 1
+
+
+def test_subset_star_file_keeps_everything_without_limits(tmp_path):
+    source = write_star(str(tmp_path / 'particles.star'))
+    destination = str(tmp_path / 'subset.star')
+    assert cb.subset_star_file(source, destination)[:2] == (10, 10)
+    with open(source) as f, open(destination) as g:
+        assert f.read() == g.read()
+
+
+def make_import_jobs(tmp_path):
+    data_dir = tmp_path / 'data'
+    for part, count in (('part1', 6), ('part2', 2)):
+        (data_dir / part).mkdir(parents=True)
+        for index in range(count):
+            (data_dir / part / 'movie_{}.mrcs'.format(index)).write_text(u'')
+    particle_dir = data_dir / 'particles'
+    particle_dir.mkdir()
+    for stack in ('stack_0.mrcs', 'stack_1.mrcs'):
+        (particle_dir / stack).write_text(u'')
+    write_star(str(particle_dir / 'particles.star'))
+    return [
+        {'key' : 'import_movies_1', 'job_type' : 'import_movies', 'params' : {'blob_paths' : str(data_dir / 'part1' / '*.mrcs')}},
+        {'key' : 'import_movies_2', 'job_type' : 'import_movies', 'params' : {'blob_paths' : str(data_dir / 'part2' / '*.mrcs')}},
+        {'key' : 'import_particles', 'job_type' : 'import_particles', 'params' : {'particle_meta_path' : str(particle_dir / 'particles.star')}},
+        {'key' : 'refine', 'job_type' : 'homo_refine_new', 'params' : {}, 'setup_requires' : ['import_particles']},
+    ]
+
+
+def test_make_input_subset_links_the_kept_files(tmp_path):
+    jobs = make_import_jobs(tmp_path)
+    subset_dir = str(tmp_path / 'subset')
+    subset_jobs, summary = cb.make_input_subset(jobs, subset_dir, max_particles=1, max_movies=4)
+
+    # max_movies is shared in proportion to the size of each movie import
+    assert summary['imports']['import_movies_1']['kept'] == 3
+    assert summary['imports']['import_movies_2']['kept'] == 1
+    assert sorted(os.listdir(os.path.join(subset_dir, 'import_movies_1'))) == ['movie_1.mrcs', 'movie_3.mrcs', 'movie_5.mrcs']
+    assert subset_jobs[0]['params']['blob_paths'] == os.path.join(subset_dir, 'import_movies_1', '*.mrcs')
+
+    particles = subset_jobs[2]['params']
+    assert particles['particle_blob_path'] == os.path.join(subset_dir, 'import_particles')
+    assert read_rows(particles['particle_meta_path']) == ['000005@stack_1.mrcs']
+    assert sorted(os.listdir(particles['particle_blob_path'])) == ['particles.star', 'stack_1.mrcs']
+    assert os.path.islink(os.path.join(particles['particle_blob_path'], 'stack_1.mrcs'))
+
+    assert summary['imports']['import_particles'] == {'kept' : 1, 'total' : 10, 'stacks' : 1, 'fraction' : 0.1}
+    assert summary['fraction'] == (3 + 1 + 1) / 18.0
+    assert (summary['fraction_requested'], summary['max_particles'], summary['max_movies']) == (None, 1, 4)
+
+    # the suite's own job entries are left alone
+    assert jobs[2]['params'] == {'particle_meta_path' : str(tmp_path / 'data' / 'particles' / 'particles.star')}
+    assert subset_jobs[3] == jobs[3]
+
+
+def test_make_input_subset_keeps_a_movie_per_import(tmp_path):
+    _, summary = cb.make_input_subset(make_import_jobs(tmp_path), str(tmp_path / 'subset'), fraction=0.01)
+    assert [counts['kept'] for counts in summary['imports'].values()] == [1, 1, 1]
+
+
+def test_history_matches_runs_with_the_same_subset():
+    def result(subset, parallel=1):
+        return {'subset' : subset, 'parallel' : parallel}
+
+    limited = result({'fraction_requested' : None, 'max_particles' : 50, 'max_movies' : None, 'fraction' : 0.02})
+    tenth = result({'fraction_requested' : 0.1, 'max_particles' : None, 'max_movies' : None, 'fraction' : 0.1})
+    full = result(None)
+    whole = result({'fraction_requested' : 1.0, 'max_particles' : None, 'max_movies' : None, 'fraction' : 1.0})
+    history = [limited, tenth, full, whole, result(None, parallel=2)]
+
+    assert cb.filter_timings_history(history) == [full, whole]
+    assert cb.filter_timings_history(history, cb.get_subset_limits(max_particles=50)) == [limited]
+    assert cb.filter_timings_history(history, cb.get_subset_limits(max_particles=60)) == []
+    assert cb.filter_timings_history(history, cb.get_subset_limits(0.1)) == [tenth]
+    # a measured subset matches on the fraction it kept as well
+    assert cb.filter_timings_history(history, dict(limited['subset'], fraction=0.5)) == []
+    assert cb.filter_timings_history(history, parallel=2) == [history[-1]]
@@ -0,0 +1,71 @@
+import os
+
+import cryosparc_benchmark as cb
+
+
+def make_job(key, requires=(), advanced=False, reads=(), **fields):
+    job_info = {'key' : key, 'job_type' : 'homo_refine_new', 'job_title' : key, 'setup_requires' : list(requires), 'advanced' : advanced}
+    if reads:
+        job_info['input_group_connects'] = {'input' : [{'input_job_name' : name, 'group_name' : 'out'} for name in reads]}
+    job_info.update(fields)
+    return job_info
+
+
+def make_suite(modes, version=cb.BENCHMARK_SUITE_VERSION, input_data_dir='/data'):
+    return cb.BenchmarkSuite({'suite_version' : version, 'modes' : modes}, input_data_dir)
+
+
+def test_shipped_suite_is_valid():
+    suite = cb.get_benchmark_suite('/data')
+    assert suite.validate() == []
+    assert suite is cb.get_benchmark_suite('/data')
+
+
+def test_suite_resolves_input_paths():
+    suite = make_suite({'reconstruct' : {'0' : [make_job('import', params={'blob_paths' : '{input_data_dir}/movies/*.tif', 'psize_A' : 1.0})]}})
+    params = suite.get_job(0, 'import')['params']
+    assert params == {'blob_paths' : os.path.join('/data', 'movies/*.tif'), 'psize_A' : 1.0}
+
+
+def test_valid_suite_indexes_jobs_by_mode_and_dataset():
+    suite = make_suite({'reconstruct' : {'0' : [make_job('a'), make_job('b', requires=['a'], reads=['a'], advanced=True)]}})
+    assert suite.validate() == []
+    assert suite.job_keys(0) == ['a', 'b']
+    assert suite.modes_for(0) == ['reconstruct']
+    assert [job_info['key'] for job_info in suite.get_jobs('reconstruct', 0, False)] == ['a']
+    assert [job_info['key'] for job_info in suite.get_jobs('reconstruct', 0, True)] == ['a', 'b']
+
+
+def test_suite_validation_reports_each_problem():
+    suite = make_suite({
+        'reconstruct' : {'0' : [
+            make_job('a'),
+            make_job('a'),
+            {},
+            {'key' : 'incomplete', 'job_type' : 'homo_refine_new'},
+            make_job('unknown_dependency', requires=['missing']),
+            make_job('cycle_1', requires=['cycle_2']),
+            make_job('cycle_2', requires=['cycle_1']),
+            make_job('reads_unrequired', reads=['a']),
+            make_job('advanced', advanced=True),
+            make_job('needs_advanced', requires=['advanced']),
+            make_job('other_mode_dependency', requires=['preprocess_job']),
+        ]},
+        'preprocess' : {'0' : [make_job('preprocess_job')]},
+    }, version=cb.BENCHMARK_SUITE_VERSION + 1)
+    errors = suite.validate()
+    expected = [
+        'suite version',
+        'job key a is defined more than once',
+        'entry 2 is empty',
+        'incomplete: missing job_title, setup_requires, advanced',
+        'unknown_dependency: requires missing',
+        'cycle_1: is part of a setup_requires cycle',
+        'cycle_2: is part of a setup_requires cycle',
+        'reads_unrequired: reads a.out without requiring a',
+        'needs_advanced: requires advanced job advanced',
+        'other_mode_dependency: requires preprocess_job, which is not a reconstruct job',
+    ]
+    for message in expected:
+        assert any(message in error for error in errors), message
+    assert len(errors) == len(expected)
@@ -0,0 +1,36 @@
+import pytest
+
+import cryosparc_benchmark as cb
+
+
+def test_parse_sweep_values_lists():
+    assert cb.parse_sweep_values('50,100,200') == [50, 100, 200]
+    assert cb.parse_sweep_values('[0.5, 1.5]') == [0.5, 1.5]
+    assert cb.parse_sweep_values('False,True') == [False, True]
+    assert cb.parse_sweep_values('C1,C6') == ['C1', 'C6']
+
+
+def test_parse_sweep_values_ranges():
+    assert cb.parse_sweep_values('25..400') == [25, 50, 100, 200, 400]
+    assert cb.parse_sweep_values('25..300') == [25, 50, 100, 200]
+    assert cb.parse_sweep_values('2..10:4') == [2, 6, 10]
+    assert cb.parse_sweep_values('0.5..1.5:0.5') == [0.5, 1.0, 1.5]
+
+
+@pytest.mark.parametrize('text', ['0..8', '8..2', '1..4:0', '1..4:-1', 'a..b', 'True..False'])
+def test_parse_sweep_values_rejects_bad_ranges(text):
+    with pytest.raises(AssertionError):
+        cb.parse_sweep_values(text)
+
+
+def test_expand_parameter_sweep_covers_the_grid():
+    jobs = [
+        {'key' : 'import', 'job_type' : 'import_particles', 'job_title' : 'Import', 'params' : {}},
+        {'key' : 'refine', 'job_type' : 'homo_refine_new', 'job_title' : 'Refine', 'params' : {'a' : 1}},
+    ]
+    expanded = cb.expand_parameter_sweep(jobs, 'refine', {'a' : [1, 2], 'b' : ['x', 'y']})
+    assert [job_info['key'] for job_info in expanded] == ['import', 'refine_sweep0', 'refine_sweep1', 'refine_sweep2', 'refine_sweep3']
+    assert [dict(job_info['sweep_params']) for job_info in expanded[1:]] == [
+        {'a' : 1, 'b' : 'x'}, {'a' : 1, 'b' : 'y'}, {'a' : 2, 'b' : 'x'}, {'a' : 2, 'b' : 'y'}]
+    assert expanded[4]['params'] == {'a' : 2, 'b' : 'y'}
+    assert jobs[1]['params'] == {'a' : 1}
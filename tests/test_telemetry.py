@@ -0,0 +1,70 @@
+import json
+import os
+
+import pytest
+
+import cryosparc_benchmark as cb
+
+
+def write_proc(proc_root, device, cpu, mem_available_kb, sectors_read, sectors_written, rx_bytes, tx_bytes):
+    '''
+    Writes the /proc files HostTelemetrySampler reads, with the data directory on `device`.
+    '''
+    (proc_root / 'net').mkdir(parents=True, exist_ok=True)
+    (proc_root / 'stat').write_text(u'cpu  {}\ncpu0 0 0 0 0 0 0 0 0\n'.format(' '.join(str(value) for value in cpu)))
+    (proc_root / 'meminfo').write_text(u'MemTotal: 1000 kB\nMemFree: 100 kB\nMemAvailable: {} kB\nCached: 300 kB\n'.format(mem_available_kb))
+    (proc_root / 'diskstats').write_text(u'{} {} {} 10 0 {} 0 20 0 {} 0 0 0 0\n 1 2 other 1 0 999 0 1 0 999 0 0 0 0\n'.format(
+        device[0], device[1], 'sdx', sectors_read, sectors_written))
+    (proc_root / 'net' / 'dev').write_text(
+        u'Inter-|   Receive\n face |bytes packets\n    lo: 5000 0 0 0 0 0 0 0 5000 0 0 0 0 0 0 0\n'
+        u'  eth0: {} 0 0 0 0 0 0 0 {} 0 0 0 0 0 0 0\n'.format(rx_bytes, tx_bytes))
+
+
+def test_sampler_reads_rates_from_proc_root(tmp_path, monkeypatch):
+    st = os.stat(str(tmp_path))
+    device = (os.major(st.st_dev), os.minor(st.st_dev))
+    proc_root = tmp_path / 'proc'
+    write_proc(proc_root, device, [100, 0, 100, 700, 100, 0, 0, 0], 600, 0, 0, 0, 0)
+    assert cb.find_block_device(str(tmp_path), str(proc_root)) == 'sdx'
+    assert cb.find_block_device(str(tmp_path / 'missing'), str(proc_root)) is None
+
+    now = [1000.0]
+    monkeypatch.setattr(cb.time, 'time', lambda: now[0])
+    sampler = cb.HostTelemetrySampler({'input_data_dir' : str(tmp_path), 'ssd_path' : None}, interval=2.0, proc_root=str(proc_root))
+    assert sampler.devices == {'sdx' : ['input_data_dir']}
+    sampler.sample()
+    assert sampler.columns == {}
+
+    # 2 seconds later: 1000 more jiffies, 400 of them idle and 100 waiting for I/O
+    now[0] += 2.0
+    write_proc(proc_root, device, [300, 0, 300, 1100, 200, 0, 0, 100], 400, 4000, 2000, 10000, 3000)
+    sampler.job_started('refine')
+    sampler.job_started('abinit')
+    sampler.sample()
+
+    columns = sampler.columns
+    assert columns['time'] == [2.0]
+    assert columns['running'] == ['abinit+refine']
+    assert columns['cpu_busy'] == [pytest.approx(0.5)]
+    assert columns['cpu_iowait'] == [pytest.approx(0.1)]
+    assert columns['mem_used_bytes'] == [600 * 1024]
+    assert columns['mem_cached_bytes'] == [300 * 1024]
+    assert columns['disk_sdx_read_bytes_per_s'] == [4000 * 512 / 2.0]
+    assert columns['disk_sdx_write_bytes_per_s'] == [2000 * 512 / 2.0]
+    assert columns['net_rx_bytes_per_s'] == [5000.0]
+    assert columns['net_tx_bytes_per_s'] == [1500.0]
+    assert not any('other' in name for name in columns)
+
+    sampler.job_finished('abinit')
+    now[0] += 2.0
+    sampler.sample()
+    assert columns['running'] == ['abinit+refine', 'refine']
+    assert columns['cpu_busy'][1] == 0.0
+
+    path = str(tmp_path / 'telemetry.json')
+    sampler.write(path)
+    with open(path) as f:
+        written = json.load(f)
+    assert written['interval'] == 2.0
+    assert written['devices'] == {'sdx' : ['input_data_dir']}
+    assert set(len(values) for values in written['columns'].values()) == {2}